@@ -1,8 +1,7 @@
 from datetime import datetime, timedelta
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
@@ -10,19 +9,41 @@ import json
 import logging
 import asyncio
 import uuid
+import time
+import contextvars
+import functools
+import hmac
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from src.summary_chain import run_summary_sync, summary_chain
-from src.constants import WELCOME_MESSAGE
-from src.agents import VoiceEscalationAgent, MemoryManager
+from src.summary_chain.jobs import SummaryJobQueue
+from src.constants import WELCOME_MESSAGE, WARMUP_AGENT_ATTEMPTS, WARMUP_RETRY_SECONDS, BARGE_IN
+from src.agents import VoiceEscalationAgent
 from src.dbio.db import init_db
 from src.dbio.db import SessionLocal
+from src.dbio.engine import configure_engines, check_engines, dispose_engines
 from src.dbio.models import UserVerification
 from src.dbio.session_history_manager import SessionHistoryManager
 from src.utils.session import get_user_session
+from src.utils.speech import SpeechStream
+from src.utils.cancellation import CancelToken
+from src.audio import get_stt_backend
+from src.audio.ingest import AudioIngest, Utterance
+from src.audio.vad import SPEECH_START
+from src.constants.audio import AUDIO_SAMPLE_RATE, AUDIO_SAMPLE_RATES, AUDIO_WORKERS
+from src.constants.gateway import GATEWAY_TOKENS
+from src.gateway import GatewayConnection, GatewayHandlers, Send, active_session_count
+from src.handoff import HandoffService, create_handoff_service, relay_send
+from src.constants.handoff import HANDOFF_AGENT_TOKENS, HANDOFF_RELAY_TOKEN
+from src.dbio.retention import RetentionJob
+from src.constants.db import RETENTION_ENABLED
+from src.storage import get_state_backend
+from src.callbacks import get_callback_scheduler, parse_due_time
+from src.constants.callbacks import CALLBACK_SCHEDULER_ENABLED
+from src import assets, metrics, tracing
+from src.constants.assets import ASSET_BUILD_ON_STARTUP
 from src.logger import logger
 
 # Load environment variables
@@ -43,47 +64,146 @@ class ChatResponse(BaseModel):
     session_id: Optional[str] = None
 
 class EscalationRequest(BaseModel):
-    action: str = Field(..., description="Escalation action: 'talk_now' or 'schedule_callback'")
+    action: str = Field(..., description="Escalation action: 'talk_now', 'leave_queue' or 'schedule_callback'")
     session_id: str = Field(..., description="Session identifier")
 
 class WebSocketMessage(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000)
     session_id: Optional[str] = Field(None)
     message_type: str = Field(default="chat")
+    speech_chunks: bool = Field(default=False, description="Stream speech_chunk frames before the reply")
 
 class ResetConversationRequest(BaseModel):
     session_id: str = Field(..., description="Session identifier")
 
 class CallbackScheduleRequest(BaseModel):
     session_id: str = Field(..., description="Session identifier")
-    phone_number: str = Field(..., description="Phone number for callback")
-    preferred_time: str = Field(..., description="Preferred callback time")
+    phone_number: str = Field(..., pattern=r"^\+?[0-9 ()-]{6,20}$", description="Phone number for callback")
+    preferred_time: str = Field(..., description="Preferred callback time (ISO 8601)")
     timezone: Optional[str] = Field(None, description="User's timezone")
 
+class HandoffRelayJoin(BaseModel):
+    session_id: str = Field(..., description="Session identifier")
+    reason: Optional[str] = Field(None, description="Escalation reason")
+    worker: int = Field(..., description="Worker the caller is connected to")
+
+class HandoffRelayLeave(BaseModel):
+    session_id: str = Field(..., description="Session identifier")
+
+class HandoffRelayDelivery(BaseModel):
+    session_id: str = Field(..., description="Session identifier")
+    message: Dict[str, Any] = Field(..., description="Queue update to send to the caller")
+
 # Global variables
 agent: Optional[VoiceEscalationAgent] = None
 executor = ThreadPoolExecutor(max_workers=10)
+# VAD and speech-to-text, kept off the agent executor so turns cannot starve audio
+audio_executor = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="audio")
+summary_jobs = SummaryJobQueue()
+# Escalated callers waiting for a human agent (a relay to the worker holding them under the supervisor)
+handoff = create_handoff_service()
+warmup_state: Dict[str, Any] = {"ready": False, "steps": {}, "error": None}
+
+
+def _warm_step(name: str, func) -> bool:
+    """Run one warm-up step, recording its duration or failure for /health."""
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        warmup_state["steps"][name] = {"status": "failed", "error": str(e)}
+        logger.warning(f"Warm-up step {name} failed: {e}")
+        return False
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state["steps"][name] = {"status": "ok", "ms": elapsed_ms}
+    logger.info(f"Warm-up step {name} finished in {elapsed_ms}ms")
+    return True
+
+
+def _build_agent():
+    global agent
+    agent = VoiceEscalationAgent()
+
+
+def warm_up():
+    """
+    Pay the first-request costs before reporting ready: database tables and
+    connections, the watsonx client (IAM token and model lookup), the agent
+    and summary prompts, and the Orchestrate token and connection.
+    """
+    from src.agents import wxorc_agent
+    from src.summary_chain import build_chains
+
+    _warm_step("database", lambda: (init_db(), check_engines()))
+    for attempt in range(1, WARMUP_AGENT_ATTEMPTS + 1):
+        if _warm_step("agent", _build_agent):
+            break
+        if attempt < WARMUP_AGENT_ATTEMPTS:
+            time.sleep(WARMUP_RETRY_SECONDS * attempt)
+    if agent is None:
+        warmup_state["error"] = "VoiceEscalationAgent could not be initialized"
+        logger.error(warmup_state["error"])
+        return
+    _warm_step("summary_chains", build_chains)
+    # Optional: the FAQ tool still works (slower first call) without it
+    _warm_step("orchestrate", wxorc_agent.warm_up)
+    # Optional: only needed by clients that stream audio
+    _warm_step("speech_to_text", get_stt_backend)
+    warmup_state["ready"] = True
+    logger.info("VoiceEscalationAgent initialized successfully")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown events."""
-    global agent
-    
     logger.info("Starting up Banking Support API...")
-    
-    # Initialize single agent instance
-    try:
-        agent = VoiceEscalationAgent()
-        logger.info("VoiceEscalationAgent initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize VoiceEscalationAgent: {e}")
-        raise
-    
+
+    # One engine per database, shared by every module
+    configure_engines()
+
+    # Fingerprinted, precompressed static files for asset_url() in templates
+    assets.load(build_first=ASSET_BUILD_ON_STARTUP)
+
+    # Shared state backend (chat history, session registry, escalation state)
+    state_backend = get_state_backend()
+    logger.info(f"Using {state_backend.name} state backend")
+
+    # Archive and purge old sessions in the background (SQLite only)
+    retention_job = None
+    if RETENTION_ENABLED and state_backend.name == "sqlite":
+        retention_job = RetentionJob(state_backend.engine)
+        retention_job.start()
+
+    # Callbacks booked through POST /callbacks, dispatched when they fall due
+    callback_scheduler = None
+    if CALLBACK_SCHEDULER_ENABLED:
+        try:
+            callback_scheduler = get_callback_scheduler()
+            await asyncio.get_running_loop().run_in_executor(executor, callback_scheduler.start)
+        except Exception as e:
+            logger.error(f"Callback scheduler failed to start: {e}")
+            callback_scheduler = None
+
+    # Queue position updates for callers waiting for a human agent
+    handoff.start()
+
+    # Start serving immediately; /health reports 503 until warm-up completes
+    warmup_task = asyncio.get_running_loop().run_in_executor(executor, warm_up)
+
     yield
-    
+
     # Cleanup
     logger.info("Shutting down Banking Support API...")
+    warmup_task.cancel()
+    await handoff.stop()
+    if retention_job:
+        retention_job.stop()
+    if callback_scheduler:
+        callback_scheduler.stop()
+    summary_jobs.shutdown()
     executor.shutdown(wait=True)
+    audio_executor.shutdown(wait=False, cancel_futures=True)
+    state_backend.close()
+    dispose_engines()
 
 app = FastAPI(
     title="Banking Support API",
@@ -108,13 +228,14 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Serve static files - relative to app.py location
 static_dir = os.path.join(BASE_DIR, "static")
 if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.mount("/static", assets.AssetFiles(directory=static_dir), name="static")
 else:
     logger.warning(f"Static directory not found: {static_dir}")
 
 # Templates - relative to app.py location
 templates_dir = os.path.join(BASE_DIR, "templates")
 templates = Jinja2Templates(directory=templates_dir)
+templates.env.globals["asset_url"] = assets.asset_url
 
 
 def get_or_create_session_id(provided_session_id: Optional[str] = None) -> str:
@@ -123,58 +244,150 @@ def get_or_create_session_id(provided_session_id: Optional[str] = None) -> str:
         return provided_session_id
     return str(uuid.uuid4())
 
-async def run_agent_chat(user_input: str, session_id: str) -> Dict[str, Any]:
+def _timed_chat(queued_at: float, user_input: str, session_id: str, callbacks=None,
+                cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
+    waited = time.perf_counter() - queued_at
+    metrics.EXECUTOR_QUEUE_WAIT_SECONDS.observe(waited)
+    tracing.record_span("executor.queue_wait", time.time() - waited)
+    return agent.chat(user_input, session_id, callbacks=callbacks, cancel=cancel)
+
+async def run_agent_chat(user_input: str, session_id: str, callbacks=None,
+                         cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
     """Run agent chat synchronously in thread pool."""
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, agent.chat, user_input, session_id)
+    # The copied context carries the current turn's trace into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, ctx.run, _timed_chat, time.perf_counter(),
+                                      user_input, session_id, callbacks, cancel)
+
+async def run_agent_chat_with_speech(send: Send, user_input: str, session_id: str,
+                                     speech_ended_at: Optional[float] = None,
+                                     cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
+    """Run a turn, sending speech_chunk frames to the client while the answer is generated."""
+    loop = asyncio.get_running_loop()
+    outbox: asyncio.Queue = asyncio.Queue()
+    speech = SpeechStream(lambda payload: loop.call_soon_threadsafe(outbox.put_nowait, payload))
+
+    async def send_chunks():
+        while (payload := await outbox.get()) is not None:
+            await send(payload)
+            if speech_ended_at is not None and payload["seq"] == 0:
+                metrics.VOICE_RESPONSE_SECONDS.labels("first_speech").observe(time.perf_counter() - speech_ended_at)
+
+    sender = asyncio.create_task(send_chunks())
+    superseded = False
+    try:
+        response = await run_agent_chat(user_input, session_id, callbacks=[speech], cancel=cancel)
+        response.setdefault("message", "I'm here to help!")
+        chunks = speech.finish(response["message"])
+    except asyncio.CancelledError:
+        superseded = True
+        raise
+    finally:
+        outbox.put_nowait(None)
+        if superseded:
+            # Chunks not yet sent belong to an answer nobody is waiting for
+            sender.cancel()
+        else:
+            await sender
+    response["speech"] = {"turn_id": speech.turn_id, "chunks": chunks}
+    return response
 
 async def run_agent_chat_stream(user_input: str, session_id: str) -> Dict[str, Any]:
     """Run agent chat stream synchronously in thread pool."""
     loop = asyncio.get_event_loop()
     # Convert generator to single response for now
-    result = await loop.run_in_executor(executor, agent.chat, user_input, session_id)
+    ctx = contextvars.copy_context()
+    result = await loop.run_in_executor(executor, ctx.run, _timed_chat, time.perf_counter(), user_input, session_id)
     return result
 
+async def send_ws_json(websocket: WebSocket, payload: Dict[str, Any]):
+    """Send a JSON frame and record how long the send took."""
+    with tracing.span("ws.send"), metrics.WS_SEND_SECONDS.time():
+        await websocket.send_json(payload)
+    metrics.WS_MESSAGES_TOTAL.labels("out").inc()
+
 @app.get("/")
 async def root(request: Request):
     """Serve the main chat interface."""
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/customer_chat_summary")
-async def summarize_session():
-    memory_manager = MemoryManager()
-
-    messages = memory_manager.get_current_message_history()
-    if not messages:
-        raise HTTPException(status_code=404, detail="No chat history found for this session")
-
-    response = run_summary_sync(messages)
-
+def summary_timestamps() -> Dict[str, str]:
+    """Date and time fields shown on the summary page."""
     now_dt = datetime.now()
-    
 
     # Get time 5 minutes ago (still datetime object)
     five_minutes_ago_dt = now_dt - timedelta(minutes=5)
 
-    # Now format both to strings
-    five_minutes_ago = five_minutes_ago_dt.strftime("%I:%M:%S %p")
+    return {
+        "date": now_dt.isoformat(),
+        "time": five_minutes_ago_dt.strftime("%I:%M:%S %p"),
+    }
 
+@app.post("/customer_chat_summary")
+async def summarize_session():
+    session_id = await asyncio.get_running_loop().run_in_executor(
+        executor, SessionHistoryManager.get_last_session_id
+    )
+    # Precomputed summaries return immediately; otherwise await a job off the loop
+    response = await summary_jobs.get_summary(session_id) if session_id else None
+    if not response:
+        raise HTTPException(status_code=404, detail="No chat history found for this session")
 
-    # Get time 5 minutes ago
     return {
         "name": response.get("name", ""),
         "policy_number": response.get("policy_number", ""),
         "summary": response.get("summary", ""),
-        "date": datetime.now().isoformat(),
-        "time": five_minutes_ago,
+        **summary_timestamps(),
     }
 
+@app.get("/customer_chat_summary/stream")
+async def stream_session_summary():
+    """Stream the summary of the latest session as server-sent events."""
+    loop = asyncio.get_running_loop()
+    session_id = await loop.run_in_executor(executor, SessionHistoryManager.get_last_session_id)
+    messages = await summary_jobs.load_messages(session_id) if session_id else []
+    if not messages:
+        # Waits for a precompute still running for the ended call
+        stored = await summary_jobs.get_summary(session_id) if session_id else None
+        if not stored:
+            raise HTTPException(status_code=404, detail="No chat history found for this session")
+
+    async def event_source():
+        # Generated on the summary pool, shared with any job already running for this transcript
+        try:
+            async for event, data in summary_jobs.stream(session_id, messages):
+                if event == "done":
+                    data = {**data, **summary_timestamps()}
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming summary for session {session_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to generate summary'})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; 503 until the startup warm-up has finished."""
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content={
+            "status": "failed" if warmup_state["error"] else "starting",
+            "agent_initialized": agent is not None,
+            "warmup": warmup_state,
+            "version": "1.0.0"
+        })
+    # DB round-trips; off the event loop and out of the busy request executor
+    databases = await asyncio.get_running_loop().run_in_executor(None, check_engines)
     return {
         "status": "healthy",
         "agent_initialized": agent is not None,
+        "state_backend": get_state_backend().name,
+        "databases": databases,
+        "warmup": warmup_state,
         "version": "1.0.0"
     }
 
@@ -185,8 +398,8 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
         # Get or create session ID
         # session_id = get_or_create_session_id(request.session_id)
 
-        # # Generate session ID
-        session_manager = SessionHistoryManager()
+        # # Generate session ID (or continue the one the client sent)
+        session_manager = SessionHistoryManager(request.session_id)
     
         session_id = session_manager.session_id
         # print(session.session_id)
@@ -200,7 +413,8 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
             raise HTTPException(status_code=503, detail="Service temporarily unavailable")
         
         # Run agent with session ID
-        response = await run_agent_chat(request.query, session_id)
+        with tracing.start_turn(session_id, channel="rest"):
+            response = await run_agent_chat(request.query, session_id)
         
         logger.info(f"Agent response for session {session_id}: {response}")
         
@@ -223,15 +437,171 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
 
 
 
+async def handle_ws_turn(send: Send, user_input: str, session_id: str,
+                         speech_chunks: bool = False, utterance: Optional[Utterance] = None,
+                         cancel: Optional[CancelToken] = None):
+    """Run one WebSocket turn and send the reply (plus speech chunks when requested)."""
+    with tracing.start_turn(session_id, channel="ws", audio=utterance is not None):
+        if utterance is not None:
+            # Put the caller's silence and the transcription on the turn's waterfall
+            now_epoch, now = time.time(), time.perf_counter()
+            tracing.record_span("audio.endpointing", now_epoch - (now - utterance.speech_ended_at))
+            tracing.record_span("stt.finalize", now_epoch - (now - utterance.detected_at),
+                                audio_seconds=round(utterance.audio_seconds, 2))
+
+        # Process message with session ID
+        if speech_chunks:
+            response = await run_agent_chat_with_speech(
+                send, user_input, session_id,
+                speech_ended_at=utterance.speech_ended_at if utterance else None, cancel=cancel)
+        else:
+            response = await run_agent_chat(user_input, session_id, cancel=cancel)
+
+        # print("Agent response:", response)
+        logger.info(f"Agent response for session {session_id}: {response}")
+
+        # Send response
+        await send({
+            "message": response.get("message", "I'm here to help!"),
+            "role": "bot",
+            "show_escalation_buttons": response.get("show_escalation_buttons", False),
+            "escalation_reason": response.get("escalation_reason"),
+            "session_id": session_id,
+            **({"speech": response["speech"]} if "speech" in response else {})
+        })
+        # Have the summary ready before the human agent opens it
+        if response.get("show_escalation_buttons"):
+            await summary_jobs.submit_for_session(session_id)
+        if utterance is not None:
+            metrics.VOICE_RESPONSE_SECONDS.labels("reply").observe(time.perf_counter() - utterance.speech_ended_at)
+
+class CallTurns:
+    """
+    The turns of one call. Each turn runs as a task, so the connection
+    keeps reading while the agent answers. A voice turn (speech chunks
+    requested) cancels the turns still in progress: the caller barged in
+    and no longer wants their answers. Any other turn waits its turn.
+    """
+
+    def __init__(self, send: Send):
+        self.send = send
+        self._live: Dict[asyncio.Task, CancelToken] = {}
+        self._superseded = 0
+
+    def start(self, user_input: str, session_id: str, speech_chunks: bool = False,
+              utterance: Optional[Utterance] = None) -> asyncio.Task:
+        if BARGE_IN and speech_chunks:
+            self.interrupt()
+        # Turns that stored their answer before they could be cancelled are
+        # finishing; the new turn goes after them so replies stay in order
+        ahead = list(self._live)
+        token = CancelToken()
+        task = asyncio.create_task(self._run(ahead, token, user_input, session_id, speech_chunks, utterance))
+        self._live[task] = token
+        task.add_done_callback(lambda done: self._live.pop(done, None))
+        return task
+
+    async def run(self, user_input: str, session_id: str, speech_chunks: bool = False):
+        """Start a turn and wait until it is answered or cancelled."""
+        await asyncio.wait([self.start(user_input, session_id, speech_chunks)])
+
+    def interrupt(self, reason: str = "superseded") -> int:
+        """Cancel every turn in progress; returns how many were cancelled."""
+        cancelled = 0
+        for task, token in list(self._live.items()):
+            if token.cancel(reason):
+                task.cancel()
+                cancelled += 1
+        if reason == "superseded":
+            self._superseded += cancelled
+        return cancelled
+
+    async def _run(self, ahead, token: CancelToken, user_input: str, session_id: str,
+                   speech_chunks: bool, utterance: Optional[Utterance]):
+        if ahead:
+            await asyncio.wait(ahead)
+        if self._superseded:
+            # Tells the client to stop speaking the cancelled answer
+            await self.send({"type": "turn_cancelled", "turns": self._superseded, "session_id": session_id})
+            self._superseded = 0
+        try:
+            await handle_ws_turn(self.send, user_input, session_id, speech_chunks=speech_chunks,
+                                 utterance=utterance, cancel=token)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Turn failed for session {session_id}: {e}")
+            await self.send({"error": "Internal server error", "role": "system"})
+
+async def run_audio_turns(turns: CallTurns, frames: asyncio.Queue, session_id: str, sample_rate: int):
+    """
+    Consume binary PCM frames of one connection: VAD and speech-to-text run
+    in the audio executor, and each transcript becomes a turn of its own so
+    audio keeps being processed while the agent answers.
+    """
+    loop = asyncio.get_running_loop()
+    send = turns.send
+    try:
+        ingest = await loop.run_in_executor(audio_executor, AudioIngest, sample_rate)
+    except Exception as e:
+        logger.error(f"Speech input unavailable for session {session_id}: {e}")
+        await send({"error": "Speech input unavailable", "role": "system"})
+        return
+
+    while True:
+        # Everything queued while the last batch was processed goes in one call
+        batch = [await frames.get()]
+        while not frames.empty():
+            batch.append(frames.get_nowait())
+        received_at = batch[-1][1]
+        events = await loop.run_in_executor(audio_executor, ingest.process,
+                                            b"".join(pcm for pcm, _ in batch), received_at)
+        for kind, utterance in events:
+            if kind == SPEECH_START:
+                await send({"type": "vad", "event": "speech_start"})
+                continue
+            await send({
+                "type": "transcript",
+                "message": utterance.transcript,
+                "session_id": session_id,
+            })
+            if not utterance.transcript or not agent:
+                continue
+            turns.start(utterance.transcript, session_id, speech_chunks=True, utterance=utterance)
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time chat."""
+    """
+    WebSocket endpoint for real-time chat.
+
+    ``?session_id=`` resumes (or names) the session; otherwise a new one
+    is created. Text frames carry JSON chat messages. Binary frames carry caller audio
+    as 16-bit little-endian mono PCM at ``?sample_rate=`` (default
+    AUDIO_SAMPLE_RATE); utterances are detected, transcribed and answered
+    with speech chunks.
+    """
+    try:
+        sample_rate = int(websocket.query_params.get("sample_rate", AUDIO_SAMPLE_RATE))
+    except ValueError:
+        sample_rate = None
+    if sample_rate not in AUDIO_SAMPLE_RATES:
+        await websocket.close(code=1003, reason=f"sample_rate must be one of {AUDIO_SAMPLE_RATES}")
+        return
     await websocket.accept()
     
-    # Generate session ID
-    session_manager = SessionHistoryManager()
+    # Generate session ID (or take the one the client or supervisor chose)
+    requested_session_id = websocket.query_params.get("session_id", "")
+    session_manager = SessionHistoryManager(requested_session_id if 0 < len(requested_session_id) <= 128 else None)
     
     session_id = session_manager.session_id
+    send = functools.partial(send_ws_json, websocket)
+    turns = CallTurns(send)
+    audio_frames: Optional[asyncio.Queue] = None
+    audio_task: Optional[asyncio.Task] = None
+    # Sessions this connection queued for a human agent
+    handoff_sessions: set = set()
+    # Sessions this connection chatted in (messages may name their own)
+    call_sessions = {session_id}
 
     # session = get_user_session()
     # session_id = session.session_id
@@ -243,7 +613,7 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         # Send welcome message
-        await websocket.send_json({
+        await send_ws_json(websocket, {
             "message": WELCOME_MESSAGE,
             "role": "bot",
             "session_id": session_id
@@ -252,13 +622,31 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             try:
                 # Receive message
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=300)  # 5 min timeout
+                frame = await asyncio.wait_for(websocket.receive(), timeout=300)  # 5 min timeout
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+
+                if frame.get("bytes") is not None:
+                    metrics.AUDIO_BYTES_TOTAL.inc(len(frame["bytes"]))
+                    if audio_task is None:
+                        audio_frames = asyncio.Queue()
+                        audio_task = asyncio.create_task(
+                            run_audio_turns(turns, audio_frames, session_id, sample_rate))
+                    audio_frames.put_nowait((frame["bytes"], time.perf_counter()))
+                    continue
+
+                data = json.loads(frame.get("text") or "")
+                metrics.WS_MESSAGES_TOTAL.labels("in").inc()
+
+                if isinstance(data, dict) and data.get("message_type") == "escalation":
+                    await handle_ws_escalation(send, data, session_id, handoff_sessions)
+                    continue
                 
                 # Validate message
                 try:
                     ws_message = WebSocketMessage(**data)
                 except Exception as e:
-                    await websocket.send_json({
+                    await send_ws_json(websocket, {
                         "error": "Invalid message format",
                         "role": "system"
                     })
@@ -268,41 +656,31 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Use provided session_id or the WebSocket session_id
 
                 current_session_id = ws_message.session_id or session_id
+                call_sessions.add(current_session_id)
                 
                 # logger.info(f"WebSocket message for session {current_session_id}: {user_input[:50]}...")
                 
                 # Check agent availability
                 if not agent:
-                    await websocket.send_json({
+                    await send_ws_json(websocket, {
                         "error": "Service temporarily unavailable",
                         "role": "system"
                     })
                     continue
                 
-                # Process message with session ID
-                response = await run_agent_chat(user_input, current_session_id)
-                
-                # print("Agent response:", response)
-                logger.info(f"Agent response for session {current_session_id}: {response}")
-                # Send response
-                await websocket.send_json({
-                    "message": response.get("message", "I'm here to help!"),
-                    "role": "bot",
-                    "show_escalation_buttons": response.get("show_escalation_buttons", False),
-                    "escalation_reason": response.get("escalation_reason"),
-                    "session_id": current_session_id
-                })
+                # Answered in the background so a newer message can supersede this one
+                turns.start(user_input, current_session_id, speech_chunks=ws_message.speech_chunks)
                 
             except asyncio.TimeoutError:
                 logger.info(f"WebSocket timeout for session: {session_id}")
-                await websocket.send_json({
+                await send_ws_json(websocket, {
                     "message": "Session timeout. Please refresh if you need continued assistance.",
                     "role": "system"
                 })
                 break
                 
             except json.JSONDecodeError:
-                await websocket.send_json({
+                await send_ws_json(websocket, {
                     "error": "Invalid JSON format",
                     "role": "system"
                 })
@@ -312,19 +690,115 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
         try:
-            await websocket.send_json({
+            await send_ws_json(websocket, {
                 "error": "Internal server error",
                 "role": "system"
             })
         except:
             pass
     finally:
-        # Cleanup session
-        if agent:
-            try:
-                agent.cleanup_session(session_id)
-            except Exception as e:
-                logger.error(f"Error cleaning up session {session_id}: {e}")
+        if audio_task is not None:
+            audio_task.cancel()
+        turns.interrupt("disconnected")
+        for queued_session in handoff_sessions:
+            handoff.leave(queued_session)
+        for call_session in call_sessions:
+            await end_call_session(call_session)
+
+async def handle_ws_escalation(send: Send, data: Dict[str, Any], session_id: str, handoff_sessions: set):
+    """Join or leave the talk-now queue; position updates follow on the socket."""
+    try:
+        request = EscalationRequest(**{"session_id": session_id, **data})
+    except Exception:
+        await send({"error": "Invalid escalation request", "role": "system"})
+        return
+    if request.action == "talk_now":
+        escalation = await asyncio.get_running_loop().run_in_executor(
+            executor, get_state_backend().get_escalation, request.session_id)
+        handoff_sessions.add(request.session_id)
+        await handoff.request(request.session_id, (escalation or {}).get("reason"), send)
+    elif request.action == "leave_queue":
+        handoff_sessions.discard(request.session_id)
+        handoff.leave(request.session_id)
+        await send({"type": "handoff_left", "session_id": request.session_id})
+    else:
+        await send({"error": f"Unsupported escalation action: {request.action}", "role": "system"})
+
+async def end_call_session(session_id: str):
+    """Summarize a finished call, then clean up its history."""
+    try:
+        await summary_jobs.submit_for_session(session_id)
+    except Exception as e:
+        logger.error(f"Error queueing summary for session {session_id}: {e}")
+
+    # Cleanup session
+    if agent:
+        try:
+            agent.cleanup_session(session_id)
+        except Exception as e:
+            logger.error(f"Error cleaning up session {session_id}: {e}")
+
+class CallSessionHandlers(GatewayHandlers):
+    """Gateway sessions behave like /ws/chat connections."""
+
+    def __init__(self):
+        self.turns: Dict[str, CallTurns] = {}
+
+    def _turns(self, session_id: str, send: Send) -> CallTurns:
+        if session_id not in self.turns:
+            self.turns[session_id] = CallTurns(send)
+        return self.turns[session_id]
+
+    async def open_session(self, session_id: str, send: Send):
+        await asyncio.get_running_loop().run_in_executor(
+            executor, get_state_backend().register_session, session_id)
+        await send({"message": WELCOME_MESSAGE, "role": "bot"})
+
+    async def run_turn(self, session_id: str, message: str, speech_chunks: bool, send: Send):
+        if not agent:
+            await send({"error": "Service temporarily unavailable", "role": "system"})
+            return
+        await self._turns(session_id, send).run(message, session_id, speech_chunks)
+
+    async def run_audio(self, session_id: str, frames: asyncio.Queue, sample_rate: int, send: Send):
+        await run_audio_turns(self._turns(session_id, send), frames, session_id, sample_rate)
+
+    def interrupt(self, session_id: str):
+        if BARGE_IN and session_id in self.turns:
+            self.turns[session_id].interrupt()
+
+    async def close_session(self, session_id: str):
+        turns = self.turns.pop(session_id, None)
+        if turns is not None:
+            turns.interrupt("closed")
+        await end_call_session(session_id)
+
+def gateway_token(websocket: WebSocket) -> str:
+    auth = websocket.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    return websocket.query_params.get("token", "")
+
+@app.websocket("/ws/gateway")
+async def gateway_endpoint(websocket: WebSocket):
+    """
+    One authenticated connection from a voice gateway carrying many call
+    sessions; see src/gateway.py for the frame protocol.
+    """
+    token = gateway_token(websocket)
+    if not GATEWAY_TOKENS or not any(hmac.compare_digest(token.encode(), t.encode()) for t in GATEWAY_TOKENS):
+        await websocket.close(code=1008, reason="unauthorized")
+        return
+    await websocket.accept()
+    logger.info("Gateway connected")
+    try:
+        await GatewayConnection(websocket, CallSessionHandlers(), send_ws_json).serve()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Gateway connection error: {e}")
+    finally:
+        logger.info("Gateway disconnected")
 
 
 
@@ -348,6 +822,20 @@ async def get_session_status(session_id: str):
         logger.error(f"Error getting session status: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve session status")
 
+@app.get("/debug/sessions/{session_id}/turns")
+async def get_session_turns(session_id: str, limit: Optional[int] = None):
+    """Span waterfall of the session's most recent turns (in-memory, this worker only)."""
+    turns = tracing.trace_buffer.get_turns(session_id, limit)
+    if not turns:
+        raise HTTPException(status_code=404, detail="No traced turns for this session")
+    return {"session_id": session_id, "turns": turns}
+
+@app.get("/debug/llm/tiers")
+async def get_llm_tiers():
+    """Calls, latency, tokens, cost and escalation rate per call site and model tier (this worker only)."""
+    from src.utils.cascade import tier_report
+    return {"call_sites": tier_report()}
+
 @app.post("/sessions/{session_id}/cleanup")
 async def cleanup_session(session_id: str):
     """Clean up resources for a specific session."""
@@ -368,6 +856,134 @@ async def cleanup_session(session_id: str):
         logger.error(f"Error cleaning up session {session_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to cleanup session")
 
+@app.post("/callbacks", status_code=201)
+async def schedule_callback(request: CallbackScheduleRequest):
+    """Book a callback; it is handed to the callback notifier when due."""
+    try:
+        due_at = parse_due_time(request.preferred_time, request.timezone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        scheduler = get_callback_scheduler()
+    except Exception as e:
+        logger.error(f"Callback scheduler unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Callback scheduling is unavailable")
+    # Only an accepted booking that will actually be dispatched gets a 201
+    if CALLBACK_SCHEDULER_ENABLED and not scheduler.running:
+        raise HTTPException(status_code=503, detail="Callback scheduling is unavailable")
+    try:
+        callback_id = await asyncio.get_running_loop().run_in_executor(
+            executor, scheduler.schedule,
+            request.session_id, request.phone_number.strip(), due_at, request.timezone,
+        )
+    except Exception as e:
+        logger.error(f"Error scheduling callback for session {request.session_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to schedule callback")
+    logger.info(f"Callback {callback_id} scheduled for session {request.session_id}")
+    return {
+        "callback_id": callback_id,
+        "session_id": request.session_id,
+        "due_at": datetime.utcfromtimestamp(due_at).isoformat() + "Z",
+        "status": "pending",
+    }
+
+@app.get("/callbacks/{callback_id}")
+async def get_callback(callback_id: int):
+    """Status of a booked callback."""
+    callback = await asyncio.get_running_loop().run_in_executor(
+        executor, get_callback_scheduler().store.get, callback_id)
+    if callback is None:
+        raise HTTPException(status_code=404, detail="Callback not found")
+    callback["due_at"] = datetime.utcfromtimestamp(callback["due_at"]).isoformat() + "Z"
+    return callback
+
+@app.delete("/callbacks/{callback_id}")
+async def cancel_callback(callback_id: int):
+    """Cancel a callback that has not been dispatched yet."""
+    cancelled = await asyncio.get_running_loop().run_in_executor(
+        executor, get_callback_scheduler().cancel, callback_id)
+    if not cancelled:
+        raise HTTPException(status_code=409, detail="Callback is not pending")
+    return {"callback_id": callback_id, "status": "cancelled"}
+
+def require_agent_token(request: Request):
+    """Human agent endpoints take a bearer token from HANDOFF_AGENT_TOKENS."""
+    auth = request.headers.get("authorization", "")
+    token = auth[7:].strip() if auth.lower().startswith("bearer ") else ""
+    if not HANDOFF_AGENT_TOKENS or not any(hmac.compare_digest(token.encode(), t.encode()) for t in HANDOFF_AGENT_TOKENS):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+def require_handoff_owner():
+    """Under the supervisor only one worker holds the queue; /handoff/ requests are routed to it."""
+    if not isinstance(handoff, HandoffService):
+        raise HTTPException(status_code=409, detail="This worker does not hold the handoff queue")
+
+@app.get("/handoff/queue")
+async def get_handoff_queue(request: Request):
+    """Callers waiting, agents idle and busy, and the rolling handle time."""
+    require_agent_token(request)
+    require_handoff_owner()
+    return handoff.summary()
+
+@app.post("/handoff/agents/{agent_id}/ready")
+async def handoff_agent_ready(agent_id: str, request: Request):
+    """The agent can take a call: returns the next caller, or parks the agent as idle."""
+    require_agent_token(request)
+    require_handoff_owner()
+    return await handoff.agent_ready(agent_id)
+
+@app.get("/handoff/agents/{agent_id}")
+async def handoff_agent_status(agent_id: str, request: Request):
+    """The agent's current caller, if one was assigned while they were idle."""
+    require_agent_token(request)
+    require_handoff_owner()
+    return handoff.agent_status(agent_id)
+
+@app.post("/handoff/agents/{agent_id}/complete")
+async def handoff_agent_complete(agent_id: str, request: Request, ready: bool = True):
+    """End the agent's call; with ``ready`` (default) they are given the next caller."""
+    require_agent_token(request)
+    require_handoff_owner()
+    return await handoff.agent_complete(agent_id, ready)
+
+@app.delete("/handoff/agents/{agent_id}")
+async def handoff_agent_leave(agent_id: str, request: Request):
+    """Sign the agent out."""
+    require_agent_token(request)
+    require_handoff_owner()
+    if not handoff.agent_leave(agent_id):
+        raise HTTPException(status_code=404, detail="Agent not signed in")
+    return {"status": "offline", "agent_id": agent_id}
+
+def require_relay_token(request: Request):
+    """Worker-to-worker handoff calls carry the token the supervisor gave every worker."""
+    token = request.headers.get("x-relay-token", "")
+    if not HANDOFF_RELAY_TOKEN or not hmac.compare_digest(token.encode(), HANDOFF_RELAY_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@app.post("/handoff/relay/join")
+async def handoff_relay_join(join: HandoffRelayJoin, request: Request):
+    """A caller on another worker asks to talk now; updates go back to that worker."""
+    require_relay_token(request)
+    require_handoff_owner()
+    await handoff.request(join.session_id, join.reason, relay_send(join.worker, join.session_id))
+    return {"session_id": join.session_id, "status": "queued"}
+
+@app.post("/handoff/relay/leave")
+async def handoff_relay_leave(leave: HandoffRelayLeave, request: Request):
+    """A caller on another worker hung up or left the queue."""
+    require_relay_token(request)
+    require_handoff_owner()
+    return {"session_id": leave.session_id, "left": handoff.leave(leave.session_id)}
+
+@app.post("/internal/handoff/deliver")
+async def handoff_relay_deliver(delivery: HandoffRelayDelivery, request: Request):
+    """A queue update from the worker holding the queue, for a caller connected here."""
+    require_relay_token(request)
+    if isinstance(handoff, HandoffService) or not await handoff.deliver(delivery.session_id, delivery.message):
+        raise HTTPException(status_code=404, detail="Caller not connected to this worker")
+    return {"delivered": True}
+
 @app.get("/sessions/active")
 async def get_active_sessions():
     """Get list of active sessions."""
@@ -409,38 +1025,47 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 # Additional utility endpoints
+def _register_gauges():
+    """Values read at scrape time rather than recorded"""
+    metrics.gauge("active_sessions", "Sessions in the shared registry").set_function(
+        lambda: len(agent.get_active_sessions()) if agent else 0)
+    metrics.gauge("escalated_sessions", "Active sessions that were escalated").set_function(
+        lambda: len([s for s in agent.get_active_sessions() if agent.is_escalated(s)]) if agent else 0)
+    metrics.gauge("executor_queue_size", "Turns waiting for an executor thread").set_function(
+        lambda: executor._work_queue.qsize())
+    metrics.gauge("agent_initialized", "1 once the agent is ready").set_function(
+        lambda: 1 if agent else 0)
+    metrics.gauge("gateway_sessions", "Call sessions open on /ws/gateway connections").set_function(
+        active_session_count)
+    metrics.gauge("handoff_queue_length", "Callers waiting for a human agent").set_function(
+        lambda: handoff.waiting)
+    metrics.gauge("handoff_agents_idle", "Human agents waiting for a caller").set_function(
+        lambda: handoff.agents_idle)
+    metrics.gauge("callbacks_in_memory", "Callbacks due within the scheduler horizon").set_function(
+        lambda: len(get_callback_scheduler()) if CALLBACK_SCHEDULER_ENABLED else 0)
+
+_register_gauges()
+
 @app.get("/metrics")
 async def get_metrics():
-    """Get system metrics."""
-    try:
-        if not agent:
-            raise HTTPException(status_code=503, detail="Service temporarily unavailable")
-        
-        metrics = {
-            "active_sessions": len(agent.get_active_sessions()) if hasattr(agent, 'get_active_sessions') else 0,
-            "escalated_sessions": len([s for s in agent.get_active_sessions() if agent.is_escalated(s)]) if hasattr(agent, 'get_active_sessions') else 0,
-            "executor_queue_size": executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 0,
-            "agent_initialized": agent is not None,
-        }
-        
-        return metrics
-        
-    except Exception as e:
-        logger.error(f"Error getting metrics: {e}")
-        raise HTTPException(status_code=500, detail="Failed to retrieve metrics")
+    """Prometheus metrics: per-stage latency histograms, counters and gauges."""
+    # Gauges query the state backend, so render off the event loop
+    body = await asyncio.get_running_loop().run_in_executor(None, metrics.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
-    
-    # Configuration
-    # host = os.getenv("HOST", "0.0.0.0")
-    # port = int(os.getenv("PORT", 8000))
-    
-    uvicorn.run(
-        "app:app",
-        host="0.0.0.0",
-        port=8080,
-        # reload=True,
-        # log_level="info",
-
-    )
\ No newline at end of file
+    from src.constants.supervisor import WORKERS, HOST, PORT
+
+    if WORKERS > 1:
+        # One process per core, each session pinned to one of them
+        from src.supervisor import Supervisor
+        asyncio.run(Supervisor("app:app", WORKERS, HOST, PORT).run())
+    else:
+        uvicorn.run(
+            "app:app",
+            host=HOST,
+            port=PORT,
+            # reload=True,
+            # log_level="info",
+        )
\ No newline at end of file
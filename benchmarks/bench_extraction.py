@@ -0,0 +1,78 @@
+"""
+Per-turn cost of the deterministic name / policy number extractor.
+
+    python -m benchmarks.bench_extraction --turns 100000
+
+Reports the mean and percentile cost of ``extract`` alone, and of a full
+``process_turn`` against the in-memory state backend, with and without
+policyholder validation.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from src.storage.memory_backend import InMemoryStateBackend
+from src.utils.extraction import ConversationFieldExtractor
+
+SAMPLE_TURNS = [
+    "Hi there",
+    "How are you?",
+    "Hi, I want to check my policy details.",
+    "My name is Ananya Roy and my policy number is ABC123456.",
+    "Name is Raj Verma and policy number is P987654321.",
+    "my name is raj verma, policy no: p 9876 54321",
+    "I am calling about my claim",
+    "What is the status of my claim for member ID HF62415739?",
+    "That information seems outdated. My doctor just submitted more paperwork - what's happening now?",
+    "What documents do I need for my car insurance claim?",
+    "I don't understand this claim decision. Can I talk to someone?",
+    "This is taking too long. I want to speak to a manager.",
+]
+
+
+def _time_calls(func: Callable[[str], object], turns: List[str]) -> List[float]:
+    samples = []
+    for turn in turns:
+        started = time.perf_counter_ns()
+        func(turn)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    return samples
+
+
+def _report(label: str, samples: List[float]):
+    samples = sorted(samples)
+    pct = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))]
+    print(f"{label:<32} mean {statistics.fmean(samples):7.2f}us  "
+          f"p50 {pct(0.50):7.2f}us  p99 {pct(0.99):7.2f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    turns = [random.choice(SAMPLE_TURNS) for _ in range(args.turns)]
+    registered = {"ABC123456": "Ananya Roy", "P987654321": "Raj Verma"}
+
+    plain = ConversationFieldExtractor()
+    validating = ConversationFieldExtractor(lookup=registered.get)
+    backend = InMemoryStateBackend()
+    session_ids = [f"bench-{i}" for i in range(1000)]
+
+    # Warm up the regex engine and allocator
+    _time_calls(plain.extract, turns[:1000])
+
+    _report("extract", _time_calls(plain.extract, turns))
+    _report("process_turn", _time_calls(
+        lambda t: plain.process_turn(random.choice(session_ids), t, backend), turns))
+    _report("process_turn + validation", _time_calls(
+        lambda t: validating.process_turn(random.choice(session_ids), t, backend), turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Throughput of the callback scheduler against a scratch SQLite file.
+
+    python -m benchmarks.callback_scheduler --callbacks 200000
+
+Books ``--callbacks`` callbacks spread over the next ``--spread-hours``
+(a share already due), then reports: schedule() throughput one at a
+time, the startup bulk reload, and how fast the due share is claimed
+and handed to a counting notifier in batches.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Iterable, List
+
+from src.callbacks.base import CallbackNotifier, ScheduledCallback
+from src.callbacks.scheduler import CallbackScheduler
+from src.callbacks.store import CallbackStore
+from src.dbio.engine import create_registry_engine
+
+
+class CountingNotifier(CallbackNotifier):
+    name = "counting"
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.delivered = 0
+        self.batches = 0
+        self.done = threading.Event()
+
+    def notify(self, callbacks: List[ScheduledCallback]) -> Iterable[int]:
+        self.delivered += len(callbacks)
+        self.batches += 1
+        if self.delivered >= self.expected:
+            self.done.set()
+        return ()
+
+
+def run(callbacks: int, scheduled: int, due_share: float, spread_hours: float, batch_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_registry_engine(f"sqlite:///{os.path.join(tmp, 'callbacks.db')}")
+        store = CallbackStore(engine)
+        now = time.time()
+        due = int(callbacks * due_share)
+        rows = [(f"s{i}", "+15550100", now - random.uniform(0, 60), None) for i in range(due)]
+        rows += [(f"s{i}", "+15550100", now + random.uniform(60, spread_hours * 3600), None)
+                 for i in range(due, callbacks)]
+
+        started = time.perf_counter()
+        for start in range(0, len(rows), 10000):
+            store.add_many(rows[start:start + 10000])
+        print(f"bulk insert      {callbacks:>8} rows  {time.perf_counter() - started:8.2f}s")
+
+        notifier = CountingNotifier(due)
+        scheduler = CallbackScheduler(store, notifier, batch_size=batch_size)
+        started = time.perf_counter()
+        scheduler.load()
+        print(f"startup reload   {len(scheduler):>8} in heap  {time.perf_counter() - started:8.2f}s  "
+              f"(of {store.count_pending()} pending)")
+
+        started = time.perf_counter()
+        for i in range(scheduled):
+            scheduler.schedule(f"n{i}", "+15550100", now + random.uniform(600, spread_hours * 3600))
+        elapsed = time.perf_counter() - started
+        print(f"schedule()       {scheduled:>8} calls  {elapsed:8.2f}s  ({scheduled / elapsed:,.0f}/s)")
+
+        started = time.perf_counter()
+        scheduler.start()
+        notifier.done.wait(timeout=600)
+        elapsed = time.perf_counter() - started
+        scheduler.stop()
+        print(f"dispatch         {notifier.delivered:>8} due    {elapsed:8.2f}s  "
+              f"({notifier.delivered / max(elapsed, 1e-9):,.0f}/s in {notifier.batches} batches)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Callback scheduler throughput")
+    parser.add_argument("--callbacks", type=int, default=200000, help="Callbacks booked up front")
+    parser.add_argument("--scheduled", type=int, default=2000, help="Callbacks booked one at a time")
+    parser.add_argument("--due-share", type=float, default=0.25, help="Share of callbacks already due")
+    parser.add_argument("--spread-hours", type=float, default=72)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    run(args.callbacks, args.scheduled, args.due_share, args.spread_hours, args.batch_size)
@@ -0,0 +1,74 @@
+"""
+Check that importing the app stays cheap.
+
+    python -m benchmarks.import_budget --budget-ms 800
+
+Runs ``python -X importtime -c "import app"`` in a fresh interpreter and
+reports the total import time and the slowest modules (cumulative). Exits
+non-zero when the total is over ``--budget-ms`` or when a module that
+should only load on first use (the watsonx SDK, PDF and mail libraries)
+is imported eagerly.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded lazily by the warm-up or by the code path that needs them
+DEFERRED_MODULES = ("langchain_ibm", "ibm_watsonx_ai", "fpdf", "smtplib", "email.mime")
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(target: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every module ``target`` imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time budget for the app module")
+    parser.add_argument("--target", default="app")
+    parser.add_argument("--budget-ms", type=float, default=1800.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    rows = measure(args.target)
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    print(f"import {args.target}: {total_ms:.0f}ms across {len(rows)} modules (budget {args.budget_ms:.0f}ms)\n")
+
+    # Modules imported directly by the target (or by the interpreter at startup)
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: r[2], reverse=True)
+    print(f"{'cumulative':>12}  {'self':>8}  module")
+    for module, self_us, cumulative_us, _ in direct[:args.top]:
+        print(f"{cumulative_us / 1000:10.1f}ms  {self_us / 1000:6.1f}ms  {module}")
+
+    failures = []
+    eager = sorted({m for m, _, _, _ in rows if any(m == d or m.startswith(d + ".") for d in DEFERRED_MODULES)})
+    if eager:
+        failures.append(f"deferred modules imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+Local stand-ins for the watsonx chat API and the Orchestrate runs API.
+
+    python -m benchmarks.mock_upstreams --llm-latency lognormal:0.8,0.4 \\
+        --orc-latency uniform:1.0,3.0 --llm-error-rate 0.01
+
+Point the app at them with:
+
+    WX_URL=https://127.0.0.1:8443 WX_TOKEN=mock WX_VERIFY=false WX_PROJECT_ID=mock \\
+    ORCHESTRATE_URL=http://127.0.0.1:8444 ORCHESTRATE_INSTANCE_ID=mock \\
+    ORCHESTRATE_AGENT_ID=mock ORCHESTRATE_STATIC_TOKEN=mock python app.py
+
+The watsonx SDK only accepts https URLs, so the chat mock serves TLS with
+a throwaway self-signed certificate (made with the ``openssl`` CLI unless
+--certfile/--keyfile are given). Latencies are ``const:S``,
+``uniform:LO,HI``, ``normal:MU,SIGMA``, ``lognormal:MEDIAN,SIGMA`` or
+``exp:MEAN``, all in seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MODEL_ID = "meta-llama/llama-3-2-90b-vision-instruct"
+# The small tier of the model cascade (src/constants/llm.py)
+SMALL_MODEL_ID = "meta-llama/llama-3-1-8b-instruct"
+FAQ_TOOL = "search_faq_tool"
+# Turns that should go through the FAQ tool (and so through Orchestrate)
+FAQ_PATTERN = re.compile(r"\b(claim|policy|coverage|document|benefit|premium)s?\b", re.IGNORECASE)
+ESCALATION_PATTERN = re.compile(r"\b(human|agent|manager|representative|someone)\b", re.IGNORECASE)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Turn a distribution spec into a sampler returning seconds (never negative)."""
+    kind, _, params = spec.partition(":")
+    args = [float(p) for p in params.split(",") if p]
+    samplers = {
+        "const": lambda: args[0],
+        "uniform": lambda: random.uniform(args[0], args[1]),
+        "normal": lambda: random.gauss(args[0], args[1]),
+        "lognormal": lambda: random.lognormvariate(math.log(args[0]), args[1]),
+        "exp": lambda: random.expovariate(1.0 / args[0]),
+    }
+    if kind not in samplers:
+        raise argparse.ArgumentTypeError(f"Unknown latency distribution: {spec}")
+    sampler = samplers[kind]
+    return lambda: max(0.0, sampler())
+
+
+def _error_response(rng_rate: float) -> Optional[JSONResponse]:
+    if rng_rate and random.random() < rng_rate:
+        # Mix throttling and server faults like the real services do
+        status = random.choice([429, 500, 503])
+        return JSONResponse({"errors": [{"code": "mock_error", "message": f"mock {status}"}]},
+                            status_code=status)
+    return None
+
+
+# watsonx
+def _over_capacity(stats: dict, capacity: int) -> Optional[JSONResponse]:
+    # A concurrency quota: requests beyond ``capacity`` in flight are throttled
+    if capacity and stats["inflight"] > capacity:
+        stats["throttled"] += 1
+        return JSONResponse({"errors": [{"code": "too_many_requests", "message": "mock quota"}]},
+                            status_code=429)
+    return None
+
+
+def create_watsonx_app(latency: Callable[[], float], error_rate: float,
+                       tokens_per_second: float, capacity: int = 0,
+                       small_latency_ratio: float = 1.0, small_weakness: float = 0.0) -> FastAPI:
+    app = FastAPI(title="mock watsonx")
+    stats = {"chat": 0, "errors": 0, "inflight": 0, "peak_inflight": 0, "throttled": 0, "models": {}}
+
+    # Calls the SDK makes once when ChatWatsonx is constructed
+    @app.get("/ml/wml_services/v2/version")
+    async def version():
+        return {"version": "5.0.0"}
+
+    @app.get("/v2/projects/{project_id}")
+    async def project(project_id: str):
+        return {"metadata": {"guid": project_id},
+                "entity": {"storage": {"type": "assetfiles", "guid": project_id}, "compute": []}}
+
+    @app.get("/ml/v1/foundation_model_specs")
+    async def model_specs():
+        return {"total_count": 2, "limit": 200, "resources": [
+            {"model_id": model_id, "functions": [{"id": "text_chat"}, {"id": "text_generation"}]}
+            for model_id in (MODEL_ID, SMALL_MODEL_ID)
+        ]}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return stats
+
+    def reply_for(payload: dict) -> dict:
+        messages = payload.get("messages") or []
+        last = messages[-1] if messages else {}
+        tools = {t.get("function", {}).get("name") for t in payload.get("tools") or []}
+        text = last.get("content") if isinstance(last.get("content"), str) else \
+            " ".join(p.get("text", "") for p in last.get("content") or [] if isinstance(p, dict))
+
+        if last.get("role") == "tool":
+            return {"role": "assistant", "content": f"Here is what I found: {text[:400]}"}
+        if FAQ_TOOL in tools and FAQ_PATTERN.search(text or ""):
+            return {"role": "assistant", "content": "", "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:8]}",
+                "type": "function",
+                "function": {"name": FAQ_TOOL, "arguments": json.dumps({"query": text})},
+            }]}
+        # Summary prompts quote the whole transcript, escalation requests included
+        if "JSON format" in (text or ""):
+            return {"role": "assistant", "content": json.dumps({
+                "name": None, "policy_number": None,
+                "summary": "The user asked about their claim and was helped by the assistant."})}
+        if ESCALATION_PATTERN.search(text or ""):
+            return {"role": "assistant",
+                    "content": "Let me connect you with a human agent who can help."}
+        return {"role": "assistant",
+                "content": "Thanks for reaching out. I can help with claims, policies and coverage questions."}
+
+    def model_latency(payload: dict) -> float:
+        small = payload.get("model_id", MODEL_ID) != MODEL_ID
+        return latency() * (small_latency_ratio if small else 1.0)
+
+    def model_reply(payload: dict) -> tuple:
+        """The reply, weakened for a small model some of the time, and its log probabilities."""
+        model_id = payload.get("model_id", MODEL_ID)
+        stats["models"][model_id] = stats["models"].get(model_id, 0) + 1
+        message = reply_for(payload)
+        weak = model_id != MODEL_ID and random.random() < small_weakness
+        if weak and message.get("tool_calls"):
+            # A plan the cascade should not trust to a small model
+            call = message["tool_calls"][0]
+            message["tool_calls"] = [call, {**call, "id": f"call_{uuid.uuid4().hex[:8]}"}]
+        elif weak and message.get("content", "").startswith("{"):
+            message["content"] = message["content"][:40]
+        logprobs = None
+        if payload.get("logprobs"):
+            logprob = -1.5 if weak else -0.05
+            logprobs = {"content": [{"token": token, "logprob": logprob}
+                                    for token in re.findall(r"\S+\s*", message.get("content") or "")]}
+        return message, logprobs
+
+    def usage(payload: dict, message: dict) -> dict:
+        prompt = sum(len(str(m.get("content") or "")) for m in payload.get("messages") or []) // 4
+        completion = max(1, len(message.get("content") or "") // 4)
+        return {"prompt_tokens": prompt, "completion_tokens": completion,
+                "total_tokens": prompt + completion}
+
+    @app.middleware("http")
+    async def count_inflight(request: Request, call_next):
+        if not request.url.path.startswith("/ml/v1/text/chat"):
+            return await call_next(request)
+        stats["inflight"] += 1
+        stats["peak_inflight"] = max(stats["peak_inflight"], stats["inflight"])
+        throttled = _over_capacity(stats, capacity)
+        if throttled is not None:
+            stats["inflight"] -= 1
+            return throttled
+        try:
+            response = await call_next(request)
+        except BaseException:
+            stats["inflight"] -= 1
+            raise
+        body = response.body_iterator
+
+        async def counted():
+            # A stream stays in flight until its last event, not just its headers
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                stats["inflight"] -= 1
+
+        response.body_iterator = counted()
+        return response
+
+    @app.post("/ml/v1/text/chat")
+    async def chat(request: Request):
+        stats["chat"] += 1
+        payload = await request.json()
+        await asyncio.sleep(model_latency(payload))
+        error = _error_response(error_rate)
+        if error is not None:
+            stats["errors"] += 1
+            return error
+        message, logprobs = model_reply(payload)
+        choice = {"index": 0, "message": message,
+                  "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}
+        if logprobs is not None:
+            choice["logprobs"] = logprobs
+        return {
+            "id": f"chat-{uuid.uuid4().hex}",
+            "model_id": payload.get("model_id", MODEL_ID),
+            "created": int(time.time()),
+            "choices": [choice],
+            "usage": usage(payload, message),
+        }
+
+    @app.post("/ml/v1/text/chat_stream")
+    async def chat_stream(request: Request):
+        stats["chat"] += 1
+        payload = await request.json()
+        # Time to first token, then tokens at a steady rate
+        first_token = model_latency(payload)
+        error = _error_response(error_rate)
+        if error is not None:
+            stats["errors"] += 1
+            await asyncio.sleep(first_token)
+            return error
+        message, _ = model_reply(payload)
+
+        async def events():
+            await asyncio.sleep(first_token)
+            chat_id = f"chat-{uuid.uuid4().hex}"
+            if message.get("tool_calls"):
+                # The agent executor streams, so tool calls must arrive as deltas too
+                calls = [{**call, "index": i} for i, call in enumerate(message["tool_calls"])]
+                chunk = {"id": chat_id, "model_id": MODEL_ID, "created": int(time.time()),
+                         "choices": [{"index": 0, "finish_reason": "tool_calls",
+                                      "delta": {"role": "assistant", "tool_calls": calls}}],
+                         "usage": usage(payload, message)}
+                yield f"id: 0\nevent: message\ndata: {json.dumps(chunk)}\n\n"
+                return
+            words = re.findall(r"\S+\s*", message.get("content") or "")
+            for index, word in enumerate(words):
+                chunk = {"id": chat_id, "model_id": MODEL_ID, "created": int(time.time()),
+                         "choices": [{"index": 0, "finish_reason": None,
+                                      "delta": {"role": "assistant", "content": word}}]}
+                yield f"id: {index}\nevent: message\ndata: {json.dumps(chunk)}\n\n"
+                if tokens_per_second:
+                    await asyncio.sleep(1.0 / tokens_per_second)
+            final = {"id": chat_id, "model_id": MODEL_ID, "created": int(time.time()),
+                     "choices": [{"index": 0, "finish_reason": "stop", "delta": {"content": ""}}],
+                     "usage": usage(payload, message)}
+            yield f"id: {len(words)}\nevent: message\ndata: {json.dumps(final)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+# Orchestrate
+def create_orchestrate_app(latency: Callable[[], float], poll_latency: Callable[[], float],
+                           error_rate: float) -> FastAPI:
+    app = FastAPI(title="mock orchestrate")
+    # run_id -> (ready_at, answer)
+    runs: Dict[str, tuple] = {}
+    stats = {"runs": 0, "polls": 0, "errors": 0}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return {**stats, "pending": len(runs)}
+
+    @app.post("/instances/{instance_id}/v1/orchestrate/runs")
+    async def create_run(instance_id: str, request: Request):
+        stats["runs"] += 1
+        error = _error_response(error_rate)
+        if error is not None:
+            stats["errors"] += 1
+            return error
+        payload = await request.json()
+        content = (payload.get("message") or {}).get("content") or [{}]
+        question = content[0].get("text", "") if isinstance(content, list) else str(content)
+        run_id = uuid.uuid4().hex
+        answer = (f"According to our FAQ, for \"{question[:120]}\" you can check the claim status "
+                  f"online; claims are usually processed within 7 to 10 business days.")
+        runs[run_id] = (time.monotonic() + latency(), answer)
+        return {"run_id": run_id, "thread_id": payload.get("thread_id") or uuid.uuid4().hex}
+
+    @app.get("/instances/{instance_id}/v1/orchestrate/runs/{run_id}/events")
+    async def run_events(instance_id: str, run_id: str):
+        stats["polls"] += 1
+        await asyncio.sleep(poll_latency())
+        run = runs.get(run_id)
+        if run is None:
+            return JSONResponse({"detail": "run not found"}, status_code=404)
+        ready_at, answer = run
+        events = [{"event": "run.started", "data": {"run_id": run_id}}]
+        if time.monotonic() >= ready_at:
+            runs.pop(run_id, None)
+            events.append({"event": "message.created", "data": {"message": {
+                "role": "assistant", "content": [{"response_type": "text", "text": answer}]}}})
+        return events
+
+    return app
+
+
+def _self_signed_cert() -> tuple:
+    directory = tempfile.mkdtemp(prefix="mock-upstreams-")
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                    "-subj", "/CN=localhost", "-keyout", keyfile, "-out", certfile],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+async def serve(args):
+    certfile, keyfile = args.certfile, args.keyfile
+    if not certfile:
+        certfile, keyfile = _self_signed_cert()
+    watsonx = create_watsonx_app(parse_latency(args.llm_latency), args.llm_error_rate,
+                                 args.tokens_per_second, args.llm_capacity,
+                                 args.small_latency_ratio, args.small_weakness)
+    orchestrate = create_orchestrate_app(parse_latency(args.orc_latency),
+                                         parse_latency(args.orc_poll_latency), args.orc_error_rate)
+    servers = [
+        uvicorn.Server(uvicorn.Config(watsonx, host=args.host, port=args.wx_port, log_level="warning",
+                                      ssl_certfile=certfile, ssl_keyfile=keyfile, backlog=4096)),
+        uvicorn.Server(uvicorn.Config(orchestrate, host=args.host, port=args.orc_port,
+                                      log_level="warning", backlog=4096)),
+    ]
+    print(f"mock watsonx on https://{args.host}:{args.wx_port}, "
+          f"mock orchestrate on http://{args.host}:{args.orc_port}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock watsonx chat and Orchestrate runs APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--wx-port", type=int, default=8443)
+    parser.add_argument("--orc-port", type=int, default=8444)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.4",
+                        help="Chat completion latency (time to first token when streaming)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-capacity", type=int, default=0,
+                        help="Chat requests in flight before the rest get 429 (0 = unlimited)")
+    parser.add_argument("--small-latency-ratio", type=float, default=0.3,
+                        help="Latency of the small cascade model relative to the large one")
+    parser.add_argument("--small-weakness", type=float, default=0.0,
+                        help="Share of small-model replies that are degraded: a two-call tool plan, "
+                             "truncated JSON, or low log probabilities")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0,
+                        help="Streaming rate after the first token (0 = no delay)")
+    parser.add_argument("--orc-latency", default="uniform:1.0,3.0",
+                        help="Time from POST /runs until the reply event is available")
+    parser.add_argument("--orc-poll-latency", default="const:0.02", help="Latency of each events poll")
+    parser.add_argument("--orc-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
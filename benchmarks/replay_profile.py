@@ -0,0 +1,365 @@
+"""
+Replay recorded conversations through VoiceEscalationAgent.chat and profile them.
+
+    python -m benchmarks.replay_profile --db research/chat_memory.db --repeat 50 --out profile/
+
+Human turns are read from a chat_memory.db. The LLM is replaced by a
+replay model that answers each turn with the reply recorded for it
+(routing FAQ-like turns through search_faq_tool first), and
+OrchestrateClient.ask returns the same recorded reply, so the run is
+offline and deterministic and the time measured is our code plus the
+LangChain layers around it.
+
+Written to --out:
+  hotspots.txt     per-layer and per-function CPU report (cProfile)
+  profile.pstats   raw cProfile data, e.g. for snakeviz
+  stacks.folded    sampled stacks in folded format (flamegraph.pl, speedscope)
+  flamegraph.svg   flame graph of the sampled stacks
+  summary.json     per-turn timings; pass it back as --baseline to catch regressions
+"""
+
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from html import escape
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAQ_PATTERN = re.compile(r"\b(claim|policy|coverage|document|benefit|member id)s?\b", re.IGNORECASE)
+
+# (label, path fragment); the first match wins
+LAYERS = [
+    ("ours", os.path.join(REPO_ROOT, "src") + os.sep),
+    ("langchain AgentExecutor", os.path.join("langchain", "agents") + os.sep),
+    ("RunnableWithMessageHistory", os.path.join("langchain_core", "runnables", "history.py")),
+    ("prompt rendering", os.path.join("langchain_core", "prompts") + os.sep),
+    ("callbacks / tracers", os.path.join("langchain_core", "callbacks") + os.sep),
+    ("callbacks / tracers", os.path.join("langchain_core", "tracers") + os.sep),
+    ("runnables", os.path.join("langchain_core", "runnables") + os.sep),
+    ("langchain_core other", "langchain_core" + os.sep),
+    ("langchain other", "langchain" + os.sep),
+    ("pydantic", "pydantic"),
+    ("sqlalchemy", "sqlalchemy"),
+]
+
+
+def layer_of(filename: str) -> str:
+    if filename.startswith("~") or filename.startswith("<"):
+        return "builtins"
+    for label, fragment in LAYERS:
+        if fragment in filename:
+            return label
+    return "stdlib / other"
+
+
+# Recorded transcripts
+def load_turns(db_path: str, max_sessions: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+    """Each session as a list of (human text, recorded ai reply)."""
+    from src.summary_chain.batch import stream_db_sessions
+
+    sessions = []
+    for _, _, messages in stream_db_sessions(db_path):
+        turns, pending = [], None
+        for message in messages:
+            if message.type == "human":
+                pending = str(message.content)
+            elif message.type == "ai" and pending is not None:
+                turns.append((pending, str(message.content)))
+                pending = None
+        if turns:
+            sessions.append(turns)
+        if max_sessions and len(sessions) >= max_sessions:
+            break
+    return sessions
+
+
+# Replayed upstreams
+class ReplayChatModel(BaseChatModel):
+    """Answers with the reply recorded for the current turn."""
+
+    reply: str = ""
+    use_tools: bool = True
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                  tools: Optional[List[dict]] = None, **kwargs) -> ChatResult:
+        self.calls += 1
+        last = messages[-1] if messages else None
+        tool_names = {t["function"]["name"] for t in tools or []}
+        human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+        if (self.use_tools and "search_faq_tool" in tool_names and not isinstance(last, ToolMessage)
+                and human is not None and FAQ_PATTERN.search(str(human.content))):
+            message = AIMessage(content="", tool_calls=[{
+                "name": "search_faq_tool",
+                "args": {"query": str(human.content)},
+                "id": f"call_{self.calls}",
+            }])
+        else:
+            message = AIMessage(content=self.reply)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# Sampling profiler
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _label(frame) -> str:
+        path = frame.f_code.co_filename
+        if path.startswith(REPO_ROOT):
+            path = os.path.relpath(path, REPO_ROOT)
+        elif "site-packages" in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        else:
+            path = os.path.basename(path)
+        return f"{frame.f_code.co_name} ({path}:{frame.f_code.co_firstlineno})"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def render_flamegraph(counts: Dict[str, int], path: str, title: str,
+                      width: int = 1400, row_height: int = 17):
+    """Write a static flame graph SVG (roots at the bottom) for folded stack counts."""
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in counts.items():
+        node = root
+        node["value"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"name": name, "value": 0, "children": {}})
+            node["value"] += count
+    total = root["value"] or 1
+
+    def depth_of(node) -> int:
+        return 1 + max((depth_of(c) for c in node["children"].values()), default=0)
+
+    depth = depth_of(root)
+    height = (depth + 2) * row_height + 30
+    colors = {"ours": "#f28e2b", "langchain AgentExecutor": "#4e79a7",
+              "RunnableWithMessageHistory": "#59a14f", "prompt rendering": "#edc948",
+              "callbacks / tracers": "#b07aa1", "runnables": "#76b7b2", "pydantic": "#e15759",
+              "sqlalchemy": "#9c755f"}
+    rects: List[str] = []
+
+    def draw(node, x: float, level: int):
+        w = node["value"] / total * width
+        if w < 0.3:
+            return
+        y = height - (level + 1) * row_height - 10
+        match = re.search(r"\((.*):\d+\)$", node["name"])
+        layer = layer_of(os.path.join(REPO_ROOT, match.group(1)) if match and match.group(1).startswith("src")
+                         else (match.group(1) if match else ""))
+        color = colors.get(layer, "#bab0ac")
+        label = node["name"] if w > 60 else ""
+        max_chars = int(w / 7)
+        if len(label) > max_chars:
+            label = label[:max(0, max_chars - 2)] + ".."
+        pct = node["value"] / total * 100
+        rects.append(
+            f'<g><title>{escape(node["name"])} - {node["value"]} samples ({pct:.2f}%)</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{w:.2f}" height="{row_height - 1}" fill="{color}" rx="2"/>'
+            f'<text x="{x + 3:.2f}" y="{y + row_height - 5}">{escape(label)}</text></g>'
+        )
+        child_x = x
+        for child in sorted(node["children"].values(), key=lambda c: c["name"]):
+            draw(child, child_x, level + 1)
+            child_x += child["value"] / total * width
+
+    draw(root, 0.0, 0)
+    with open(path, "w") as f:
+        f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+            f'<rect width="100%" height="100%" fill="#ffffff"/>'
+            f'<text x="8" y="18" font-size="14">{escape(title)}</text>'
+            + "".join(rects) + "</svg>\n"
+        )
+
+
+# Reports
+def hotspot_report(profile: cProfile.Profile, turns: int, top: int) -> Tuple[str, Dict[str, float]]:
+    stats = pstats.Stats(profile)
+    by_layer: Dict[str, float] = defaultdict(float)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        layer = layer_of(filename)
+        by_layer[layer] += tt
+        rows.append((tt, ct, nc, layer, f"{func} ({os.path.basename(filename)}:{line})"))
+    total = sum(by_layer.values()) or 1.0
+
+    out = io.StringIO()
+    out.write(f"CPU self time by layer ({turns} turns)\n")
+    out.write(f"{'layer':<30}{'total s':>10}{'ms/turn':>10}{'share':>8}\n")
+    for layer, tt in sorted(by_layer.items(), key=lambda kv: -kv[1]):
+        out.write(f"{layer:<30}{tt:>10.3f}{tt / turns * 1000:>10.3f}{tt / total:>8.1%}\n")
+
+    for title, key in (("self time", 0), ("cumulative time", 1)):
+        out.write(f"\nTop {top} functions by {title}\n")
+        out.write(f"{'self ms/turn':>13}{'cum ms/turn':>13}{'calls/turn':>12}  {'layer':<28}function\n")
+        for tt, ct, nc, layer, name in sorted(rows, key=lambda r: -r[key])[:top]:
+            out.write(f"{tt / turns * 1000:>13.3f}{ct / turns * 1000:>13.3f}{nc / turns:>12.1f}  "
+                      f"{layer:<28}{name}\n")
+    return out.getvalue(), {layer: tt / turns * 1000 for layer, tt in by_layer.items()}
+
+
+def compare_baseline(summary: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for key in ("cpu_ms_per_turn", "wall_ms_p50"):
+        before, after = baseline.get(key), summary.get(key)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        verdict = "REGRESSION" if change > max_regression else "ok"
+        print(f"{key}: {before:.3f} -> {after:.3f} ({change:+.1%}) {verdict}")
+        ok = ok and change <= max_regression
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded conversations and profile the agent")
+    parser.add_argument("--db", default=os.path.join(REPO_ROOT, "research", "chat_memory.db"))
+    parser.add_argument("--sessions", type=int, help="Replay at most this many sessions")
+    parser.add_argument("--repeat", type=int, default=20, help="Replay the transcripts this many times")
+    parser.add_argument("--no-tools", action="store_true", help="Never route turns through search_faq_tool")
+    parser.add_argument("--interval", type=float, default=0.001, help="Stack sampling interval (s)")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--out", default="profile")
+    parser.add_argument("--baseline", help="summary.json of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    parser.add_argument("--verbose", action="store_true", help="Keep AgentExecutor console output")
+    args = parser.parse_args(argv)
+
+    sessions = load_turns(args.db, args.sessions)
+    if not sessions:
+        parser.error(f"No recorded conversations in {args.db}")
+    os.makedirs(args.out, exist_ok=True)
+
+    from src.agents import VoiceEscalationAgent
+    from src.agents.memory import MemoryManager
+    from src.agents.wxorc_agent import OrchestrateClient
+    from src.dbio.db import init_db
+    from src.storage import set_state_backend
+    from src.storage.memory_backend import InMemoryStateBackend
+
+    init_db()
+    backend = InMemoryStateBackend()
+    set_state_backend(backend)
+    model = ReplayChatModel(use_tools=not args.no_tools)
+    agent = VoiceEscalationAgent(llm=model, memory_manager=MemoryManager(backend=backend))
+
+    def replay_all(profile: Optional[cProfile.Profile] = None) -> List[Tuple[float, float]]:
+        timings = []
+        for round_no in range(args.repeat):
+            for index, turns in enumerate(sessions):
+                session_id = f"replay-{round_no}-{index}"
+                for human, reply in turns:
+                    model.reply = reply
+                    wall, cpu = time.perf_counter(), time.process_time()
+                    if profile:
+                        profile.enable()
+                    agent.chat(human, session_id)
+                    if profile:
+                        profile.disable()
+                    timings.append(((time.perf_counter() - wall) * 1000, (time.process_time() - cpu) * 1000))
+                agent.cleanup_session(session_id)
+        return timings
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with mock.patch.object(OrchestrateClient, "__init__", lambda self: None), \
+            mock.patch.object(OrchestrateClient, "ask", lambda self, question, timeout=120: model.reply):
+        with quiet:
+            # Warm up imports and caches, then one timed pass under each profiler
+            replay_all()
+            model.calls = 0
+            timings = replay_all()
+            llm_calls = model.calls
+            profile = cProfile.Profile()
+            replay_all(profile)
+            with StackSampler(threading.get_ident(), args.interval) as sampler:
+                replay_all()
+
+    turns = len(timings)
+    report, layer_ms = hotspot_report(profile, turns, args.top)
+    wall = sorted(t[0] for t in timings)
+    summary = {
+        "turns": turns,
+        "sessions": len(sessions),
+        "repeat": args.repeat,
+        "wall_ms_mean": statistics.fmean(wall),
+        "wall_ms_p50": wall[len(wall) // 2],
+        "wall_ms_p95": wall[min(len(wall) - 1, int(len(wall) * 0.95))],
+        "cpu_ms_per_turn": statistics.fmean(t[1] for t in timings),
+        "llm_calls_per_turn": llm_calls / turns,
+        "layer_self_ms_per_turn": layer_ms,
+    }
+
+    with open(os.path.join(args.out, "hotspots.txt"), "w") as f:
+        f.write(report)
+    profile.dump_stats(os.path.join(args.out, "profile.pstats"))
+    sampler.write_folded(os.path.join(args.out, "stacks.folded"))
+    render_flamegraph(sampler.counts, os.path.join(args.out, "flamegraph.svg"),
+                      f"VoiceEscalationAgent.chat replay - {turns} turns, {sum(sampler.counts.values())} samples")
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(report)
+    print(f"{turns} turns: wall p50 {summary['wall_ms_p50']:.2f}ms p95 {summary['wall_ms_p95']:.2f}ms, "
+          f"cpu {summary['cpu_ms_per_turn']:.2f}ms/turn; reports in {args.out}/")
+    if args.baseline and not compare_baseline(summary, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+The adaptive concurrency limiter against a simulated quota.
+
+    UPSTREAM_RETRY_DELAY_SECONDS=0.05 python -m benchmarks.upstream_limiter --threads 10 --capacity 4
+
+A fake upstream answers in ``--latency`` seconds and refuses (429) any
+call beyond ``--capacity`` in flight. ``--threads`` callers, half of them
+in-progress sessions and half new ones, make ``--calls`` calls each
+through ``src.upstream.call``, first without the limiter (each call
+retried with the same backoff, as the SDK would) and then with it.
+Reports the share of throttled attempts, failed calls, per-priority
+latency and where the limit settled.
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from src import upstream
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+class FakeUpstream:
+    def __init__(self, capacity: int, latency: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.inflight = 0
+        self.attempts = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.attempts += 1
+            self.inflight += 1
+            over = self.inflight > self.capacity
+            if over:
+                self.throttled += 1
+        try:
+            if over:
+                time.sleep(self.latency * 0.1)
+                raise ThrottledError()
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+def run(label: str, limited: bool, threads: int, calls: int, capacity: int, latency: float):
+    fake = FakeUpstream(capacity, latency)
+    upstream.UPSTREAM_LIMITER_ENABLED = limited
+    upstream._limiters.clear()
+    upstream._LIMITS["bench"] = (threads, 1, threads * 2)
+    timings = {upstream.IN_PROGRESS: [], upstream.NEW: []}
+    failed = [0]
+
+    def caller(index: int):
+        level = upstream.IN_PROGRESS if index % 2 else upstream.NEW
+        with upstream.priority(level):
+            for _ in range(calls):
+                started = time.perf_counter()
+                try:
+                    upstream.call("bench", fake)
+                except ThrottledError:
+                    failed[0] += 1
+                    continue
+                timings[level].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=caller, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<10} {elapsed:6.1f}s  attempts {fake.attempts:>5}  throttled {fake.throttled / fake.attempts:6.1%}  "
+          f"failed {failed[0]:>4}/{threads * calls}")
+    for level, samples in timings.items():
+        if samples:
+            samples.sort()
+            print(f"  {upstream.PRIORITY_NAMES[level]:<12} p50 {statistics.median(samples):6.3f}s  "
+                  f"p95 {samples[int(len(samples) * 0.95) - 1]:6.3f}s")
+    if limited:
+        print(f"  limit settled at {upstream.get_limiter('bench').limit:.1f} (capacity {capacity})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive concurrency limiter against a simulated quota")
+    parser.add_argument("--threads", type=int, default=10, help="Concurrent callers")
+    parser.add_argument("--calls", type=int, default=40, help="Calls per caller")
+    parser.add_argument("--capacity", type=int, default=4, help="Calls in flight before the upstream throttles")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per call")
+    args = parser.parse_args()
+    run("unlimited", False, args.threads, args.calls, args.capacity, args.latency)
+    run("adaptive", True, args.threads, args.calls, args.capacity, args.latency)
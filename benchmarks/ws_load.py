@@ -0,0 +1,222 @@
+"""
+Drive many concurrent /ws/chat conversations and report turn latency.
+
+    python -m benchmarks.ws_load --url ws://127.0.0.1:8080/ws/chat \\
+        --conversations 2000 --concurrency 1000 --turns 3
+
+Each conversation connects, waits for the welcome message, then sends
+``--turns`` scripted messages, timing each one from send to the bot's
+reply (and, with ``--speech``, to the first speech chunk). Pair it with
+``benchmarks.mock_upstreams`` to measure capacity without touching IBM
+endpoints.
+
+With ``--audio`` each turn is a synthetic utterance streamed as binary
+PCM in real time, followed by silence until the reply; latency is then
+measured from the end of the utterance (run the server with
+STT_BACKEND=stub).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import time
+from typing import Dict, List
+
+import websockets
+
+SCRIPT = [
+    "Hi there",
+    "My name is Ananya Roy and my policy number is ABC123456.",
+    "What is the status of my claim?",
+    "What documents do I need for my car insurance claim?",
+    "How long does claim processing take?",
+    "Thanks, that helps.",
+    "I don't understand this claim decision. Can I talk to someone?",
+]
+
+
+class LoadStats:
+    def __init__(self):
+        self.turn_latencies: List[float] = []
+        self.first_speech_latencies: List[float] = []
+        self.connect_latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.conversations = 0
+        self.escalations = 0
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def synth_pcm(seconds: float, sample_rate: int, level: float) -> bytes:
+    """Speech-like 16-bit PCM: a wobbling tone plus noise at ``level`` (0..1 of full scale)."""
+    amplitude = 32767 * level
+    samples = []
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        value = amplitude * (math.sin(2 * math.pi * (180 + 40 * math.sin(6 * t)) * t) * 0.8
+                             + random.uniform(-0.2, 0.2))
+        samples.append(max(-32768, min(32767, int(value))))
+    return b"".join(v.to_bytes(2, "little", signed=True) for v in samples)
+
+
+async def stream_pcm(ws, pcm: bytes, sample_rate: int, frame_ms: int = 20):
+    """Send PCM in real time, one frame every ``frame_ms``."""
+    frame_bytes = sample_rate * frame_ms // 1000 * 2
+    started = time.perf_counter()
+    for index, offset in enumerate(range(0, len(pcm), frame_bytes)):
+        await ws.send(pcm[offset:offset + frame_bytes])
+        delay = started + (index + 1) * frame_ms / 1000 - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run_audio_turn(ws, sample_rate: int, timeout: float, stats: LoadStats) -> dict:
+    await stream_pcm(ws, synth_pcm(random.uniform(1.0, 2.0), sample_rate, 0.1), sample_rate)
+    speech_ended = time.perf_counter()
+    silence = synth_pcm(0.02, sample_rate, 0.0005)
+
+    async def keep_quiet():
+        while True:
+            await stream_pcm(ws, silence, sample_rate)
+
+    # A phone line keeps sending audio; the server's VAD needs the silence
+    quiet = asyncio.create_task(keep_quiet())
+    try:
+        first_speech = False
+        while True:
+            reply = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            kind = reply.get("type")
+            if kind == "speech_chunk" and not first_speech:
+                first_speech = True
+                stats.first_speech_latencies.append(time.perf_counter() - speech_ended)
+            elif kind is None and ("message" in reply or "error" in reply):
+                stats.turn_latencies.append(time.perf_counter() - speech_ended)
+                return reply
+    finally:
+        quiet.cancel()
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def run_conversation(url: str, turns: int, think_time: float, timeout: float, stats: LoadStats,
+                           speech: bool = False, sample_rate: int = 0):
+    started = time.perf_counter()
+    if sample_rate:
+        url = f"{url}{'&' if '?' in url else '?'}sample_rate={sample_rate}"
+    try:
+        async with websockets.connect(url, open_timeout=timeout, max_queue=None) as ws:
+            welcome = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            stats.connect_latencies.append(time.perf_counter() - started)
+            session_id = welcome.get("session_id")
+            for turn in range(turns):
+                if sample_rate:
+                    reply = await run_audio_turn(ws, sample_rate, timeout, stats)
+                    if reply.get("error"):
+                        stats.error("reply_error")
+                    continue
+                message = SCRIPT[turn % len(SCRIPT)] if turn else SCRIPT[0]
+                sent = time.perf_counter()
+                await ws.send(json.dumps({"message": message, "session_id": session_id,
+                                          "speech_chunks": speech}))
+                reply = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                if reply.get("type") == "speech_chunk":
+                    stats.first_speech_latencies.append(time.perf_counter() - sent)
+                    while reply.get("type") == "speech_chunk":
+                        reply = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                stats.turn_latencies.append(time.perf_counter() - sent)
+                if reply.get("error"):
+                    stats.error("reply_error")
+                if reply.get("show_escalation_buttons"):
+                    stats.escalations += 1
+                if think_time:
+                    await asyncio.sleep(random.uniform(0.5, 1.5) * think_time)
+        stats.conversations += 1
+    except asyncio.TimeoutError:
+        stats.error("timeout")
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        stats.error(type(e).__name__)
+
+
+async def run_load(args) -> LoadStats:
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ramp_step = args.ramp / args.conversations if args.ramp else 0.0
+
+    async def one(index: int):
+        if ramp_step:
+            await asyncio.sleep(index * ramp_step)
+        async with semaphore:
+            await run_conversation(args.url, args.turns, args.think_time, args.timeout, stats, args.speech,
+                                   args.sample_rate if args.audio else 0)
+
+    reporter = asyncio.create_task(report_progress(stats, args.report_every))
+    try:
+        await asyncio.gather(*(one(i) for i in range(args.conversations)))
+    finally:
+        reporter.cancel()
+    return stats
+
+
+async def report_progress(stats: LoadStats, every: float):
+    started = time.perf_counter()
+    while True:
+        await asyncio.sleep(every)
+        elapsed = time.perf_counter() - started
+        print(f"[{elapsed:6.1f}s] {stats.conversations} conversations, "
+              f"{len(stats.turn_latencies)} turns, p50 {percentile(stats.turn_latencies, 0.5) * 1000:.0f}ms, "
+              f"errors {sum(stats.errors.values())}")
+
+
+def print_report(stats: LoadStats, elapsed: float):
+    turns = stats.turn_latencies
+    ms = lambda v: f"{v * 1000:8.1f}ms"
+    print(f"\nconversations completed  {stats.conversations}")
+    print(f"turns                    {len(turns)} ({len(turns) / elapsed:.1f}/s over {elapsed:.1f}s)")
+    print(f"escalated replies        {stats.escalations}")
+    print(f"errors                   {stats.errors or 0}")
+    if turns:
+        print(f"turn latency   mean {ms(statistics.fmean(turns))}  p50 {ms(percentile(turns, 0.50))}  "
+              f"p95 {ms(percentile(turns, 0.95))}  p99 {ms(percentile(turns, 0.99))}  max {ms(max(turns))}")
+    if stats.first_speech_latencies:
+        first = stats.first_speech_latencies
+        print(f"first speech   mean {ms(statistics.fmean(first))}  p50 {ms(percentile(first, 0.50))}  "
+              f"p95 {ms(percentile(first, 0.95))}  p99 {ms(percentile(first, 0.99))}")
+    if stats.connect_latencies:
+        connects = stats.connect_latencies
+        print(f"connect        mean {ms(statistics.fmean(connects))}  p50 {ms(percentile(connects, 0.50))}  "
+              f"p99 {ms(percentile(connects, 0.99))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket load generator for /ws/chat")
+    parser.add_argument("--url", default="ws://127.0.0.1:8080/ws/chat")
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=500, help="Open conversations at once")
+    parser.add_argument("--turns", type=int, default=3, help="Messages per conversation")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between turns (s)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Spread conversation starts over N seconds")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-reply timeout (s)")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--speech", action="store_true",
+                        help="Request speech_chunk frames and report time to the first one")
+    parser.add_argument("--audio", action="store_true",
+                        help="Speak each turn as streamed PCM; latencies start at the end of speech")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = asyncio.run(run_load(args))
+    print_report(stats, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
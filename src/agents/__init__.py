@@ -6,26 +6,29 @@ Fixed escalation button logic and added better debugging
 import os
 import logging
 import re
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.runnables import RunnableWithMessageHistory
 
-from src.constants.llm import watsonx_llm
+from src.constants.llm import get_chat_model
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 from src.constants import *
-from src.prompts import SYSTEM_PROMPT
+from src.prompts import build_system_prompt
 from src.agents.memory import MemoryManager
-from src.tools import escalate_to_voice_tool, search_faq_tool, default_chat_tool
+from src.utils.extraction import ConversationFieldExtractor
+from src.dbio.policyholders import lookup_policyholder, verification_enabled
+from src.tools import escalate_to_voice_tool, search_faq_tool, default_chat_tool, verify_policyholder_tool
+from src.metrics import AGENT_TURN_SECONDS, MetricsCallbackHandler
+from src import tracing, upstream
+from src.utils import cancellation
+from src.utils.cancellation import CancelToken, CancellationCallbackHandler, TurnCancelled
 from src.logger import logger
 
 from dotenv import load_dotenv
 load_dotenv()
 
-# Global session state tracking
-session_escalation_states = {}
-
 
 class ResponseFormatter:
     """Dedicated class for formatting agent responses with precise escalation logic"""
@@ -194,13 +197,27 @@ class ResponseFormatter:
 
 
 class VoiceEscalationAgent:
-    def __init__(self):
-        self.llm = watsonx_llm 
+    def __init__(self, llm=None, memory_manager: MemoryManager = None):
+        # Both can be swapped out, e.g. by the replay profiler in benchmarks/
+        self.llm = llm or get_chat_model("agent")
+        # Callers are only verified once policyholders have been loaded (POLICYHOLDER_VERIFICATION)
+        self.verify_policyholders = verification_enabled()
         self.tools = [search_faq_tool, escalate_to_voice_tool, default_chat_tool]
-        self.memory_manager = MemoryManager()
+        if self.verify_policyholders:
+            self.tools.insert(0, verify_policyholder_tool)
+        else:
+            logger.info("Policyholder verification is off; callers are authenticated without a lookup")
+        self.memory_manager = memory_manager or MemoryManager()
         
         # Initialize response formatter with corrected logic
         self.formatter = ResponseFormatter()
+
+        # Name / policy number extraction on each human turn
+        self.extractor = ConversationFieldExtractor(lookup=lookup_policyholder)
+
+        # Times every LLM and tool run made during a turn
+        self.metrics_handler = MetricsCallbackHandler("agent")
+        self.tracing_handler = tracing.TracingCallbackHandler()
         
         # Create custom prompt
         self.prompt = self.create_custom_prompt()
@@ -211,7 +228,7 @@ class VoiceEscalationAgent:
     def create_custom_prompt(self):
         """Create a custom prompt template"""
         
-        ENHANCED_AGENT_PROMPT = f"""{SYSTEM_PROMPT}
+        ENHANCED_AGENT_PROMPT = f"""{build_system_prompt(self.verify_policyholders)}
 
 RESPONSE FORMAT GUIDELINES:
 - Provide complete, helpful responses for insurance queries
@@ -230,6 +247,9 @@ Remember: Only escalate to human agents when truly necessary."""
         return prompt
 
     def initialize_agent(self):
+        # langchain.agents is heavy to import; only the warm-up needs it
+        from langchain.agents import AgentExecutor, create_tool_calling_agent
+
         try:
             agent = create_tool_calling_agent(
                 llm=self.llm,
@@ -261,16 +281,52 @@ Remember: Only escalate to human agents when truly necessary."""
             logger.error(f"Failed to initialize VoiceEscalationAgent: {e}")
             raise 
 
-    def chat(self, query: str, session_id: str) -> dict:
+    def chat(self, query: str, session_id: str, callbacks: Optional[list] = None,
+             cancel: Optional[CancelToken] = None) -> dict:
+        """
+        Run one turn; ``callbacks`` are added to this invocation only (e.g.
+        speech streaming). Cancelling ``cancel`` stops the turn and raises
+        ``TurnCancelled``, leaving the chat history as it was. Its watsonx and
+        Orchestrate calls queue ahead of new sessions' after the first turn.
+        """
+        started = time.perf_counter()
+        try:
+            with cancellation.bind(cancel), upstream.session_priority(session_id):
+                return self._chat(query, session_id, callbacks, cancel, started)
+        except TurnCancelled:
+            AGENT_TURN_SECONDS.labels("cancelled").observe(time.perf_counter() - started)
+            cancellation.record_cancelled(cancel)
+            raise
+
+    def _chat(self, query: str, session_id: str, callbacks: Optional[list], cancel: Optional[CancelToken],
+              started: float) -> dict:
         try:
+            if cancel is not None:
+                # Superseded while still waiting for a worker thread
+                cancel.raise_if_cancelled()
+            with tracing.span("extract_fields"):
+                self.extract_fields(query, session_id)
             processed_query = self.preprocess_query(query)
+
+            # First, so a cancelled turn stops before the other handlers see the run
+            cancel_handlers = [CancellationCallbackHandler(cancel)] if cancel is not None else []
+            with tracing.span("agent.invoke"):
+                response = self.agent.invoke(
+                    {"input": processed_query},
+                    config={
+                        "configurable": {"session_id": session_id},
+                        "callbacks": [*cancel_handlers, self.metrics_handler, self.tracing_handler,
+                                      *(callbacks or [])],
+                    },
+                )
             
-            response = self.agent.invoke(
-                {"input": processed_query},
-                config={"configurable": {"session_id": session_id}},
-            )
-            
-            logger.info(f"Raw agent response: {response}")
+            if cancel is not None:
+                if not cancel.committed:
+                    # Cancelled too late to stop the LLM, but before the history write
+                    cancel.raise_if_cancelled()
+                cancellation.record_completed(cancel)
+
+            logger.info(f"Raw agent response (trace {tracing.current_trace_id()}): {response}")
 
             # Extract message text
             message_text = self.extract_message_text(response)
@@ -278,14 +334,32 @@ Remember: Only escalate to human agents when truly necessary."""
             # Format the response
             formatted_response = self.formatter.format_response(message_text, query)
 
+            if formatted_response["show_escalation_buttons"]:
+                self.mark_escalated(session_id)
+
+            AGENT_TURN_SECONDS.labels("escalated" if formatted_response["show_escalation_buttons"] else "ok") \
+                .observe(time.perf_counter() - started)
             return {
                 "message": formatted_response["message"],
                 "show_escalation_buttons": formatted_response["show_escalation_buttons"],
                 "session_id": session_id
             }
 
+        except TurnCancelled:
+            raise
         except Exception as e:
+            if upstream.is_overloaded(e):
+                # Nothing is broken and a human agent would not help; the caller can ask again
+                logger.warning(f"Upstream overloaded during turn of session {session_id}: {e}")
+                AGENT_TURN_SECONDS.labels("busy").observe(time.perf_counter() - started)
+                return {
+                    "message": "We're handling a lot of requests right now. Please try again in a moment.",
+                    "show_escalation_buttons": False,
+                    "session_id": session_id
+                }
             logger.error(f"Error in chat: {e}")
+            AGENT_TURN_SECONDS.labels("error").observe(time.perf_counter() - started)
+            self.mark_escalated(session_id, "agent_error")
             return {
                 "message": "I apologize for the technical difficulty. Let me connect you with a human agent who can help you right away.",
                 "show_escalation_buttons": True,
@@ -307,6 +381,13 @@ Remember: Only escalate to human agents when truly necessary."""
         else:
             return str(response)
 
+    def extract_fields(self, query: str, session_id: str):
+        """Record name and policy number from the turn in session metadata"""
+        try:
+            self.extractor.process_turn(session_id, query, self.memory_manager.backend)
+        except Exception as e:
+            logger.error(f"Field extraction failed for session {session_id}: {e}")
+
     def preprocess_query(self, query: str) -> str:
         """Preprocess query"""
         query = query.strip()
@@ -323,6 +404,7 @@ Remember: Only escalate to human agents when truly necessary."""
 
     def cleanup_session(self, session_id: str):
         self.memory_manager.cleanup(session_id)
+        upstream.forget_session(session_id)
 
     def get_conversation_history(self, session_id: str):
         return self.memory_manager.get(session_id).messages
@@ -330,5 +412,11 @@ Remember: Only escalate to human agents when truly necessary."""
     def get_active_sessions(self):
         return self.memory_manager.list_sessions()
 
+    def mark_escalated(self, session_id: str, reason: str = None):
+        try:
+            self.memory_manager.backend.set_escalation(session_id, reason)
+        except Exception as e:
+            logger.error(f"Failed to store escalation state for {session_id}: {e}")
+
     def is_escalated(self, session_id: str) -> bool:
-        return False
\ No newline at end of file
+        return self.memory_manager.backend.is_escalated(session_id)
\ No newline at end of file
@@ -19,11 +19,22 @@ fast polling, and a simple ask(question) → answer API.
 """
 
 import os
+import threading
 import subprocess, yaml, base64, json, time, requests
 from datetime import datetime, timezone
 from typing import Dict
 from dotenv import load_dotenv
 
+from src import tracing, upstream
+from src.utils import cancellation
+from src.metrics import (
+    ORCHESTRATE_POST_SECONDS,
+    ORCHESTRATE_POLL_SECONDS,
+    ORCHESTRATE_POLL_ITERATIONS,
+    ORCHESTRATE_RUN_SECONDS,
+    ORCHESTRATE_TOKEN_REFRESH_SECONDS,
+)
+
 load_dotenv()
 
 IBM_CLOUD_API_KEY       = os.getenv("IBM_CLOUD_API_KEY")
@@ -31,6 +42,14 @@ ORCHESTRATE_ENV_NAME    = os.getenv("ORCHESTRATE_ENV_NAME")
 ORCHESTRATE_URL         = os.getenv("ORCHESTRATE_URL")
 ORCHESTRATE_INSTANCE_ID = os.getenv("ORCHESTRATE_INSTANCE_ID")
 AGENT_ID     = os.getenv("ORCHESTRATE_AGENT_ID")
+# Fixed bearer token (e.g. for benchmarks/mock_upstreams.py); skips the CLI refresh
+ORCHESTRATE_STATIC_TOKEN = os.getenv("ORCHESTRATE_STATIC_TOKEN")
+
+# Shared by every client: one token refresh serves all calls until it expires,
+# and one session keeps Orchestrate connections alive between calls
+_shared_token = {"token": None, "expiry": 0}
+_token_lock   = threading.Lock()
+_http         = requests.Session()
 
 # ============ CONFIGURE THESE FIVE VALUES =============
 # IBM_CLOUD_API_KEY       = "zcLmFY4A2IVjSpbFunAfmTHDrQo3Fv3j7WfW4CuO76Sc"
@@ -43,13 +62,17 @@ AGENT_ID     = os.getenv("ORCHESTRATE_AGENT_ID")
 class OrchestrateClient:
     def __init__(self):
         # Validate required config
-        for val,name in [
-            (IBM_CLOUD_API_KEY,       "IBM_CLOUD_API_KEY"),
-            (ORCHESTRATE_ENV_NAME,    "ORCHESTRATE_ENV_NAME"),
+        required = [
             (ORCHESTRATE_URL,         "ORCHESTRATE_URL"),
             (ORCHESTRATE_INSTANCE_ID, "ORCHESTRATE_INSTANCE_ID"),
             (AGENT_ID,                "AGENT_ID"),
-        ]:
+        ]
+        if not ORCHESTRATE_STATIC_TOKEN:
+            required += [
+                (IBM_CLOUD_API_KEY,    "IBM_CLOUD_API_KEY"),
+                (ORCHESTRATE_ENV_NAME, "ORCHESTRATE_ENV_NAME"),
+            ]
+        for val,name in required:
             if not val:
                 raise ValueError(f"Missing required config: {name}")
 
@@ -59,7 +82,7 @@ class OrchestrateClient:
         self.instance_id = ORCHESTRATE_INSTANCE_ID
         self.agent_id    = AGENT_ID
 
-        self._session   = requests.Session()
+        self._session   = _http
         self._thread_id = None
         self._token     = None
         self._expiry    = 0
@@ -101,10 +124,19 @@ class OrchestrateClient:
 
     def _ensure_token(self):
         """Refresh in‑memory token if missing or expired."""
-        if not self._token or self._is_expired(self._token):
-            self._activate_env()
-            tok, exp = self._read_token_cache()
-            self._token, self._expiry = tok, exp
+        if ORCHESTRATE_STATIC_TOKEN:
+            self._token = ORCHESTRATE_STATIC_TOKEN
+            return
+        if self._token and not self._is_expired(self._token):
+            return
+        with _token_lock:
+            tok = _shared_token["token"]
+            if not tok or self._is_expired(tok):
+                with tracing.span("orchestrate.token_refresh"), ORCHESTRATE_TOKEN_REFRESH_SECONDS.time():
+                    self._activate_env()
+                    tok, exp = self._read_token_cache()
+                _shared_token.update(token=tok, expiry=exp)
+            self._token, self._expiry = tok, _shared_token["expiry"]
 
     def _headers(self) -> Dict[str,str]:
         """Build auth headers (reuse thread if set)."""
@@ -122,6 +154,10 @@ class OrchestrateClient:
         """
         Ask your agent a question and return its text reply.
         """
+        with tracing.span("orchestrate.ask") as ask_span:
+            return self._ask(question, timeout, ask_span)
+
+    def _ask(self, question: str, timeout: int, ask_span) -> str:
         # 1) POST /runs
         payload = {
             "agent_id": self.agent_id,
@@ -133,10 +169,13 @@ class OrchestrateClient:
         if self._thread_id:
             payload["thread_id"] = self._thread_id
 
-        res = self._session.post(self._runs_url,
-                                  json=payload,
-                                  headers=self._headers(),
-                                  timeout=timeout)
+        run_started = time.perf_counter()
+        headers = self._headers()
+        with tracing.span("orchestrate.post"), ORCHESTRATE_POST_SECONDS.time():
+            res = upstream.call(upstream.ORCHESTRATE, self._session.post, self._runs_url,
+                                json=payload,
+                                headers=headers,
+                                timeout=timeout)
         res.raise_for_status()
         info           = res.json()
         run_id         = info["run_id"]
@@ -145,21 +184,43 @@ class OrchestrateClient:
         # 2) Fast‑poll /events
         ev_url    = f"{self._runs_url}/{run_id}/events"
         start, dl = time.time(), 0.1
+        polls = 0
         while time.time() - start < timeout:
-            evs = self._session.get(ev_url, headers=self._headers()).json()
+            headers = self._headers()
+            polls += 1
+            with tracing.span("orchestrate.poll", poll=polls), ORCHESTRATE_POLL_SECONDS.time():
+                # One latency baseline per upstream: the POST feeds it, polls would skew it
+                evs = upstream.call(upstream.ORCHESTRATE, self._session.get, ev_url, headers=headers,
+                                    measure=False).json()
             # look for the assistant message
             for e in reversed(evs):
                 if e.get("event") == "message.created":
                     cnt = e["data"]["message"].get("content", [])
+                    ORCHESTRATE_POLL_ITERATIONS.observe(polls)
+                    ORCHESTRATE_RUN_SECONDS.labels("ok").observe(time.perf_counter() - run_started)
+                    if ask_span is not None:
+                        ask_span.attributes.update(run_id=run_id, polls=polls)
                     if isinstance(cnt, list):
                         return " ".join(p.get("text","") for p in cnt).strip()
                     if isinstance(cnt, str):
                         return cnt
-            time.sleep(dl)
+            # A superseded turn stops polling here instead of waiting for the reply
+            cancellation.sleep(dl)
             dl = min(dl * 1.2, 0.5)
 
+        ORCHESTRATE_POLL_ITERATIONS.observe(polls)
+        ORCHESTRATE_RUN_SECONDS.labels("timeout").observe(time.perf_counter() - run_started)
         raise TimeoutError(f"No reply after {timeout}s")
 
+def warm_up():
+    """Fetch the token and open a connection ahead of the first FAQ call."""
+    client = OrchestrateClient()
+    try:
+        client._session.head(client.base_url, timeout=5)
+    except requests.RequestException:
+        # Only the pooled connection matters, not the response
+        pass
+
 # === USAGE EXAMPLE ===
 # from orchestrate_client import OrchestrateClient
 # client = OrchestrateClient()
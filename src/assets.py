@@ -0,0 +1,316 @@
+"""
+Static assets: a build step that fingerprints, minifies and precompresses
+everything under static/, and the StaticFiles subclass that serves it.
+
+    python -m src.assets [--clean]
+
+For every source file the build writes ``<name>.<hash>.<ext>`` under
+ASSET_BUILD_DIR, ``.gz`` and ``.br`` siblings for text types, and a
+manifest.json mapping the logical path (``css/style.css``) to them.
+Templates link assets with ``asset_url("css/style.css")``; fingerprinted
+URLs are served as immutable, so a repeat visit sends nothing for them.
+Unfingerprinted URLs (old pages, embeds that hotlink an icon) still work
+and revalidate by ETag.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from src.constants.assets import (
+    ASSET_SOURCE_DIR,
+    ASSET_BUILD_DIR,
+    ASSET_URL_PREFIX,
+    ASSET_MAX_AGE,
+    ASSET_GZIP_LEVEL,
+    ASSET_BROTLI_QUALITY,
+)
+from src.metrics import ASSET_RESPONSES_TOTAL, ASSET_BYTES_TOTAL
+from src.logger import logger
+
+MANIFEST_NAME = "manifest.json"
+# Worth precompressing; images and fonts are compressed already
+COMPRESSIBLE = frozenset({".css", ".js", ".mjs", ".svg", ".json", ".html", ".txt", ".map", ".xml"})
+# Preferred first when the client accepts both equally
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# A variant must save at least this much to be kept
+MIN_SAVING = 0.1
+
+_CSS_STRING = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_SPACE = re.compile(r"\s+")
+# Spaces before ":" are kept: "a :hover" and "a:hover" are different selectors
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*|(:)\s+")
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def minify_css(text: str) -> str:
+    """Drop comments and whitespace that carry no meaning; strings are left alone."""
+    parts = _CSS_STRING.split(text)
+    for i in range(0, len(parts), 2):
+        code = _CSS_SPACE.sub(" ", _CSS_COMMENT.sub("", parts[i]))
+        parts[i] = _CSS_PUNCTUATION.sub(lambda m: m.group(1) or m.group(2), code)
+    return "".join(parts).replace(";}", "}").strip()
+
+
+def _minify_js(data: bytes) -> bytes:
+    try:
+        import rjsmin
+    except ImportError:
+        # Without a real minifier JS is only compressed; precompression
+        # already removes most of what minifying would
+        return data
+    return rjsmin.jsmin(data.decode("utf-8")).encode("utf-8")
+
+
+def _optimize_png(data: bytes) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    import io
+    out = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(out, format="PNG", optimize=True)
+    return out.getvalue() if out.tell() < len(data) else data
+
+
+def _compressors():
+    yield "gzip", lambda data: gzip.compress(data, compresslevel=ASSET_GZIP_LEVEL, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        logger.warning("Assets are built without .br variants; pip install brotli to add them")
+        return
+    yield "br", lambda data: brotli.compress(data, quality=ASSET_BROTLI_QUALITY)
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # Readable by a front proxy serving the build directory directly
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+class AssetManifest:
+    """Logical asset paths and their built files."""
+
+    def __init__(self, build_dir: str, entries: Dict[str, dict]):
+        self.build_dir = build_dir
+        self.entries = entries
+        self._by_file = {entry["file"]: entry for entry in entries.values()}
+
+    @classmethod
+    def load(cls, build_dir: str = ASSET_BUILD_DIR) -> Optional["AssetManifest"]:
+        try:
+            with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+                return cls(build_dir, json.load(f)["assets"])
+        except FileNotFoundError:
+            return None
+
+    def url(self, path: str) -> str:
+        entry = self.entries.get(path)
+        return f"{ASSET_URL_PREFIX}/{entry['file'] if entry else path}"
+
+    def find(self, path: str) -> Tuple[Optional[dict], bool]:
+        """The entry for a request path, and whether the path is fingerprinted."""
+        entry = self._by_file.get(path)
+        if entry is not None:
+            return entry, True
+        return self.entries.get(path), False
+
+
+def build(source_dir: str = ASSET_SOURCE_DIR, build_dir: str = ASSET_BUILD_DIR) -> AssetManifest:
+    """Build every asset under ``source_dir``; files that already exist are not rewritten."""
+    sources = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.startswith("."):
+                sources.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, "/"))
+    # Stylesheets last, so their url() references can point at fingerprinted files
+    sources.sort(key=lambda rel: rel.endswith(".css"))
+
+    compressors = list(_compressors())
+    entries: Dict[str, dict] = {}
+    for rel in sources:
+        with open(os.path.join(source_dir, rel), "rb") as f:
+            data = f.read()
+        stem, ext = posixpath.splitext(rel)
+        ext = ext.lower()
+        if ext == ".css":
+            data = _rewrite_css_urls(minify_css(data.decode("utf-8")), rel, entries).encode("utf-8")
+        elif ext in (".js", ".mjs"):
+            data = _minify_js(data)
+        elif ext == ".png":
+            data = _optimize_png(data)
+
+        digest = hashlib.sha256(data).hexdigest()
+        built = f"{stem}.{digest[:10]}{ext}"
+        entry = {"file": built, "etag": digest[:20], "size": len(data), "encodings": {}}
+        target = os.path.join(build_dir, built)
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+        if ext in COMPRESSIBLE:
+            for encoding, compress in compressors:
+                suffix = dict(ENCODINGS)[encoding]
+                if os.path.exists(target + suffix):
+                    entry["encodings"][encoding] = os.path.getsize(target + suffix)
+                    continue
+                packed = compress(data)
+                if len(packed) <= len(data) * (1 - MIN_SAVING):
+                    _write_atomic(target + suffix, packed)
+                    entry["encodings"][encoding] = len(packed)
+        entries[rel] = entry
+
+    _write_atomic(os.path.join(build_dir, MANIFEST_NAME),
+                  json.dumps({"assets": entries}, indent=2, sort_keys=True).encode("utf-8"))
+    logger.info(f"Built {len(entries)} assets into {build_dir}")
+    return AssetManifest(build_dir, entries)
+
+
+def _rewrite_css_urls(css: str, rel: str, entries: Dict[str, dict]) -> str:
+    base = posixpath.dirname(rel)
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        if url.startswith(ASSET_URL_PREFIX + "/"):
+            target = url[len(ASSET_URL_PREFIX) + 1:]
+        else:
+            target = posixpath.normpath(posixpath.join(base, url))
+        entry = entries.get(target)
+        if entry is None:
+            return match.group(0)
+        return f"url({posixpath.relpath(entry['file'], base or '.')})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+_manifest: Optional[AssetManifest] = None
+
+
+def load(build_first: bool = True) -> Optional[AssetManifest]:
+    """Build (or just load) the manifest the templates and AssetFiles use."""
+    global _manifest
+    if build_first:
+        try:
+            _manifest = build()
+            return _manifest
+        except OSError as e:
+            logger.warning(f"Asset build failed, using the last build if any: {e}")
+    _manifest = AssetManifest.load()
+    if _manifest is None:
+        logger.warning(f"No asset build in {ASSET_BUILD_DIR}; serving static/ unfingerprinted")
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when the asset is in the build."""
+    if _manifest is None:
+        return f"{ASSET_URL_PREFIX}/{path}"
+    return _manifest.url(path)
+
+
+def choose_encoding(accept_encoding: str, available: Dict[str, int]) -> Optional[str]:
+    """Best precompressed variant the client accepts; None for the plain file."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding, _ in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        # Any encoding of the same content matches
+        if tag.removeprefix("W/").strip('"').split("-")[0] == etag:
+            return True
+    return False
+
+
+class AssetFiles(StaticFiles):
+    """
+    StaticFiles that serves built assets: the precompressed variant the
+    client accepts, a content ETag, and immutable caching for
+    fingerprinted URLs. Paths not in the build fall through to the source
+    directory.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        entry, fingerprinted = _manifest.find(path) if _manifest else (None, False)
+        if entry is None or scope["method"] not in ("GET", "HEAD"):
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("cache-control", "no-cache")
+            return response
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), entry["encodings"])
+        headers = {
+            "etag": f'"{entry["etag"]}-{encoding}"' if encoding else f'"{entry["etag"]}"',
+            "vary": "Accept-Encoding",
+            "cache-control": f"public, max-age={ASSET_MAX_AGE}, immutable" if fingerprinted else "no-cache",
+        }
+        label = encoding or "identity"
+        if _etag_matches(request_headers.get("if-none-match"), entry["etag"]):
+            ASSET_RESPONSES_TOTAL.labels(label, "304").inc()
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["content-encoding"] = encoding
+        ASSET_RESPONSES_TOTAL.labels(label, "200").inc()
+        if scope["method"] == "GET":
+            ASSET_BYTES_TOTAL.labels(label).inc(entry["encodings"].get(encoding, entry["size"]))
+        return FileResponse(
+            os.path.join(_manifest.build_dir, entry["file"] + dict(ENCODINGS).get(encoding, "")),
+            media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            headers=headers,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint, minify and precompress static assets")
+    parser.add_argument("--source-dir", default=ASSET_SOURCE_DIR)
+    parser.add_argument("--build-dir", default=ASSET_BUILD_DIR)
+    parser.add_argument("--clean", action="store_true", help="Remove earlier builds first")
+    args = parser.parse_args()
+
+    if args.clean:
+        shutil.rmtree(args.build_dir, ignore_errors=True)
+    manifest = build(args.source_dir, args.build_dir)
+    for rel, entry in sorted(manifest.entries.items()):
+        variants = ", ".join(f"{name} {size}" for name, size in entry["encodings"].items())
+        print(f"{rel:32s} -> {entry['file']}  {entry['size']} bytes{'  (' + variants + ')' if variants else ''}")
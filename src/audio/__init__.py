@@ -0,0 +1,49 @@
+"""
+Server-side speech input: voice activity detection and pluggable CPU
+speech-to-text. Select the recognizer with the STT_BACKEND environment
+variable and the VAD with VAD_BACKEND.
+"""
+
+import threading
+from typing import Optional
+
+from src.audio.base import SpeechToText, TranscriptionStream
+from src.constants.audio import STT_BACKEND
+
+_backend: Optional[SpeechToText] = None
+_backend_lock = threading.Lock()
+
+
+def create_stt_backend(kind: str = None, **kwargs) -> SpeechToText:
+    """Build a new recognizer of the given kind ("vosk", "whisper" or "stub")."""
+    kind = (kind or STT_BACKEND).lower()
+    if kind == "vosk":
+        from src.audio.vosk_backend import VoskSpeechToText
+        return VoskSpeechToText(**kwargs)
+    if kind == "whisper":
+        from src.audio.whisper_backend import WhisperSpeechToText
+        return WhisperSpeechToText(**kwargs)
+    if kind == "stub":
+        from src.audio.stub_backend import StubSpeechToText
+        return StubSpeechToText(**kwargs)
+    raise ValueError(f"Unknown speech-to-text backend: {kind}")
+
+
+def get_stt_backend() -> SpeechToText:
+    """Return the process-wide recognizer, loading its model on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_stt_backend()
+    return _backend
+
+
+def set_stt_backend(backend: SpeechToText):
+    """Replace the process-wide recognizer (used by tests and tooling)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+__all__ = ["SpeechToText", "TranscriptionStream", "create_stt_backend", "get_stt_backend", "set_stt_backend"]
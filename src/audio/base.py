@@ -0,0 +1,41 @@
+from abc import ABC, abstractmethod
+
+
+class TranscriptionStream:
+    """
+    One utterance being transcribed. ``feed`` is called with PCM as it
+    arrives and ``finish`` once the VAD has closed the utterance.
+
+    This default buffers the audio and transcribes it in one go; streaming
+    backends override both so most of the decoding happens during speech.
+    """
+
+    def __init__(self, backend: "SpeechToText", sample_rate: int):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self._audio = bytearray()
+
+    def feed(self, pcm: bytes):
+        self._audio.extend(pcm)
+
+    def finish(self) -> str:
+        return self.backend.transcribe(bytes(self._audio), self.sample_rate)
+
+
+class SpeechToText(ABC):
+    """
+    CPU speech-to-text over 16-bit little-endian mono PCM.
+
+    Instances are shared by every connection and called from the audio
+    executor threads, so they must be thread safe; per-utterance state
+    belongs in the ``TranscriptionStream``.
+    """
+
+    name: str = "base"
+
+    def open_stream(self, sample_rate: int) -> TranscriptionStream:
+        return TranscriptionStream(self, sample_rate)
+
+    @abstractmethod
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        """Return the transcript of a complete utterance."""
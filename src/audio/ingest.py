@@ -0,0 +1,89 @@
+"""
+Per-connection audio pipeline: PCM in, transcribed utterances out.
+
+``AudioIngest.process`` is called from the audio executor with whatever
+PCM has arrived since the last call. The VAD runs on every frame; audio
+inside an utterance goes to a transcription stream as it arrives, so when
+the VAD closes the utterance only the tail is left to decode.
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+from src.audio import SpeechToText, get_stt_backend
+from src.audio.vad import SPEECH_START, SPEECH_AUDIO, SPEECH_END, VoiceActivityDetector
+from src.metrics import AUDIO_ENDPOINT_SECONDS, AUDIO_UTTERANCES_TOTAL, STT_SECONDS
+from src.logger import logger
+
+
+class Utterance:
+    """A closed utterance and the timings needed to measure the reply against it."""
+
+    __slots__ = ("transcript", "speech_ended_at", "detected_at", "audio_seconds", "stt_seconds")
+
+    def __init__(self, transcript: str, speech_ended_at: float, detected_at: float,
+                 audio_seconds: float, stt_seconds: float):
+        self.transcript = transcript
+        # perf_counter times: last voiced frame, and the VAD closing the utterance
+        self.speech_ended_at = speech_ended_at
+        self.detected_at = detected_at
+        self.audio_seconds = audio_seconds
+        self.stt_seconds = stt_seconds
+
+
+class AudioIngest:
+    def __init__(self, sample_rate: int, stt: Optional[SpeechToText] = None,
+                 vad: Optional[VoiceActivityDetector] = None):
+        self.sample_rate = sample_rate
+        self.stt = stt or get_stt_backend()
+        self.vad = vad or VoiceActivityDetector(sample_rate)
+        self._stream = None
+        self._unfed = bytearray()
+        self._audio_bytes = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self.vad.in_speech
+
+    def process(self, pcm: bytes, received_at: Optional[float] = None) -> List[Tuple[str, Optional[Utterance]]]:
+        """
+        Returns ``(SPEECH_START, None)`` and ``(SPEECH_END, utterance)`` events.
+        ``received_at`` is the ``perf_counter`` time the last byte of ``pcm`` arrived.
+        """
+        events = []
+        for kind, audio in self.vad.feed(pcm, received_at):
+            if kind == SPEECH_START:
+                self._stream = self.stt.open_stream(self.sample_rate)
+                self._unfed = bytearray(audio)
+                self._audio_bytes = len(audio)
+                events.append((SPEECH_START, None))
+            elif kind == SPEECH_AUDIO:
+                self._unfed.extend(audio)
+                self._audio_bytes += len(audio)
+            elif kind == SPEECH_END:
+                events.append((SPEECH_END, self._finish()))
+        # One feed per call rather than per 20 ms frame
+        if self._stream is not None and self._unfed:
+            self._stream.feed(bytes(self._unfed))
+            self._unfed.clear()
+        return events
+
+    def _finish(self) -> Utterance:
+        detected_at = time.perf_counter()
+        speech_ended_at = self.vad.last_voiced_at or detected_at
+        AUDIO_ENDPOINT_SECONDS.observe(detected_at - speech_ended_at)
+        stream, self._stream = self._stream, None
+        transcript = ""
+        try:
+            if self._unfed:
+                stream.feed(bytes(self._unfed))
+                self._unfed.clear()
+            transcript = (stream.finish() or "").strip()
+            AUDIO_UTTERANCES_TOTAL.labels("transcribed" if transcript else "empty").inc()
+        except Exception as e:
+            logger.error(f"Speech-to-text ({self.stt.name}) failed: {e}")
+            AUDIO_UTTERANCES_TOTAL.labels("error").inc()
+        stt_seconds = time.perf_counter() - detected_at
+        STT_SECONDS.labels(self.stt.name).observe(stt_seconds)
+        return Utterance(transcript, speech_ended_at, detected_at,
+                         self._audio_bytes / (2 * self.sample_rate), stt_seconds)
@@ -0,0 +1,22 @@
+import itertools
+import threading
+from typing import Iterable, Optional
+
+from src.audio.base import SpeechToText
+from src.constants.audio import STT_STUB_TRANSCRIPTS
+
+
+class StubSpeechToText(SpeechToText):
+    """Ignores the audio and returns canned transcripts in turn (tests and load runs)."""
+
+    name = "stub"
+
+    def __init__(self, transcripts: Optional[Iterable[str]] = None):
+        if transcripts is None:
+            transcripts = [t.strip() for t in STT_STUB_TRANSCRIPTS.split("|") if t.strip()]
+        self._transcripts = itertools.cycle(list(transcripts) or [""])
+        self._lock = threading.Lock()
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        with self._lock:
+            return next(self._transcripts)
@@ -0,0 +1,175 @@
+"""
+Streaming voice activity detection over 16-bit mono PCM.
+
+Audio is cut into fixed frames; each frame is classified as speech or
+not, and the detector turns that into utterance boundaries: a few voiced
+frames open an utterance (with some pre-roll), a run of silence closes it.
+"""
+
+import math
+import sys
+import time
+from array import array
+from collections import deque
+from operator import mul
+from typing import Deque, List, Optional, Tuple
+
+from src.constants.audio import (
+    VAD_BACKEND,
+    VAD_WEBRTC_MODE,
+    VAD_FRAME_MS,
+    VAD_START_MS,
+    VAD_END_SILENCE_MS,
+    VAD_PREROLL_MS,
+    VAD_MAX_UTTERANCE_MS,
+    VAD_MARGIN_DB,
+    VAD_MIN_DBFS,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy comes with sentence-transformers; the fallback is ~10x slower
+    np = None
+
+_FULL_SCALE_SQUARED = 32768.0 ** 2
+
+
+def _mean_square(frame: bytes) -> float:
+    if np is not None:
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float64)
+        return float(samples.dot(samples)) / len(samples)
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return sum(map(mul, samples, samples)) / len(samples)
+
+
+def frame_dbfs(frame: bytes) -> float:
+    """RMS level of a little-endian 16-bit frame in dBFS (-120 for silence)."""
+    if len(frame) < 2:
+        return -120.0
+    mean_square = _mean_square(frame)
+    return 10 * math.log10(mean_square / _FULL_SCALE_SQUARED) if mean_square else -120.0
+
+
+class EnergyClassifier:
+    """Speech when a frame is ``margin_db`` above an adaptive noise floor and above ``min_dbfs``."""
+
+    def __init__(self, margin_db: float = VAD_MARGIN_DB, min_dbfs: float = VAD_MIN_DBFS):
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.noise_db = min_dbfs - margin_db
+
+    def is_speech(self, frame: bytes, sample_rate: int) -> bool:
+        level = frame_dbfs(frame)
+        speech = level > max(self.noise_db + self.margin_db, self.min_dbfs)
+        # The floor follows quiet frames quickly and loud ones slowly, so
+        # steady background noise is absorbed without eating speech
+        if level < self.noise_db:
+            rate = 0.3
+        else:
+            rate = 0.002 if speech else 0.02
+        self.noise_db += (level - self.noise_db) * rate
+        return speech
+
+
+class WebRTCClassifier:
+    """The WebRTC GMM classifier; frames must be 10, 20 or 30 ms at 8/16/32/48 kHz."""
+
+    def __init__(self, mode: int = VAD_WEBRTC_MODE):
+        try:
+            import webrtcvad
+        except ImportError as e:
+            raise ImportError(
+                "VAD_BACKEND=webrtc requires the 'webrtcvad' package: pip install webrtcvad"
+            ) from e
+        self._vad = webrtcvad.Vad(mode)
+
+    def is_speech(self, frame: bytes, sample_rate: int) -> bool:
+        return self._vad.is_speech(frame, sample_rate)
+
+
+def create_classifier(kind: str = None):
+    kind = (kind or VAD_BACKEND).lower()
+    if kind == "energy":
+        return EnergyClassifier()
+    if kind == "webrtc":
+        return WebRTCClassifier()
+    raise ValueError(f"Unknown VAD backend: {kind}")
+
+
+# Detector events
+SPEECH_START = "speech_start"
+SPEECH_AUDIO = "audio"
+SPEECH_END = "speech_end"
+
+
+class VoiceActivityDetector:
+    """
+    Turns a stream of PCM bytes into utterance events.
+
+    ``feed`` returns ``(SPEECH_START, preroll)``, ``(SPEECH_AUDIO, frame)``
+    for every frame inside an utterance, and ``(SPEECH_END, b"")`` once
+    ``end_silence_ms`` of silence has followed the last voiced frame.
+    ``last_voiced_at`` is the ``perf_counter`` time that frame arrived,
+    i.e. when the caller actually stopped speaking; pass ``received_at``
+    when the audio is processed later than it was received.
+    """
+
+    def __init__(self, sample_rate: int, classifier=None, frame_ms: int = VAD_FRAME_MS,
+                 start_ms: int = VAD_START_MS, end_silence_ms: int = VAD_END_SILENCE_MS,
+                 preroll_ms: int = VAD_PREROLL_MS, max_utterance_ms: int = VAD_MAX_UTTERANCE_MS):
+        self.sample_rate = sample_rate
+        self.classifier = classifier or create_classifier()
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.bytes_per_second = sample_rate * 2
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.max_frames = max_utterance_ms // frame_ms
+        self.in_speech = False
+        self.last_voiced_at: Optional[float] = None
+        self._pending = bytearray()
+        # Recent frames before an utterance; includes the onset frames
+        self._preroll: Deque[bytes] = deque(maxlen=max(self.start_frames, preroll_ms // frame_ms))
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._frames = 0
+
+    def feed(self, pcm: bytes, received_at: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        received_at = received_at or time.perf_counter()
+        self._pending.extend(pcm)
+        events = []
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            # Real-time audio: the bytes still pending arrived after this frame
+            self._frame(frame, received_at - len(self._pending) / self.bytes_per_second, events)
+        return events
+
+    def _frame(self, frame: bytes, frame_at: float, events: List[Tuple[str, bytes]]):
+        voiced = self.classifier.is_speech(frame, self.sample_rate)
+        if not self.in_speech:
+            self._preroll.append(frame)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self.in_speech = True
+                self.last_voiced_at = frame_at
+                self._silent_run = 0
+                self._frames = len(self._preroll)
+                events.append((SPEECH_START, b"".join(self._preroll)))
+                self._preroll.clear()
+            return
+
+        events.append((SPEECH_AUDIO, frame))
+        self._frames += 1
+        if voiced:
+            self._silent_run = 0
+            self.last_voiced_at = frame_at
+        else:
+            self._silent_run += 1
+        if self._silent_run >= self.end_frames or self._frames >= self.max_frames:
+            self.in_speech = False
+            self._voiced_run = 0
+            events.append((SPEECH_END, b""))
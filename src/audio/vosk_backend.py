@@ -0,0 +1,51 @@
+import json
+
+from src.audio.base import SpeechToText, TranscriptionStream
+from src.constants.audio import STT_MODEL_PATH
+from src.logger import logger
+
+
+class VoskTranscriptionStream(TranscriptionStream):
+    """Decodes while the caller speaks, so finishing only flushes the last frames."""
+
+    def __init__(self, backend: "VoskSpeechToText", sample_rate: int):
+        super().__init__(backend, sample_rate)
+        self._recognizer = backend.new_recognizer(sample_rate)
+        self._parts = []
+
+    def feed(self, pcm: bytes):
+        if self._recognizer.AcceptWaveform(pcm):
+            self._parts.append(json.loads(self._recognizer.Result()).get("text", ""))
+
+    def finish(self) -> str:
+        self._parts.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        return " ".join(part for part in self._parts if part)
+
+
+class VoskSpeechToText(SpeechToText):
+    """Streaming Kaldi recognizer; one model shared by all connections."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = STT_MODEL_PATH):
+        try:
+            import vosk
+        except ImportError as e:
+            raise ImportError(
+                "STT_BACKEND=vosk requires the 'vosk' package and a model: pip install vosk"
+            ) from e
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        logger.info(f"Vosk speech-to-text loaded from {model_path}")
+
+    def new_recognizer(self, sample_rate: int):
+        return self._vosk.KaldiRecognizer(self.model, sample_rate)
+
+    def open_stream(self, sample_rate: int) -> TranscriptionStream:
+        return VoskTranscriptionStream(self, sample_rate)
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        stream = self.open_stream(sample_rate)
+        stream.feed(pcm)
+        return stream.finish()
@@ -0,0 +1,34 @@
+from src.audio.base import SpeechToText
+from src.constants.audio import STT_WHISPER_MODEL, STT_CPU_THREADS
+from src.logger import logger
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+class WhisperSpeechToText(SpeechToText):
+    """faster-whisper on CPU with int8 weights; transcribes each utterance once it ends."""
+
+    name = "whisper"
+
+    def __init__(self, model: str = STT_WHISPER_MODEL, cpu_threads: int = STT_CPU_THREADS):
+        try:
+            import numpy as np
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError(
+                "STT_BACKEND=whisper requires the 'faster-whisper' package: pip install faster-whisper"
+            ) from e
+        self._np = np
+        self.model = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+        logger.info(f"Whisper speech-to-text loaded ({model}, {cpu_threads} threads)")
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        np = self._np
+        audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        if sample_rate != WHISPER_SAMPLE_RATE and len(audio):
+            # Linear resampling is enough for telephony-band speech
+            target = np.arange(0, len(audio), sample_rate / WHISPER_SAMPLE_RATE)
+            audio = np.interp(target, np.arange(len(audio)), audio).astype(np.float32)
+        segments, _ = self.model.transcribe(audio, language="en", beam_size=1,
+                                            vad_filter=False, condition_on_previous_text=False)
+        return " ".join(segment.text.strip() for segment in segments).strip()
@@ -0,0 +1,54 @@
+"""
+Scheduled callbacks: requests stored in SQLite and dispatched to a
+notifier when they fall due. Select the notifier with CALLBACK_NOTIFIER.
+"""
+
+import threading
+from typing import Optional
+
+from src.callbacks.base import CallbackNotifier, ScheduledCallback, parse_due_time
+from src.constants.callbacks import CALLBACK_NOTIFIER
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def create_notifier(kind: str = None, **kwargs) -> CallbackNotifier:
+    """Build a notifier of the given kind ("log" or "webhook")."""
+    kind = (kind or CALLBACK_NOTIFIER).lower()
+    if kind == "log":
+        from src.callbacks.log_notifier import LogCallbackNotifier
+        return LogCallbackNotifier(**kwargs)
+    if kind == "webhook":
+        from src.callbacks.webhook_notifier import WebhookCallbackNotifier
+        return WebhookCallbackNotifier(**kwargs)
+    raise ValueError(f"Unknown callback notifier: {kind}")
+
+
+def get_callback_scheduler():
+    """Return the process-wide scheduler, creating it (not started) on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from src.callbacks.scheduler import CallbackScheduler
+                from src.callbacks.store import CallbackStore
+                _scheduler = CallbackScheduler(CallbackStore(), create_notifier())
+    return _scheduler
+
+
+def set_callback_scheduler(scheduler: Optional["CallbackScheduler"]):
+    """Replace the process-wide scheduler (used by tests and tooling)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+__all__ = [
+    "CallbackNotifier",
+    "ScheduledCallback",
+    "parse_due_time",
+    "create_notifier",
+    "get_callback_scheduler",
+    "set_callback_scheduler",
+]
@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from src.constants.callbacks import CALLBACK_MAX_DAYS_AHEAD
+
+
+class ScheduledCallback:
+    """A callback the notifier is asked to place."""
+
+    __slots__ = ("id", "session_id", "phone_number", "due_at", "timezone", "attempts")
+
+    def __init__(self, id: int, session_id: str, phone_number: str, due_at: float,
+                 timezone: Optional[str], attempts: int):
+        self.id = id
+        self.session_id = session_id
+        self.phone_number = phone_number
+        # Epoch seconds (UTC)
+        self.due_at = due_at
+        self.timezone = timezone
+        self.attempts = attempts
+
+    def to_dict(self) -> dict:
+        return {
+            "callback_id": self.id,
+            "session_id": self.session_id,
+            "phone_number": self.phone_number,
+            "due_at": datetime.fromtimestamp(self.due_at, timezone.utc).isoformat(),
+            "timezone": self.timezone,
+            "attempt": self.attempts + 1,
+        }
+
+
+class CallbackNotifier(ABC):
+    """
+    Told when callbacks are due, a batch at a time, from the scheduler's
+    dispatch thread. Delivery is at least once: a batch interrupted by a
+    crash is handed out again after CALLBACK_CLAIM_TIMEOUT_SECONDS.
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def notify(self, callbacks: List[ScheduledCallback]) -> Iterable[int]:
+        """Deliver the batch; return the ids that failed and should be retried."""
+
+
+def parse_due_time(preferred_time: str, tz: Optional[str] = None, now: Optional[datetime] = None) -> float:
+    """
+    Epoch seconds for an ISO 8601 time. A time without an offset is read
+    in ``tz`` (an IANA name such as "Asia/Kolkata"), or UTC without one.
+    """
+    try:
+        when = datetime.fromisoformat(preferred_time.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"preferred_time must be an ISO 8601 date and time, got {preferred_time!r}")
+    if when.tzinfo is None:
+        try:
+            when = when.replace(tzinfo=ZoneInfo(tz) if tz else timezone.utc)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {tz}")
+    now = now or datetime.now(timezone.utc)
+    # A minute of slack for a time picked "now" in the browser
+    if when < now - timedelta(minutes=1):
+        raise ValueError("preferred_time is in the past")
+    if when > now + timedelta(days=CALLBACK_MAX_DAYS_AHEAD):
+        raise ValueError(f"preferred_time is more than {CALLBACK_MAX_DAYS_AHEAD} days ahead")
+    return when.timestamp()
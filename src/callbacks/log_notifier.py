@@ -0,0 +1,16 @@
+from typing import Iterable, List
+
+from src.callbacks.base import CallbackNotifier, ScheduledCallback
+from src.logger import logger
+
+
+class LogCallbackNotifier(CallbackNotifier):
+    """Writes due callbacks to the log; for development and dry runs."""
+
+    name = "log"
+
+    def notify(self, callbacks: List[ScheduledCallback]) -> Iterable[int]:
+        for callback in callbacks:
+            logger.info(f"Callback {callback.id} due: call {callback.phone_number} "
+                        f"for session {callback.session_id} (attempt {callback.attempts + 1})")
+        return ()
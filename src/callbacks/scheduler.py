@@ -0,0 +1,213 @@
+import heapq
+import threading
+import time
+import uuid
+from typing import List, Optional, Set, Tuple
+
+from src.callbacks.base import CallbackNotifier
+from src.callbacks.store import CallbackStore
+from src.constants.callbacks import (
+    CALLBACK_BATCH_SIZE,
+    CALLBACK_HORIZON_SECONDS,
+    CALLBACK_MAX_ATTEMPTS,
+    CALLBACK_RETRY_SECONDS,
+    CALLBACK_CLAIM_TIMEOUT_SECONDS,
+)
+from src.metrics import (
+    CALLBACKS_SCHEDULED_TOTAL,
+    CALLBACKS_DISPATCHED_TOTAL,
+    CALLBACK_DISPATCH_LAG_SECONDS,
+    CALLBACK_BATCH_SIZE_HISTOGRAM,
+)
+from src.logger import logger
+
+
+class CallbackScheduler:
+    """
+    Dispatches stored callbacks when they fall due.
+
+    Callbacks due before ``horizon`` are held in a min-heap of
+    (due_at, id); the dispatch thread sleeps on a condition until the head
+    is due, so nothing is polled per callback. Later callbacks stay in
+    SQLite and are pulled in by one indexed range scan each time the
+    horizon moves forward. Scheduling is an insert plus an O(log n) push.
+
+    Due callbacks are claimed in batches (pending -> dispatching) before
+    the notifier sees them, so several workers can run a scheduler on the
+    same database without placing a call twice. Delivery is at least once:
+    claims older than CALLBACK_CLAIM_TIMEOUT_SECONDS go back to pending.
+    """
+
+    def __init__(self,
+                 store: CallbackStore,
+                 notifier: CallbackNotifier,
+                 batch_size: int = CALLBACK_BATCH_SIZE,
+                 horizon_seconds: float = CALLBACK_HORIZON_SECONDS,
+                 max_attempts: int = CALLBACK_MAX_ATTEMPTS,
+                 retry_seconds: float = CALLBACK_RETRY_SECONDS,
+                 claim_timeout: float = CALLBACK_CLAIM_TIMEOUT_SECONDS):
+        self.store = store
+        self.notifier = notifier
+        self.batch_size = max(batch_size, 1)
+        self.horizon_seconds = max(horizon_seconds, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_seconds = retry_seconds
+        self.claim_timeout = claim_timeout
+        self._heap: List[Tuple[float, int]] = []
+        self._queued: Set[int] = set()
+        # Everything pending before this time is in the heap
+        self._horizon = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # Scheduling
+    def schedule(self, session_id: str, phone_number: str, due_at: float, timezone: Optional[str] = None) -> int:
+        # Insert before looking at the horizon: a refill that moves the
+        # horizon past due_at after this check is sure to see the row
+        callback_id = self.store.insert(session_id, phone_number, due_at, timezone)
+        self._push(due_at, callback_id)
+        CALLBACKS_SCHEDULED_TOTAL.inc()
+        return callback_id
+
+    def cancel(self, callback_id: int) -> bool:
+        # The heap entry is left in place; claiming skips cancelled rows
+        return self.store.cancel(callback_id)
+
+    def _push(self, due_at: float, callback_id: int):
+        with self._cond:
+            if due_at >= self._horizon or callback_id in self._queued:
+                return
+            heapq.heappush(self._heap, (due_at, callback_id))
+            self._queued.add(callback_id)
+            if self._heap[0][1] == callback_id:
+                self._cond.notify()
+
+    def _refill(self, now: float):
+        """Move the horizon forward and pull in what became due before it."""
+        released = self.store.release_stale_claims(self.claim_timeout)
+        with self._cond:
+            start = None if released or not self._horizon else self._horizon
+            self._horizon = now + self.horizon_seconds
+            end = self._horizon
+        loaded = 0
+        for due_at, callback_id in self.store.pending_between(start, end):
+            with self._cond:
+                if callback_id not in self._queued:
+                    heapq.heappush(self._heap, (due_at, callback_id))
+                    self._queued.add(callback_id)
+                    loaded += 1
+        if loaded:
+            logger.info(f"Callback scheduler loaded {loaded} callbacks due before the new horizon")
+
+    def load(self):
+        """Bulk-load every pending callback due before the horizon."""
+        started = time.perf_counter()
+        self.store.release_stale_claims(self.claim_timeout)
+        with self._cond:
+            self._horizon = time.time() + self.horizon_seconds
+            end = self._horizon
+        entries = list(self.store.pending_between(None, end))
+        with self._cond:
+            for entry in entries:
+                if entry[1] not in self._queued:
+                    self._heap.append(entry)
+                    self._queued.add(entry[1])
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        logger.info(f"Callback scheduler loaded {len(entries)} pending callbacks "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    # Background dispatch
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.load()
+        self._thread = threading.Thread(target=self._loop, name="callback-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Callback scheduler started (notifier {self.notifier.name}, "
+                    f"horizon {self.horizon_seconds}s, batch {self.batch_size}).")
+
+    @property
+    def running(self) -> bool:
+        """Whether the dispatch thread is up, i.e. booked callbacks will go out."""
+        return bool(self._thread and self._thread.is_alive() and not self._stop.is_set())
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                now = time.time()
+                # Refill a quarter of the horizon early so the heap never runs dry
+                if now >= self._horizon - self.horizon_seconds / 4:
+                    self._refill(now)
+                    continue
+                batch = self._take_due(now)
+                if batch:
+                    self.dispatch(batch)
+            except Exception as e:
+                logger.error(f"Callback dispatch failed: {e}")
+                self._stop.wait(min(self.retry_seconds, 5))
+
+    def _take_due(self, now: float) -> List[Tuple[float, int]]:
+        """Pop up to one batch of due entries, or wait until something is due."""
+        with self._cond:
+            if not self._heap or self._heap[0][0] > now:
+                head = self._heap[0][0] if self._heap else float("inf")
+                refill_at = self._horizon - self.horizon_seconds / 4
+                self._cond.wait(max(min(head, refill_at) - now, 0))
+                return []
+            batch = []
+            while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry[1])
+                batch.append(entry)
+            return batch
+
+    def dispatch(self, batch: List[Tuple[float, int]]):
+        try:
+            claimed = self.store.claim([callback_id for _, callback_id in batch], uuid.uuid4().hex)
+        except Exception:
+            # Nothing was claimed; put the entries back for the next pass
+            for due_at, callback_id in batch:
+                self._push(due_at, callback_id)
+            raise
+        if not claimed:
+            return
+
+        now = time.time()
+        CALLBACK_BATCH_SIZE_HISTOGRAM.observe(len(claimed))
+        for callback in claimed:
+            CALLBACK_DISPATCH_LAG_SECONDS.observe(max(now - callback.due_at, 0))
+        try:
+            failed, error = set(self.notifier.notify(claimed) or ()), "notifier reported failure"
+        except Exception as e:
+            logger.error(f"Callback notifier '{self.notifier.name}' failed for {len(claimed)} callbacks: {e}")
+            failed, error = {callback.id for callback in claimed}, str(e)
+
+        delivered = [callback.id for callback in claimed if callback.id not in failed]
+        self.store.complete(delivered)
+        CALLBACKS_DISPATCHED_TOTAL.labels("delivered").inc(len(delivered))
+        for callback in claimed:
+            if callback.id not in failed:
+                continue
+            if callback.attempts + 1 >= self.max_attempts:
+                self.store.fail(callback.id, error)
+                CALLBACKS_DISPATCHED_TOTAL.labels("failed").inc()
+                logger.warning(f"Callback {callback.id} for session {callback.session_id} "
+                               f"failed after {callback.attempts + 1} attempts: {error}")
+                continue
+            due_at = now + self.retry_seconds * 2 ** callback.attempts
+            self.store.retry(callback.id, due_at, error)
+            self._push(due_at, callback.id)
+            CALLBACKS_DISPATCHED_TOTAL.labels("retried").inc()
@@ -0,0 +1,197 @@
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Engine
+
+from src.callbacks.base import ScheduledCallback
+from src.constants.db import CHAT_MEMORY_ENGINE
+from src.dbio.engine import get_engine
+from src.logger import logger
+
+# Rows read per round trip when streaming the pending range
+FETCH_SIZE = 5000
+_COLUMNS = "id, session_id, phone_number, due_at, timezone, attempts"
+
+
+class CallbackStore:
+    """
+    Durable callback requests. ``due_at`` is epoch seconds; the partial
+    index on pending rows keeps range scans by due time proportional to
+    what is pending, not to everything ever booked.
+    """
+
+    def __init__(self, engine: Engine = None):
+        self.engine = engine or get_engine(CHAT_MEMORY_ENGINE)
+        self.initialize_db()
+
+    def initialize_db(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS callback_request (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    phone_number TEXT NOT NULL,
+                    due_at REAL NOT NULL,
+                    timezone TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claim_token TEXT,
+                    claimed_at REAL,
+                    created_at REAL NOT NULL,
+                    dispatched_at REAL,
+                    last_error TEXT
+                )
+            """))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_callback_request_pending_due "
+                "ON callback_request (due_at) WHERE status = 'pending'"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_callback_request_claimed "
+                "ON callback_request (claimed_at) WHERE status = 'dispatching'"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_callback_request_session "
+                "ON callback_request (session_id)"
+            ))
+
+    def insert(self, session_id: str, phone_number: str, due_at: float, timezone: Optional[str] = None) -> int:
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text("""
+                    INSERT INTO callback_request (session_id, phone_number, due_at, timezone, created_at)
+                    VALUES (:sid, :phone, :due, :tz, :now)
+                """),
+                {"sid": session_id, "phone": phone_number, "due": due_at, "tz": timezone, "now": time.time()},
+            )
+            return result.lastrowid
+
+    def add_many(self, rows: Iterable[Tuple[str, str, float, Optional[str]]]) -> int:
+        """Insert (session_id, phone_number, due_at, timezone) rows in one transaction."""
+        now = time.time()
+        params = [{"sid": s, "phone": p, "due": d, "tz": tz, "now": now} for s, p, d, tz in rows]
+        if not params:
+            return 0
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO callback_request (session_id, phone_number, due_at, timezone, created_at)
+                    VALUES (:sid, :phone, :due, :tz, :now)
+                """),
+                params,
+            )
+        return len(params)
+
+    def release_stale_claims(self, older_than: float) -> int:
+        """Hand claims left by a crashed dispatcher back to the pending set."""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text("""
+                    UPDATE callback_request SET status = 'pending', claim_token = NULL, claimed_at = NULL
+                    WHERE status = 'dispatching' AND claimed_at < :cutoff
+                """),
+                {"cutoff": time.time() - older_than},
+            )
+        if result.rowcount:
+            logger.warning(f"Released {result.rowcount} callback claims left by an earlier dispatcher")
+        return result.rowcount
+
+    def pending_between(self, start: Optional[float], end: float) -> Iterator[Tuple[float, int]]:
+        """(due_at, id) of pending callbacks with start <= due_at < end, in due order."""
+        query = "SELECT due_at, id FROM callback_request WHERE status = 'pending' AND due_at < :end"
+        params = {"end": end}
+        if start is not None:
+            query += " AND due_at >= :start"
+            params["start"] = start
+        with self.engine.connect() as conn:
+            result = conn.execute(text(query + " ORDER BY due_at"), params)
+            while True:
+                rows = result.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0], row[1]
+
+    def claim(self, ids: Sequence[int], token: str) -> List[ScheduledCallback]:
+        """
+        Mark the still-pending rows among ``ids`` as dispatching under
+        ``token`` and return them. Rows cancelled or claimed by another
+        worker since they were queued are left out.
+        """
+        if not ids:
+            return []
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE callback_request SET status = 'dispatching', claim_token = :token, claimed_at = :now
+                    WHERE status = 'pending' AND id IN :ids
+                """).bindparams(bindparam("ids", expanding=True)),
+                {"token": token, "now": time.time(), "ids": list(ids)},
+            )
+            rows = conn.execute(
+                text(f"SELECT {_COLUMNS} FROM callback_request WHERE claim_token = :token AND status = 'dispatching'"),
+                {"token": token},
+            ).fetchall()
+        return [ScheduledCallback(*row) for row in rows]
+
+    def complete(self, ids: Sequence[int]):
+        if not ids:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE callback_request
+                    SET status = 'dispatched', dispatched_at = :now, attempts = attempts + 1, claim_token = NULL
+                    WHERE id IN :ids AND status = 'dispatching'
+                """).bindparams(bindparam("ids", expanding=True)),
+                {"now": time.time(), "ids": list(ids)},
+            )
+
+    def retry(self, callback_id: int, due_at: float, error: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE callback_request
+                    SET status = 'pending', due_at = :due, attempts = attempts + 1,
+                        claim_token = NULL, claimed_at = NULL, last_error = :error
+                    WHERE id = :id AND status = 'dispatching'
+                """),
+                {"id": callback_id, "due": due_at, "error": error},
+            )
+
+    def fail(self, callback_id: int, error: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE callback_request
+                    SET status = 'failed', attempts = attempts + 1, claim_token = NULL, last_error = :error
+                    WHERE id = :id AND status = 'dispatching'
+                """),
+                {"id": callback_id, "error": error},
+            )
+
+    def cancel(self, callback_id: int) -> bool:
+        """Cancel a callback that has not been dispatched yet."""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text("UPDATE callback_request SET status = 'cancelled' WHERE id = :id AND status = 'pending'"),
+                {"id": callback_id},
+            )
+        return result.rowcount > 0
+
+    def get(self, callback_id: int) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT id, session_id, phone_number, due_at, timezone, status, attempts,
+                           created_at, dispatched_at, last_error
+                    FROM callback_request WHERE id = :id
+                """),
+                {"id": callback_id},
+            ).mappings().fetchone()
+        return dict(row) if row else None
+
+    def count_pending(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM callback_request WHERE status = 'pending'")).scalar()
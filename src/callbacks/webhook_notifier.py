@@ -0,0 +1,36 @@
+from typing import Iterable, List
+
+from src.callbacks.base import CallbackNotifier, ScheduledCallback
+from src.constants.callbacks import CALLBACK_WEBHOOK_URL, CALLBACK_WEBHOOK_TIMEOUT
+
+
+class WebhookCallbackNotifier(CallbackNotifier):
+    """
+    POSTs each batch as ``{"callbacks": [...]}`` to a dialer webhook. A
+    non-2xx response fails the whole batch; a 2xx body may list
+    ``{"failed": [ids]}`` to retry only some of them.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str = CALLBACK_WEBHOOK_URL, timeout: float = CALLBACK_WEBHOOK_TIMEOUT):
+        import requests
+
+        if not url:
+            raise ValueError("CALLBACK_WEBHOOK_URL must be set for the webhook callback notifier")
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def notify(self, callbacks: List[ScheduledCallback]) -> Iterable[int]:
+        response = self._session.post(
+            self.url,
+            json={"callbacks": [callback.to_dict() for callback in callbacks]},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        try:
+            body = response.json()
+        except ValueError:
+            return ()
+        return body.get("failed", ()) if isinstance(body, dict) else ()
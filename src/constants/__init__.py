@@ -21,6 +21,30 @@ CHUNK_OVERLAP = 200
 # Agent Configuration
 AGENT_NAME = "Insurance Agent"
 
+# Summary jobs: summaries rendered in parallel outside the request executor
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "2"))
+
+# Long transcripts are summarized map-reduce style above this many tokens
+SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", "3000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+# Rough token estimate for llama-family tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+# Per-turn tracing: recent turns kept in memory for /debug/sessions/{id}/turns
+TRACE_MAX_SESSIONS = int(os.getenv("TRACE_MAX_SESSIONS", "500"))
+TRACE_TURNS_PER_SESSION = int(os.getenv("TRACE_TURNS_PER_SESSION", "20"))
+# Optional OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+OTLP_TRACES_ENDPOINT = os.getenv("OTLP_TRACES_ENDPOINT")
+OTLP_SERVICE_NAME = os.getenv("OTLP_SERVICE_NAME", "irevo-voicebot")
+# Startup warm-up: agent construction (watsonx token and model lookup) is retried with linear backoff
+WARMUP_AGENT_ATTEMPTS = int(os.getenv("WARMUP_AGENT_ATTEMPTS", "5"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "2"))
+# Voice playback: longest sentence chunk sent to the browser for speech synthesis
+SPEECH_MAX_CHUNK_CHARS = int(os.getenv("SPEECH_MAX_CHUNK_CHARS", "220"))
+# Barge-in: a voice turn cancels the caller's turn still in progress instead of queueing behind it
+BARGE_IN = os.getenv("BARGE_IN", "true").lower() == "true"
+
 AGENT_DESCRIPTION = """
 You are a helpful bank support agent. You help customers with their banking queries. 
 You can answer questions about account issues, transactions, and general banking information. 
@@ -0,0 +1,17 @@
+import os
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Static asset pipeline (python -m src.assets): sources, and where the
+# fingerprinted, minified and precompressed copies go
+ASSET_SOURCE_DIR:str = os.getenv("ASSET_SOURCE_DIR", os.path.join(_ROOT, "static"))
+ASSET_BUILD_DIR:str = os.getenv("ASSET_BUILD_DIR", os.path.join(_ROOT, "build", "static"))
+ASSET_URL_PREFIX:str = os.getenv("ASSET_URL_PREFIX", "/static")
+# Build at startup (cheap, and a no-op for unchanged files); turn off where
+# the image already ran the build and the filesystem is read-only
+ASSET_BUILD_ON_STARTUP:bool = os.getenv("ASSET_BUILD_ON_STARTUP", "true").lower() == "true"
+# Cache lifetime of fingerprinted URLs; their content never changes
+ASSET_MAX_AGE:int = int(os.getenv("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+ASSET_GZIP_LEVEL:int = int(os.getenv("ASSET_GZIP_LEVEL", "9"))
+ASSET_BROTLI_QUALITY:int = int(os.getenv("ASSET_BROTLI_QUALITY", "11"))
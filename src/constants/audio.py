@@ -0,0 +1,31 @@
+import os
+
+
+# Binary /ws/chat frames: 16-bit little-endian mono PCM at this rate unless
+# the client connects with ?sample_rate= (8000 for telephony)
+AUDIO_SAMPLE_RATE:int = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_SAMPLE_RATES:tuple = (8000, 16000, 32000, 48000)
+# Threads for VAD and speech-to-text, separate from the agent executor
+AUDIO_WORKERS:int = int(os.getenv("AUDIO_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Voice activity detection: "energy" (no dependencies) or "webrtc" (webrtcvad)
+VAD_BACKEND:str = os.getenv("VAD_BACKEND", "energy")
+VAD_WEBRTC_MODE:int = int(os.getenv("VAD_WEBRTC_MODE", "2"))
+VAD_FRAME_MS:int = int(os.getenv("VAD_FRAME_MS", "20"))
+# Voiced audio needed to open an utterance, and silence that closes it
+VAD_START_MS:int = int(os.getenv("VAD_START_MS", "60"))
+VAD_END_SILENCE_MS:int = int(os.getenv("VAD_END_SILENCE_MS", "500"))
+# Audio kept from before the detected start so the first syllable is not cut
+VAD_PREROLL_MS:int = int(os.getenv("VAD_PREROLL_MS", "200"))
+VAD_MAX_UTTERANCE_MS:int = int(os.getenv("VAD_MAX_UTTERANCE_MS", "30000"))
+# Energy VAD: a frame is speech when this far above the noise floor and above the absolute minimum
+VAD_MARGIN_DB:float = float(os.getenv("VAD_MARGIN_DB", "12"))
+VAD_MIN_DBFS:float = float(os.getenv("VAD_MIN_DBFS", "-45"))
+
+# Speech-to-text: "vosk" (streaming), "whisper" (faster-whisper, CPU int8) or "stub"
+STT_BACKEND:str = os.getenv("STT_BACKEND", "vosk")
+STT_MODEL_PATH:str = os.getenv("STT_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+STT_WHISPER_MODEL:str = os.getenv("STT_WHISPER_MODEL", "base.en")
+STT_CPU_THREADS:int = int(os.getenv("STT_CPU_THREADS", "2"))
+# Stub backend: transcripts returned in turn, separated by "|"
+STT_STUB_TRANSCRIPTS:str = os.getenv("STT_STUB_TRANSCRIPTS", "What documents do I need for my car insurance claim?")
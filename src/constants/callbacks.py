@@ -0,0 +1,21 @@
+import os
+
+
+# Scheduled callbacks (POST /callbacks), stored in the chat memory database
+CALLBACK_SCHEDULER_ENABLED:bool = os.getenv("CALLBACK_SCHEDULER_ENABLED", "true").lower() == "true"
+# Who is told that a callback is due: "log" or "webhook"
+CALLBACK_NOTIFIER:str = os.getenv("CALLBACK_NOTIFIER", "log")
+CALLBACK_WEBHOOK_URL:str = os.getenv("CALLBACK_WEBHOOK_URL", "")
+CALLBACK_WEBHOOK_TIMEOUT:float = float(os.getenv("CALLBACK_WEBHOOK_TIMEOUT", "10"))
+# Due callbacks handed to the notifier in one call
+CALLBACK_BATCH_SIZE:int = int(os.getenv("CALLBACK_BATCH_SIZE", "500"))
+# Only callbacks due within this window are kept in memory; later ones
+# stay in SQLite until the window moves over them
+CALLBACK_HORIZON_SECONDS:int = int(os.getenv("CALLBACK_HORIZON_SECONDS", "3600"))
+# Failed notifications are retried with exponential backoff from this delay
+CALLBACK_MAX_ATTEMPTS:int = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "5"))
+CALLBACK_RETRY_SECONDS:float = float(os.getenv("CALLBACK_RETRY_SECONDS", "30"))
+# A claim older than this is from a worker that died mid-dispatch and is released
+CALLBACK_CLAIM_TIMEOUT_SECONDS:int = int(os.getenv("CALLBACK_CLAIM_TIMEOUT_SECONDS", "300"))
+# How far ahead a callback may be booked
+CALLBACK_MAX_DAYS_AHEAD:int = int(os.getenv("CALLBACK_MAX_DAYS_AHEAD", "90"))
@@ -1,4 +1,50 @@
+import os
 
 
 USER_REGISTRATION_DB_NAME:str = "chat_users.db"
-CHAT_MEMORY_DB_NAME:str = "chat_memory.db"
+CHAT_MEMORY_DB_NAME:str = os.getenv("CHAT_MEMORY_DB", "chat_memory.db")
+
+# Engine registry: names every module borrows engines by
+CHAT_MEMORY_ENGINE:str = "chat_memory"
+USER_REGISTRATION_ENGINE:str = "user_registration"
+CHAT_MEMORY_DB_URL:str = os.getenv("CHAT_MEMORY_DB_URL", f"sqlite:///{CHAT_MEMORY_DB_NAME}")
+USER_REGISTRATION_DB_URL:str = os.getenv("USER_REGISTRATION_DB_URL", f"sqlite:///{USER_REGISTRATION_DB_NAME}")
+
+# Connection pool (sized to the request executor)
+DB_POOL_SIZE:int = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW:int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT:int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE:int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE:str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS:str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE:int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS:int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB:int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+
+# Shared state backend: "sqlite" (WAL), "memory" or "redis"
+STATE_BACKEND:str = os.getenv("STATE_BACKEND", "sqlite")
+REDIS_URL:str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX:str = os.getenv("REDIS_KEY_PREFIX", "wxo:")
+# Expire idle session keys in redis after this many seconds (0 disables)
+REDIS_SESSION_TTL:int = int(os.getenv("REDIS_SESSION_TTL", "86400"))
+
+# Retention / archival of chat_memory.db
+RETENTION_ENABLED:bool = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_DAYS:int = int(os.getenv("RETENTION_DAYS", "90"))
+RETENTION_ARCHIVE_DIR:str = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+RETENTION_INTERVAL_SECONDS:int = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+# Sessions archived and deleted per transaction
+RETENTION_BATCH_SIZE:int = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+# Fraction of wall time the job may spend holding the database
+RETENTION_DUTY_CYCLE:float = float(os.getenv("RETENTION_DUTY_CYCLE", "0.2"))
+RETENTION_VACUUM_PAGES:int = int(os.getenv("RETENTION_VACUUM_PAGES", "512"))
+
+# Policyholder verification
+POLICYHOLDER_LOAD_BATCH_SIZE:int = int(os.getenv("POLICYHOLDER_LOAD_BATCH_SIZE", "10000"))
+VERIFICATION_CACHE_SIZE:int = int(os.getenv("VERIFICATION_CACHE_SIZE", "50000"))
+# Cached lookups are re-read after this many seconds, so loads by another process show up
+VERIFICATION_CACHE_TTL_SECONDS:float = float(os.getenv("VERIFICATION_CACHE_TTL_SECONDS", "300"))
+# "true" / "false", or "auto": verify callers only once user_verification has rows
+POLICYHOLDER_VERIFICATION:str = os.getenv("POLICYHOLDER_VERIFICATION", "auto").lower()
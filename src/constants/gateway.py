@@ -0,0 +1,18 @@
+import os
+
+
+# /ws/gateway: one authenticated socket carrying many call sessions.
+# Comma-separated bearer tokens; the endpoint refuses connections when unset.
+GATEWAY_TOKENS:tuple = tuple(t.strip() for t in os.getenv("GATEWAY_TOKENS", "").split(",") if t.strip())
+# Text messages a session may have queued before the server grants more credit
+GATEWAY_SESSION_WINDOW:int = int(os.getenv("GATEWAY_SESSION_WINDOW", "4"))
+# Frames waiting to be written per session; a full outbox pauses only that session's turn
+GATEWAY_SESSION_OUTBOX:int = int(os.getenv("GATEWAY_SESSION_OUTBOX", "64"))
+# Frames one session may write before the writer moves on to the next session
+GATEWAY_WRITE_QUANTUM:int = int(os.getenv("GATEWAY_WRITE_QUANTUM", "4"))
+# Agent turns in flight per gateway connection; sessions queue for a slot in arrival order
+GATEWAY_MAX_CONCURRENT_TURNS:int = int(os.getenv("GATEWAY_MAX_CONCURRENT_TURNS", "64"))
+# Binary frames queued per session before audio is dropped (250 x 20 ms = 5 s)
+GATEWAY_AUDIO_MAX_PENDING:int = int(os.getenv("GATEWAY_AUDIO_MAX_PENDING", "250"))
+GATEWAY_SESSION_IDLE_SECONDS:int = int(os.getenv("GATEWAY_SESSION_IDLE_SECONDS", "300"))
+GATEWAY_MAX_SESSIONS:int = int(os.getenv("GATEWAY_MAX_SESSIONS", "5000"))
@@ -0,0 +1,33 @@
+import os
+
+
+# "Talk now" handoff queue (src/handoff.py)
+# Comma-separated bearer tokens for the human agent endpoints (/handoff/agents/...);
+# the endpoints refuse every request when unset
+HANDOFF_AGENT_TOKENS:tuple = tuple(t.strip() for t in os.getenv("HANDOFF_AGENT_TOKENS", "").split(",") if t.strip())
+# Priority levels, 0 first. Escalation reasons map to a level as "reason:level,...";
+# other reasons get HANDOFF_DEFAULT_PRIORITY
+HANDOFF_PRIORITY_LEVELS:int = int(os.getenv("HANDOFF_PRIORITY_LEVELS", "3"))
+HANDOFF_DEFAULT_PRIORITY:int = int(os.getenv("HANDOFF_DEFAULT_PRIORITY", "1"))
+HANDOFF_REASON_PRIORITIES:dict = {
+    reason.strip(): int(level)
+    for reason, _, level in (
+        item.partition(":") for item in os.getenv(
+            "HANDOFF_REASON_PRIORITIES", "agent_error:0,system_error:0").split(",") if item.strip()
+    )
+}
+# A caller one level lower is served before a higher-priority caller who
+# arrived more than this many seconds later, so no level waits forever
+HANDOFF_PRIORITY_STEP_SECONDS:float = float(os.getenv("HANDOFF_PRIORITY_STEP_SECONDS", "120"))
+# Handle time assumed before any call has finished, and the weight of each new one
+HANDOFF_DEFAULT_HANDLE_SECONDS:float = float(os.getenv("HANDOFF_DEFAULT_HANDLE_SECONDS", "300"))
+HANDOFF_HANDLE_TIME_ALPHA:float = float(os.getenv("HANDOFF_HANDLE_TIME_ALPHA", "0.1"))
+# Queue position updates are pushed at most this often
+HANDOFF_UPDATE_SECONDS:float = float(os.getenv("HANDOFF_UPDATE_SECONDS", "2"))
+# Supervisor mode: the queue lives in one worker (SUPERVISOR_HANDOFF_WORKER) and
+# the other workers relay their callers' talk-now requests to it through the
+# supervisor. Set by the supervisor for each worker; unset, the queue is local.
+HANDOFF_RELAY_URL:str = os.getenv("HANDOFF_RELAY_URL", "")
+HANDOFF_RELAY_TOKEN:str = os.getenv("HANDOFF_RELAY_TOKEN", "")
+HANDOFF_OWNER_WORKER:int = int(os.getenv("HANDOFF_OWNER_WORKER", "0"))
+HANDOFF_RELAY_TIMEOUT_SECONDS:float = float(os.getenv("HANDOFF_RELAY_TIMEOUT_SECONDS", "10"))
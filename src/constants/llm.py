@@ -1,24 +1,152 @@
 import os
-from typing import List, Any, Optional
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+WX_API_KEY = os.getenv("WX_API_KEY")
+WX_PROJECT_ID = os.getenv("WX_PROJECT_ID")
+WX_URL = os.getenv("WX_URL", "https://au-syd.ml.cloud.ibm.com")
+# A static bearer token replaces the API key, e.g. for benchmarks/mock_upstreams.py;
+# non-cloud URLs are treated as a software install and need an instance id and version
+WX_TOKEN = os.getenv("WX_TOKEN")
+WX_INSTANCE_ID = os.getenv("WX_INSTANCE_ID", "openshift")
+WX_VERSION = os.getenv("WX_VERSION", "5.0")
+WX_VERIFY = os.getenv("WX_VERIFY", "true").lower() not in ("0", "false", "no")
+# Retries inside the watsonx SDK on 429/503/504. Off by default: throttled
+# calls are retried through the concurrency limiter instead (src/upstream.py)
+WX_MAX_RETRIES = int(os.getenv("WX_MAX_RETRIES", "0"))
 
-from langchain_ibm.chat_models import ChatWatsonx
-from ibm_watsonx_ai.foundation_models.schema import TextChatParameters
 
-parameters = TextChatParameters(
-    max_tokens=1000,
-    temperature=0.5,
-    top_p=1,
+class ModelTier(NamedTuple):
+    name: str
+    model_id: str
+    max_tokens: int
+    # USD per million tokens, prompt and completion alike, for the cost metrics
+    usd_per_million_tokens: float
+
+
+# The cascade tries the tiers in this order
+MODEL_TIERS = {
+    tier.name: tier for tier in (
+        ModelTier("small",
+                  os.getenv("WX_SMALL_MODEL_ID", "meta-llama/llama-3-1-8b-instruct"),
+                  int(os.getenv("WX_SMALL_MAX_TOKENS", "600")),
+                  float(os.getenv("WX_SMALL_USD_PER_MILLION_TOKENS", "0.2"))),
+        ModelTier("large",
+                  os.getenv("WX_LARGE_MODEL_ID", "meta-llama/llama-3-2-90b-vision-instruct"),
+                  int(os.getenv("WX_LARGE_MAX_TOKENS", "1000")),
+                  float(os.getenv("WX_LARGE_USD_PER_MILLION_TOKENS", "2.0"))),
+    )
+}
+# Model per call site, as "site:choice,...": a tier name, or "cascade" to try
+# the small tier first and escalate when its answer fails the checks below.
+# Sites: agent (tool routing and answers), small_talk (default_chat_tool),
+# summary (JSON summaries) and summary_text; unlisted sites use the large tier.
+# Opt in once WX_SMALL_MODEL_ID names a model deployed for the project, e.g.
+# "agent:cascade,small_talk:small,summary:cascade,summary_text:cascade"
+WX_CALL_SITE_MODELS:dict = {
+    site.strip(): choice.strip()
+    for site, _, choice in (
+        item.partition(":") for item in os.getenv("WX_CALL_SITE_MODELS", "").split(",") if item.strip()
     )
+}
+# Call sites whose answers must parse as JSON
+JSON_CALL_SITES = frozenset({"summary"})
+# Escalate when the small tier's mean token probability is below this (0 = off)
+WX_CASCADE_MIN_CONFIDENCE:float = float(os.getenv("WX_CASCADE_MIN_CONFIDENCE", "0.6"))
+# Escalate tool plans with more calls than this
+WX_CASCADE_MAX_TOOL_CALLS:int = int(os.getenv("WX_CASCADE_MAX_TOOL_CALLS", "1"))
+
+_models: Dict[str, Any] = {}
+_chat_models: Dict[str, Any] = {}
+_llm_lock = threading.Lock()
+
+
+def _credentials():
+    from ibm_watsonx_ai import Credentials
+
+    if WX_TOKEN:
+        return Credentials(url=WX_URL, token=WX_TOKEN, instance_id=WX_INSTANCE_ID, version=WX_VERSION,
+                           verify=WX_VERIFY)
+    return Credentials(url=WX_URL, api_key=WX_API_KEY, verify=WX_VERIFY)
+
+
+def _build_model(tier: ModelTier, logprobs: bool):
+    from ibm_watsonx_ai.foundation_models import ModelInference
+    from ibm_watsonx_ai.foundation_models.schema import TextChatParameters
+    from src.utils.watsonx import LimitedChatWatsonx
+
+    parameters = TextChatParameters(
+        max_tokens=tier.max_tokens,
+        temperature=0.5,
+        top_p=1,
+        # Token log probabilities are the cascade's confidence signal
+        logprobs=logprobs or None,
+        )
+    model = ModelInference(
+        model_id=tier.model_id,
+        credentials=_credentials(),
+        project_id=WX_PROJECT_ID,
+        params=parameters,
+        verify=WX_VERIFY,
+        max_retries=WX_MAX_RETRIES,
+    )
+    return LimitedChatWatsonx(watsonx_model=model)
+
+
+def get_model(tier: str):
+    """
+    Return the shared ChatWatsonx client of a tier, building it on first use.
+    The SDK import is heavy and construction calls the service, so
+    neither happens at import time (see the warm-up in app.py).
+    """
+    model = _models.get(tier)
+    if model is None:
+        with _llm_lock:
+            model = _models.get(tier)
+            if model is None:
+                # Only tiers a cascade can escalate from need log probabilities
+                logprobs = WX_CASCADE_MIN_CONFIDENCE > 0 and tier != list(MODEL_TIERS)[-1]
+                model = _models[tier] = _build_model(MODEL_TIERS[tier], logprobs)
+    return model
+
+
+def get_chat_model(call_site: str):
+    """
+    The model for a call site, as chosen in WX_CALL_SITE_MODELS: one tier,
+    or a cascade over all of them. Either way the call is timed and costed
+    per tier (src/utils/cascade.py).
+    """
+    chat_model = _chat_models.get(call_site)
+    if chat_model is None:
+        from src.utils.cascade import CascadeChatModel
+
+        choice = WX_CALL_SITE_MODELS.get(call_site, list(MODEL_TIERS)[-1])
+        if choice == "cascade":
+            tiers = list(MODEL_TIERS.values())
+        elif choice in MODEL_TIERS:
+            tiers = [MODEL_TIERS[choice]]
+        else:
+            raise ValueError(f"Unknown model {choice!r} for call site {call_site!r}")
+        models = [get_model(tier.name) for tier in tiers]
+        with _llm_lock:
+            chat_model = _chat_models.setdefault(call_site, CascadeChatModel(
+                call_site=call_site,
+                tiers=tiers,
+                models=models,
+                min_confidence=WX_CASCADE_MIN_CONFIDENCE,
+                max_tool_calls=WX_CASCADE_MAX_TOOL_CALLS,
+                expects_json=call_site in JSON_CALL_SITES,
+            ))
+    return chat_model
 
-WX_API_KEY = os.getenv("WX_API_KEY")
-WX_PROJECT_ID = os.getenv("WX_PROJECT_ID")
 
+def get_watsonx_llm():
+    """The large tier's client, for callers that need no call-site routing."""
+    return get_model(list(MODEL_TIERS)[-1])
 
-watsonx_llm = ChatWatsonx(
-    model_id="meta-llama/llama-3-2-90b-vision-instruct",
-    url="https://au-syd.ml.cloud.ibm.com",
-    apikey=WX_API_KEY,
-    project_id=WX_PROJECT_ID,
-    params=parameters,
-)
 
+def __getattr__(name: str):
+    # `from src.constants.llm import watsonx_llm` still works, it just builds the client
+    if name == "watsonx_llm":
+        return get_watsonx_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,22 @@
+import os
+
+
+# Supervisor mode (python -m src.supervisor, or python app.py with WORKERS > 1):
+# one public port, N uvicorn workers behind it on unix sockets
+WORKERS:int = int(os.getenv("WORKERS", "1"))
+HOST:str = os.getenv("HOST", "0.0.0.0")
+PORT:int = int(os.getenv("PORT", "8080"))
+# Where the worker sockets live; a fresh temporary directory when unset
+SUPERVISOR_SOCKET_DIR:str = os.getenv("SUPERVISOR_SOCKET_DIR", "")
+# A new worker gets this long to report healthy (warm-up done) before it is
+# given traffic anyway
+WORKER_READY_TIMEOUT_SECONDS:float = float(os.getenv("WORKER_READY_TIMEOUT_SECONDS", "180"))
+# Time a replaced worker gets to finish its requests and calls
+WORKER_GRACEFUL_SECONDS:int = int(os.getenv("WORKER_GRACEFUL_SECONDS", "30"))
+# JSON request bodies up to this size are read to route by their session_id
+SUPERVISOR_ROUTE_BODY_LIMIT:int = int(os.getenv("SUPERVISOR_ROUTE_BODY_LIMIT", "65536"))
+SUPERVISOR_HEADER_TIMEOUT_SECONDS:float = float(os.getenv("SUPERVISOR_HEADER_TIMEOUT_SECONDS", "30"))
+# The worker that holds the talk-now queue; every /handoff/ request goes to it
+SUPERVISOR_HANDOFF_WORKER:int = int(os.getenv("SUPERVISOR_HANDOFF_WORKER", "0"))
+# Slot of this process when run by the supervisor
+WORKER_INDEX:int = int(os.getenv("WORKER_INDEX", "0"))
@@ -0,0 +1,29 @@
+import os
+
+
+# Adaptive concurrency limits on outbound calls (src/upstream.py).
+# Each upstream starts at its initial limit and moves between min and max:
+# up by one per fully used window of successful calls, down by
+# UPSTREAM_BACKOFF_RATIO on throttling or a latency spike
+UPSTREAM_LIMITER_ENABLED:bool = os.getenv("UPSTREAM_LIMITER_ENABLED", "true").lower() not in ("0", "false", "no")
+WATSONX_CONCURRENCY_INITIAL:int = int(os.getenv("WATSONX_CONCURRENCY_INITIAL", "8"))
+WATSONX_CONCURRENCY_MIN:int = int(os.getenv("WATSONX_CONCURRENCY_MIN", "1"))
+WATSONX_CONCURRENCY_MAX:int = int(os.getenv("WATSONX_CONCURRENCY_MAX", "32"))
+ORCHESTRATE_CONCURRENCY_INITIAL:int = int(os.getenv("ORCHESTRATE_CONCURRENCY_INITIAL", "8"))
+ORCHESTRATE_CONCURRENCY_MIN:int = int(os.getenv("ORCHESTRATE_CONCURRENCY_MIN", "1"))
+ORCHESTRATE_CONCURRENCY_MAX:int = int(os.getenv("ORCHESTRATE_CONCURRENCY_MAX", "32"))
+UPSTREAM_BACKOFF_RATIO:float = float(os.getenv("UPSTREAM_BACKOFF_RATIO", "0.7"))
+# A call slower than this multiple of the no-load latency counts as overload
+UPSTREAM_LATENCY_TOLERANCE:float = float(os.getenv("UPSTREAM_LATENCY_TOLERANCE", "2.5"))
+# Response codes that mean the upstream is shedding load
+UPSTREAM_THROTTLE_STATUSES:tuple = tuple(
+    int(code) for code in os.getenv("UPSTREAM_THROTTLE_STATUSES", "429,502,503,504").split(",") if code.strip()
+)
+# Attempts per call when throttled, spaced by an exponential delay from
+# UPSTREAM_RETRY_DELAY_SECONDS; each attempt queues for a slot again
+UPSTREAM_MAX_ATTEMPTS:int = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+UPSTREAM_RETRY_DELAY_SECONDS:float = float(os.getenv("UPSTREAM_RETRY_DELAY_SECONDS", "0.5"))
+# A call that waits longer than this for a slot fails instead
+UPSTREAM_QUEUE_TIMEOUT_SECONDS:float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "30"))
+# Sessions remembered as already in progress; their turns queue ahead of new sessions
+UPSTREAM_SESSION_MEMORY:int = int(os.getenv("UPSTREAM_SESSION_MEMORY", "10000"))
@@ -1,14 +1,12 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from src.constants.db import USER_REGISTRATION_DB_NAME
+from src.constants.db import USER_REGISTRATION_ENGINE
+from src.dbio.engine import get_engine
 from src.dbio.models import Base
 
-engine = create_engine(
-    f"sqlite:///{USER_REGISTRATION_DB_NAME}"
-)
-Base.metadata.create_all(bind=engine)
+engine = get_engine(USER_REGISTRATION_ENGINE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
+    """Create the tables; called from the app's startup warm-up and by the CLIs"""
     Base.metadata.create_all(bind=engine)
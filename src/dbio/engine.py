@@ -0,0 +1,121 @@
+"""
+Process-wide registry of SQLAlchemy engines.
+
+Engines are created once (``configure_engines`` at startup, or lazily on
+first ``get_engine``) and shared by every module, so no request builds
+its own engine or connection pool. SQLite connections get the pragmas
+from src.constants.db applied when they are opened.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from src.constants.db import (
+    CHAT_MEMORY_ENGINE,
+    CHAT_MEMORY_DB_URL,
+    USER_REGISTRATION_ENGINE,
+    USER_REGISTRATION_DB_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+)
+from src.logger import logger
+
+DEFAULT_URLS = {
+    CHAT_MEMORY_ENGINE: CHAT_MEMORY_DB_URL,
+    USER_REGISTRATION_ENGINE: USER_REGISTRATION_DB_URL,
+}
+
+_engines: Dict[str, Engine] = {}
+_lock = threading.Lock()
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # auto_vacuum only takes effect on a new file; lets the retention job reclaim pages
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+
+def create_registry_engine(url: str) -> Engine:
+    """Build an engine with the shared pool settings and health checks."""
+    kwargs = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    is_sqlite = url.startswith("sqlite")
+    in_memory = is_sqlite and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+    if not in_memory:
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                      pool_timeout=DB_POOL_TIMEOUT)
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    engine = create_engine(url, **kwargs)
+    if is_sqlite:
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def register_engine(name: str, url: str) -> Engine:
+    """Create (or replace) the engine registered under ``name``."""
+    with _lock:
+        previous = _engines.pop(name, None)
+        _engines[name] = create_registry_engine(url)
+    if previous is not None:
+        previous.dispose()
+    logger.info(f"Engine '{name}' registered for {url}")
+    return _engines[name]
+
+
+def get_engine(name: str = CHAT_MEMORY_ENGINE) -> Engine:
+    """Borrow the shared engine for ``name``, creating it on first use."""
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    with _lock:
+        if name not in _engines:
+            if name not in DEFAULT_URLS:
+                raise KeyError(f"No engine registered under '{name}'")
+            _engines[name] = create_registry_engine(DEFAULT_URLS[name])
+        return _engines[name]
+
+
+def configure_engines(urls: Optional[Dict[str, str]] = None):
+    """Create every known engine up front (called from the app lifespan)."""
+    for name, url in (urls or DEFAULT_URLS).items():
+        if name in _engines and urls is None:
+            continue
+        register_engine(name, url)
+
+
+def check_engines() -> Dict[str, bool]:
+    """Run a trivial query on every engine; used by the health check."""
+    status = {}
+    for name, engine in list(_engines.items()):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            status[name] = True
+        except Exception as e:
+            logger.error(f"Engine '{name}' health check failed: {e}")
+            status[name] = False
+    return status
+
+
+def dispose_engines():
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,190 @@
+"""
+Policyholder records used to authenticate callers.
+
+Policy numbers are stored normalized (no whitespace, upper case) so a
+lookup is a single probe of the unique index on ``policy_number``.
+
+Load an extract (CSV with ``name`` and ``policy_number`` columns):
+    python -m src.dbio.policyholders policyholders.csv
+
+With POLICYHOLDER_VERIFICATION=auto the agent only asks callers to be
+verified once the table has rows, checked when the agent is built; restart
+the app after the first load.
+"""
+
+import argparse
+import csv
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from src.constants.db import (
+    POLICYHOLDER_LOAD_BATCH_SIZE,
+    POLICYHOLDER_VERIFICATION,
+    VERIFICATION_CACHE_SIZE,
+    VERIFICATION_CACHE_TTL_SECONDS,
+)
+from src.dbio.db import engine, init_db
+from src.dbio.models import UserVerification
+from src.logger import logger
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_policy_number(policy_number: str) -> str:
+    return _WHITESPACE.sub("", policy_number or "").upper()
+
+
+def normalize_name(name: str) -> str:
+    return " ".join((name or "").split()).casefold()
+
+
+def _batches(rows: Iterable[Dict[str, str]], batch_size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        policy_number = normalize_policy_number(row.get("policy_number", ""))
+        name = " ".join((row.get("name") or "").split())
+        if not policy_number or not name:
+            continue
+        batch.append({"name": name, "policy_number": policy_number})
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_load_policyholders(rows: Iterable[Dict[str, str]],
+                            batch_size: int = POLICYHOLDER_LOAD_BATCH_SIZE,
+                            replace: bool = True) -> int:
+    """
+    Insert policyholder rows in batches inside one transaction.
+
+    ``rows`` is any iterable of dicts with ``name`` and ``policy_number``
+    (e.g. a ``csv.DictReader``), consumed lazily so extracts with millions
+    of rows are never fully held in memory. Existing policy numbers are
+    overwritten when ``replace`` is set, otherwise skipped.
+    """
+    statement = insert(UserVerification.__table__).prefix_with(
+        "OR REPLACE" if replace else "OR IGNORE"
+    )
+    total = 0
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for batch in _batches(rows, batch_size):
+            conn.execute(statement, batch)
+            total += len(batch)
+    _cache.clear()
+    logger.info(f"Loaded {total} policyholders in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+def load_policyholders_csv(path: str, batch_size: int = POLICYHOLDER_LOAD_BATCH_SIZE,
+                           replace: bool = True) -> int:
+    with open(path, newline="", encoding="utf-8") as f:
+        return bulk_load_policyholders(csv.DictReader(f), batch_size=batch_size, replace=replace)
+
+
+class _NameCache:
+    """
+    Registered names by policy number, kept for ``ttl`` seconds.
+
+    Only hits are stored: a caller who is rejected before an extract is
+    loaded (possibly by another process) is looked up again next time.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, policy_number: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(policy_number)
+            if entry is None:
+                return None
+            expires_at, name = entry
+            if expires_at <= time.monotonic():
+                del self._entries[policy_number]
+                return None
+            self._entries.move_to_end(policy_number)
+            return name
+
+    def put(self, policy_number: str, name: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[policy_number] = (time.monotonic() + self.ttl, name)
+            self._entries.move_to_end(policy_number)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _NameCache(VERIFICATION_CACHE_SIZE, VERIFICATION_CACHE_TTL_SECONDS)
+
+
+def lookup_policyholder(policy_number: str) -> Optional[str]:
+    """Return the registered name for a normalized policy number, or None."""
+    name = _cache.get(policy_number)
+    if name is not None:
+        return name
+    with engine.connect() as conn:
+        name = conn.execute(
+            select(UserVerification.name).where(UserVerification.policy_number == policy_number)
+        ).scalar()
+    if name is not None:
+        _cache.put(policy_number, name)
+    return name
+
+
+def clear_policyholder_cache() -> None:
+    _cache.clear()
+
+
+def verification_enabled() -> bool:
+    """
+    Whether callers must pass ``verify_policyholder`` before policy questions
+    (POLICYHOLDER_VERIFICATION). In ``auto`` mode that is only once an
+    extract has been loaded; with an empty table every caller would fail.
+    """
+    if POLICYHOLDER_VERIFICATION in ("true", "false"):
+        return POLICYHOLDER_VERIFICATION == "true"
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(UserVerification.id).limit(1)).first() is not None
+    except Exception as e:
+        logger.warning(f"Could not read user_verification, skipping policyholder verification: {e}")
+        return False
+
+
+def verify_policyholder(name: str, policy_number: str) -> Dict[str, object]:
+    """Check a caller-supplied name and policy number against the records."""
+    policy_number = normalize_policy_number(policy_number)
+    if not policy_number:
+        return {"verified": False, "reason": "missing_policy_number"}
+    registered_name = lookup_policyholder(policy_number)
+    if registered_name is None:
+        return {"verified": False, "reason": "unknown_policy_number", "policy_number": policy_number}
+    if normalize_name(registered_name) != normalize_name(name):
+        return {"verified": False, "reason": "name_mismatch", "policy_number": policy_number}
+    return {"verified": True, "name": registered_name, "policy_number": policy_number}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load a policyholder extract")
+    parser.add_argument("path", help="CSV file with name and policy_number columns")
+    parser.add_argument("--batch-size", type=int, default=POLICYHOLDER_LOAD_BATCH_SIZE)
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Keep existing rows instead of overwriting them")
+    args = parser.parse_args()
+    init_db()
+    load_policyholders_csv(args.path, batch_size=args.batch_size, replace=not args.skip_existing)
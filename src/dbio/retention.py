@@ -0,0 +1,270 @@
+"""
+Retention job for chat_memory.db.
+
+Sessions older than RETENTION_DAYS are copied into gzip-compressed JSONL
+archives (one file per day, plus a JSON manifest) and then deleted from
+``session_history`` and ``message_store`` in bounded batches. Each batch
+is a short transaction followed by a pause sized by RETENTION_DUTY_CYCLE,
+so the job never holds the write lock long enough to stall live traffic.
+Freed pages are returned with ``PRAGMA incremental_vacuum``.
+
+Run once from the command line:
+    python -m src.dbio.retention --days 90
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.constants.db import (
+    RETENTION_DAYS,
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_INTERVAL_SECONDS,
+    RETENTION_BATCH_SIZE,
+    RETENTION_DUTY_CYCLE,
+    RETENTION_VACUUM_PAGES,
+)
+from src.logger import logger
+
+
+class RetentionJob:
+    def __init__(self,
+                 engine: Engine,
+                 days: int = RETENTION_DAYS,
+                 archive_dir: str = RETENTION_ARCHIVE_DIR,
+                 batch_size: int = RETENTION_BATCH_SIZE,
+                 duty_cycle: float = RETENTION_DUTY_CYCLE,
+                 vacuum_pages: int = RETENTION_VACUUM_PAGES):
+        self.engine = engine
+        self.days = days
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.duty_cycle = min(max(duty_cycle, 0.01), 1.0)
+        self.vacuum_pages = vacuum_pages
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Background scheduling
+    def start(self, interval: int = RETENTION_INTERVAL_SECONDS):
+        """Run the job every ``interval`` seconds in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval,), name="chat-retention", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Retention job started (keep {self.days} days, every {interval}s).")
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _loop(self, interval: int):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention job failed: {e}")
+            self._stop.wait(interval)
+
+    def _throttle(self, busy_seconds: float):
+        """Sleep so that busy time stays within the configured duty cycle."""
+        pause = busy_seconds * (1 - self.duty_cycle) / self.duty_cycle
+        self._stop.wait(max(pause, 0.01))
+
+    # Single pass
+    def run_once(self) -> dict:
+        cutoff = datetime.utcnow() - timedelta(days=self.days)
+        stats = {"sessions": 0, "messages": 0, "batches": 0, "vacuumed_pages": 0}
+        self._ensure_indexes()
+
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            sessions = self._fetch_expired_sessions(cutoff)
+            if not sessions:
+                break
+            archived = self._archive(sessions)
+            self._delete(sessions)
+            stats["sessions"] += len(sessions)
+            stats["messages"] += archived
+            stats["batches"] += 1
+            self._throttle(time.perf_counter() - started)
+
+        if stats["batches"]:
+            stats["vacuumed_pages"] = self._incremental_vacuum()
+        logger.info(f"Retention pass finished: {stats}")
+        return stats
+
+    def _ensure_indexes(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_session_history_timestamp "
+                "ON session_history (timestamp)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_session_history_session_timestamp "
+                "ON session_history (session_id, timestamp)"
+            ))
+            has_store = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_store'"
+            )).fetchone()
+            if has_store:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_message_store_session_id "
+                    "ON message_store (session_id)"
+                ))
+        self._has_message_store = bool(has_store)
+
+    def _fetch_expired_sessions(self, cutoff: datetime) -> List[dict]:
+        """Oldest inactive sessions with no row since the cutoff, at most one batch."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT h.session_id, MAX(h.timestamp) AS last_seen
+                FROM session_history h
+                WHERE h.timestamp < :cutoff
+                  AND h.session_id NOT IN (SELECT session_id FROM active_session)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM session_history newer
+                      WHERE newer.session_id = h.session_id AND newer.timestamp >= :cutoff
+                  )
+                GROUP BY h.session_id
+                ORDER BY last_seen
+                LIMIT :limit
+            """), {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S"), "limit": self.batch_size}).fetchall()
+        return [{"session_id": row[0], "last_seen": str(row[1])} for row in rows]
+
+    def _archive(self, sessions: List[dict]) -> int:
+        """Append sessions to their per-day archive. Returns the number of messages."""
+        by_day: Dict[str, List[dict]] = defaultdict(list)
+        total = 0
+        with self.engine.connect() as conn:
+            for session in sessions:
+                messages = []
+                if self._has_message_store:
+                    rows = conn.execute(
+                        text("SELECT message FROM message_store WHERE session_id = :sid ORDER BY id"),
+                        {"sid": session["session_id"]},
+                    ).fetchall()
+                    messages = [json.loads(row[0]) for row in rows]
+                total += len(messages)
+                by_day[session["last_seen"][:10]].append({
+                    "session_id": session["session_id"],
+                    "last_seen": session["last_seen"],
+                    "messages": messages,
+                })
+
+        for day, records in by_day.items():
+            self._write_archive(day, records)
+        return total
+
+    def _write_archive(self, day: str, records: List[dict]):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_path = os.path.join(self.archive_dir, f"chat-{day}.jsonl.gz")
+        manifest_path = os.path.join(self.archive_dir, f"chat-{day}.manifest.json")
+
+        # Appending a new gzip member keeps earlier batches of the same day intact
+        with gzip.open(archive_path, "ab") as f:
+            for record in records:
+                f.write((json.dumps(record) + "\n").encode("utf-8"))
+        # Rows are deleted right after this, so the archive must be on disk first
+        with open(archive_path, "rb+") as f:
+            os.fsync(f.fileno())
+
+        manifest = {"day": day, "archive": os.path.basename(archive_path),
+                    "sessions": 0, "messages": 0, "session_ids": []}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        manifest["sessions"] += len(records)
+        manifest["messages"] += sum(len(r["messages"]) for r in records)
+        manifest["session_ids"].extend(r["session_id"] for r in records)
+        manifest["bytes"] = os.path.getsize(archive_path)
+        manifest["sha256"] = _sha256(archive_path)
+        manifest["updated_at"] = datetime.utcnow().isoformat()
+
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _delete(self, sessions: List[dict]):
+        params = {f"s{i}": s["session_id"] for i, s in enumerate(sessions)}
+        placeholders = ", ".join(f":{key}" for key in params)
+        with self.engine.begin() as conn:
+            if self._has_message_store:
+                conn.execute(text(f"DELETE FROM message_store WHERE session_id IN ({placeholders})"), params)
+            conn.execute(text(f"DELETE FROM session_history WHERE session_id IN ({placeholders})"), params)
+            conn.execute(text(f"DELETE FROM session_escalation WHERE session_id IN ({placeholders})"), params)
+            conn.execute(text(f"DELETE FROM conversation_summary WHERE session_id IN ({placeholders})"), params)
+            conn.execute(text(f"DELETE FROM session_metadata WHERE session_id IN ({placeholders})"), params)
+
+    def _incremental_vacuum(self) -> int:
+        """Release free pages a chunk at a time. Needs auto_vacuum=INCREMENTAL."""
+        with self.engine.connect() as conn:
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                logger.warning(
+                    "chat_memory.db is not in incremental auto_vacuum mode; run "
+                    "'python -m src.dbio.retention --enable-incremental-vacuum' during a maintenance window."
+                )
+                return 0
+        released = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            raw = self.engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                free = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                pages = min(free, self.vacuum_pages)
+                # The pragma frees one page per step; fetchall() runs it to completion
+                cursor.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+                raw.commit()
+            finally:
+                raw.close()
+            released += pages
+            self._throttle(time.perf_counter() - started)
+        return released
+
+
+def enable_incremental_vacuum(engine: Engine):
+    """One-off switch of an existing file to auto_vacuum=INCREMENTAL (rewrites the file)."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive and purge old chat sessions")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=RETENTION_ARCHIVE_DIR)
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--enable-incremental-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    from src.storage.sqlite_backend import SQLiteStateBackend
+    engine = SQLiteStateBackend().engine
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(engine)
+    RetentionJob(engine, days=args.days, archive_dir=args.archive_dir,
+                 batch_size=args.batch_size).run_once()
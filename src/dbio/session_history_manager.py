@@ -1,18 +1,13 @@
-import sqlite3
-import os
-from typing import List, Dict
-from datetime import datetime
-
-from src.constants.db import CHAT_MEMORY_DB_NAME
+from src.storage import get_state_backend
 from src.utils.session import get_user_session
 from src.logger import logger
-DB_PATH = CHAT_MEMORY_DB_NAME
 
 
 class SessionHistoryManager:
-    def __init__(self):
-        self.session_id = self._get_a_session_id()
-        self.initialize_db()
+    def __init__(self, session_id: str = None):
+        self.backend = get_state_backend()
+        # A session id chosen by the client (or the supervisor, to route it)
+        self.session_id = session_id or self._get_a_session_id()
         self.store_session_id(self.session_id)
 
 
@@ -22,45 +17,13 @@ class SessionHistoryManager:
 
         return session_id
 
-    def initialize_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS session_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        logger.info("Session DB initialized.")
-
-        conn.commit()
-        conn.close()
-
     def store_session_id(self,
                          session_id: str):
-        """Store session id in db"""
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("INSERT INTO session_history (session_id) VALUES (?)", (session_id,))
-        conn.commit()
-        logger.info(f"Session id: {session_id} stored in db successfully.")
-        conn.close()
+        """Store session id in the shared session registry"""
+        self.backend.register_session(session_id)
+        logger.info(f"Session id: {session_id} stored in {self.backend.name} backend successfully.")
 
 
     @staticmethod
     def get_last_session_id() -> str:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""
-            SELECT session_id FROM session_history
-            ORDER BY timestamp DESC LIMIT 1
-        """)
-        row = c.fetchone()
-        conn.close()
-        return row[0] if row else None
-
-
-
-
+        return get_state_backend().get_last_session_id()
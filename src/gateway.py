@@ -0,0 +1,346 @@
+"""
+Multiplexed gateway connections for /ws/gateway.
+
+One authenticated socket carries many call sessions. Text frames are JSON
+and name their ``session_id``:
+
+    {"type": "open", "session_id": "call-123", "sample_rate": 8000}
+    {"type": "message", "session_id": "call-123", "message": "...", "speech_chunks": true}
+    {"type": "close", "session_id": "call-123"}
+    {"type": "ping"}
+
+Binary frames are caller audio: one byte with the length of the session
+ID, the session ID in UTF-8, then 16-bit little-endian mono PCM.
+
+Every frame the server sends carries ``session_id`` and a per-session
+``frame_seq``. Each session handles its input in arrival order. A worker
+task exists only while the session has queued input.
+
+Flow control:
+- A session may have ``GATEWAY_SESSION_WINDOW`` messages queued. The
+  server returns credit (``{"type": "credit"}``) as it starts each one.
+- A message with ``speech_chunks`` is the caller speaking again
+  (barge-in): it drops the session's queued messages and stops the turn
+  in progress.
+- A slow reader fills the session's bounded outbox and pauses only that
+  session's turn.
+- The writer sends at most ``GATEWAY_WRITE_QUANTUM`` frames per session
+  in each round-robin pass. A chatty session cannot starve the others.
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from src.constants.audio import AUDIO_SAMPLE_RATE, AUDIO_SAMPLE_RATES
+from src.constants.gateway import (
+    GATEWAY_SESSION_WINDOW,
+    GATEWAY_SESSION_OUTBOX,
+    GATEWAY_WRITE_QUANTUM,
+    GATEWAY_MAX_CONCURRENT_TURNS,
+    GATEWAY_AUDIO_MAX_PENDING,
+    GATEWAY_SESSION_IDLE_SECONDS,
+    GATEWAY_MAX_SESSIONS,
+)
+from src.metrics import (
+    GATEWAY_FRAMES_TOTAL,
+    GATEWAY_OUTBOX_WAIT_SECONDS,
+    GATEWAY_REJECTED_TOTAL,
+    GATEWAY_TURN_SLOT_WAIT_SECONDS,
+)
+from src.logger import logger
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_active_sessions = 0
+
+
+def active_session_count() -> int:
+    """Sessions open across all gateway connections of this process."""
+    return _active_sessions
+
+
+class GatewayFrame(BaseModel):
+    type: str
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)
+    message: Optional[str] = Field(None, min_length=1, max_length=1000)
+    speech_chunks: bool = False
+    sample_rate: int = AUDIO_SAMPLE_RATE
+
+
+class GatewayHandlers(ABC):
+    """What the gateway does with a session; ``send`` writes a frame to that session."""
+
+    @abstractmethod
+    async def open_session(self, session_id: str, send: Send):
+        """Register the session and greet the caller."""
+
+    @abstractmethod
+    async def run_turn(self, session_id: str, message: str, speech_chunks: bool, send: Send):
+        """Answer one text message."""
+
+    @abstractmethod
+    async def run_audio(self, session_id: str, frames: asyncio.Queue, sample_rate: int, send: Send):
+        """Consume ``(pcm, received_at)`` items until cancelled."""
+
+    @abstractmethod
+    async def close_session(self, session_id: str):
+        """Summarize and clean up after the call."""
+
+    def interrupt(self, session_id: str):
+        """A voice message arrived while a turn is running; stop that turn (barge-in)."""
+
+
+# Queued after a session's messages so it closes once they are answered
+_CLOSE = object()
+
+
+class _Session:
+    __slots__ = ("session_id", "sample_rate", "inbox", "outbox", "worker", "audio_frames", "audio_task",
+                 "frame_seq", "credit_due", "ready", "last_active", "closed")
+
+    def __init__(self, session_id: str, sample_rate: int):
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.inbox: Deque[Any] = deque()
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=GATEWAY_SESSION_OUTBOX)
+        self.worker: Optional[asyncio.Task] = None
+        self.audio_frames: Optional[asyncio.Queue] = None
+        self.audio_task: Optional[asyncio.Task] = None
+        self.frame_seq = 0
+        self.credit_due = 0
+        # In the writer's round-robin
+        self.ready = False
+        self.last_active = time.monotonic()
+        self.closed = False
+
+
+class GatewayConnection:
+    def __init__(self, websocket, handlers: GatewayHandlers, send_json: Callable[[Any, dict], Awaitable[None]]):
+        self.websocket = websocket
+        self.handlers = handlers
+        self._send_json = send_json
+        self.sessions: Dict[str, _Session] = {}
+        self._ready: Deque[_Session] = deque()
+        self._wake = asyncio.Event()
+        self._control: Deque[dict] = deque()
+        self._turn_slots = asyncio.Semaphore(GATEWAY_MAX_CONCURRENT_TURNS)
+
+    async def serve(self):
+        writer = asyncio.create_task(self._write_loop())
+        sweeper = asyncio.create_task(self._sweep_idle())
+        try:
+            while True:
+                frame = await self.websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                if frame.get("bytes") is not None:
+                    GATEWAY_FRAMES_TOTAL.labels("in_audio").inc()
+                    self._on_audio(frame["bytes"])
+                else:
+                    GATEWAY_FRAMES_TOTAL.labels("in").inc()
+                    self._on_text(frame.get("text") or "")
+        finally:
+            sweeper.cancel()
+            for session in list(self.sessions.values()):
+                await self._close(session, reason=None)
+            writer.cancel()
+
+    # Inbound
+    def _on_text(self, text: str):
+        try:
+            frame = GatewayFrame(**json.loads(text))
+        except (json.JSONDecodeError, TypeError, ValidationError) as e:
+            self._reject(None, "invalid_frame", str(e).splitlines()[0])
+            return
+
+        if frame.type == "ping":
+            self._send_control({"type": "pong"})
+            return
+        if not frame.session_id:
+            self._reject(None, "missing_session_id")
+            return
+
+        session = self.sessions.get(frame.session_id)
+        if frame.type == "open":
+            self._open(frame)
+        elif session is None:
+            self._reject(frame.session_id, "unknown_session")
+        elif frame.type == "message":
+            if not frame.message:
+                self._reject(frame.session_id, "missing_message")
+            elif sum(1 for item in session.inbox if isinstance(item, tuple)) >= GATEWAY_SESSION_WINDOW:
+                self._reject(frame.session_id, "window_exceeded")
+            else:
+                if frame.speech_chunks:
+                    self._supersede(session)
+                self._enqueue(session, (frame.message, frame.speech_chunks))
+        elif frame.type == "close":
+            self._enqueue(session, _CLOSE)
+        else:
+            self._reject(frame.session_id, "unknown_type", frame.type)
+
+    def _open(self, frame: GatewayFrame):
+        global _active_sessions
+        if frame.session_id in self.sessions:
+            self._reject(frame.session_id, "already_open")
+            return
+        if len(self.sessions) >= GATEWAY_MAX_SESSIONS:
+            self._reject(frame.session_id, "too_many_sessions")
+            return
+        if frame.sample_rate not in AUDIO_SAMPLE_RATES:
+            self._reject(frame.session_id, "bad_sample_rate")
+            return
+        session = _Session(frame.session_id, frame.sample_rate)
+        self.sessions[session.session_id] = session
+        _active_sessions += 1
+        # Registration runs in the session's worker, ahead of its first message
+        self._enqueue(session, "open")
+
+    def _on_audio(self, data: bytes):
+        length = data[0] if data else 0
+        session = self.sessions.get(data[1:1 + length].decode("utf-8", "replace")) if length else None
+        if session is None:
+            self._reject(None, "unknown_session")
+            return
+        session.last_active = time.monotonic()
+        if session.audio_task is None:
+            session.audio_frames = asyncio.Queue()
+            session.audio_task = asyncio.create_task(self.handlers.run_audio(
+                session.session_id, session.audio_frames, session.sample_rate, self._sender(session)))
+        if session.audio_frames.qsize() >= GATEWAY_AUDIO_MAX_PENDING:
+            GATEWAY_REJECTED_TOTAL.labels("audio_overrun").inc()
+            return
+        session.audio_frames.put_nowait((data[1 + length:], time.perf_counter()))
+
+    def _supersede(self, session: _Session):
+        """The caller spoke again: earlier messages still queued are dropped, the running turn stopped."""
+        queued = [item for item in session.inbox if not isinstance(item, tuple)]
+        dropped = len(session.inbox) - len(queued)
+        if dropped:
+            session.inbox = deque(queued)
+            # Dropped messages never start, so their credit rides on the next credit frame
+            session.credit_due += dropped
+        if session.worker is not None:
+            self.handlers.interrupt(session.session_id)
+
+    def _enqueue(self, session: _Session, item):
+        session.last_active = time.monotonic()
+        session.inbox.append(item)
+        if session.worker is None:
+            session.worker = asyncio.create_task(self._drain(session))
+
+    async def _drain(self, session: _Session):
+        """Handle the session's queued input one item at a time."""
+        send = self._sender(session)
+        try:
+            while session.inbox:
+                item = session.inbox.popleft()
+                if item is _CLOSE:
+                    await self._close(session, reason="closed")
+                    return
+                if item == "open":
+                    await self.handlers.open_session(session.session_id, send)
+                    await send({"type": "opened", "credits": GATEWAY_SESSION_WINDOW})
+                    continue
+                message, speech_chunks = item
+                credits, session.credit_due = 1 + session.credit_due, 0
+                await send({"type": "credit", "credits": credits})
+                waited = time.perf_counter()
+                async with self._turn_slots:
+                    GATEWAY_TURN_SLOT_WAIT_SECONDS.observe(time.perf_counter() - waited)
+                    try:
+                        await self.handlers.run_turn(session.session_id, message, speech_chunks, send)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Gateway turn failed for session {session.session_id}: {e}")
+                        await send({"error": "Internal server error", "role": "system"})
+        finally:
+            session.worker = None
+
+    # Outbound
+    def _sender(self, session: _Session) -> Send:
+        async def send(payload: Dict[str, Any]):
+            if session.closed and payload.get("type") != "closed":
+                return
+            payload = {**payload, "session_id": session.session_id, "frame_seq": session.frame_seq}
+            session.frame_seq += 1
+            session.last_active = time.monotonic()
+            if session.outbox.full():
+                with GATEWAY_OUTBOX_WAIT_SECONDS.time():
+                    await session.outbox.put(payload)
+            else:
+                session.outbox.put_nowait(payload)
+            if not session.ready:
+                session.ready = True
+                self._ready.append(session)
+                self._wake.set()
+        return send
+
+    def _send_control(self, payload: dict):
+        self._control.append(payload)
+        self._wake.set()
+
+    def _reject(self, session_id: Optional[str], code: str, detail: str = ""):
+        GATEWAY_REJECTED_TOTAL.labels(code).inc()
+        self._send_control({"type": "error", "code": code, "detail": detail, "session_id": session_id})
+
+    async def _write_loop(self):
+        """Round-robin over sessions with output, a quantum of frames each."""
+        while True:
+            if not self._ready and not self._control:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            while self._control:
+                await self._write(self._control.popleft())
+            if not self._ready:
+                continue
+            session = self._ready.popleft()
+            for _ in range(GATEWAY_WRITE_QUANTUM):
+                if session.outbox.empty():
+                    break
+                await self._write(session.outbox.get_nowait())
+            if session.outbox.empty():
+                session.ready = False
+            else:
+                self._ready.append(session)
+
+    async def _write(self, payload: dict):
+        GATEWAY_FRAMES_TOTAL.labels("out").inc()
+        await self._send_json(self.websocket, payload)
+
+    # Session lifecycle
+    async def _close(self, session: _Session, reason: Optional[str]):
+        global _active_sessions
+        if session.closed:
+            return
+        session.closed = True
+        self.sessions.pop(session.session_id, None)
+        _active_sessions -= 1
+        if session.audio_task is not None:
+            session.audio_task.cancel()
+        current = asyncio.current_task()
+        if session.worker is not None and session.worker is not current:
+            session.worker.cancel()
+        try:
+            await self.handlers.close_session(session.session_id)
+        except Exception as e:
+            logger.error(f"Error closing gateway session {session.session_id}: {e}")
+        if reason:
+            await self._sender(session)({"type": "closed", "reason": reason})
+
+    async def _sweep_idle(self):
+        while True:
+            await asyncio.sleep(min(10, GATEWAY_SESSION_IDLE_SECONDS))
+            cutoff = time.monotonic() - GATEWAY_SESSION_IDLE_SECONDS
+            for session in list(self.sessions.values()):
+                if session.worker is None and session.last_active < cutoff:
+                    logger.info(f"Gateway session {session.session_id} idle, closing")
+                    await self._close(session, reason="idle")
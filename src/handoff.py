@@ -0,0 +1,500 @@
+"""
+Live "talk now" queue: escalated callers wait here for a human agent.
+
+Callers ask from /ws/chat (``{"message_type": "escalation", "action":
+"talk_now"}``) and get pushed updates on the same socket:
+
+    {"type": "handoff_queue", "position": 3, "estimated_wait_seconds": 240, ...}
+    {"type": "handoff_assigned", "agent_id": "a-17", "waited_seconds": 95, ...}
+
+Human agents use the /handoff/agents endpoints: ``ready`` hands them the
+next caller (or parks them as idle), ``complete`` ends the call.
+
+Ordering: callers are served by ``arrival + priority * STEP``. Within a
+priority that is arrival order; across priorities a lower level is
+ahead by at most STEP seconds, so every caller is served eventually.
+Idle agents are given callers longest-idle first.
+
+Each priority level is a lane: an append-only array of keys (increasing
+within the lane) with a Fenwick tree of which entries are still waiting.
+Enqueue, dequeue and leaving are O(log n). A caller's position is one
+bisect plus one prefix sum per lane. The wait estimate comes from a
+rolling mean of handle times, not a scan of the queue.
+
+The queue is held by one worker process. Under the supervisor every
+/handoff/ request goes to that worker, and the other workers relay
+their callers' talk-now requests to it (``HandoffRelay``); the owner
+sends the callers' updates back through the supervisor, pinned to the
+caller's worker.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.constants.handoff import (
+    HANDOFF_RELAY_URL,
+    HANDOFF_RELAY_TOKEN,
+    HANDOFF_OWNER_WORKER,
+    HANDOFF_RELAY_TIMEOUT_SECONDS,
+    HANDOFF_PRIORITY_LEVELS,
+    HANDOFF_DEFAULT_PRIORITY,
+    HANDOFF_REASON_PRIORITIES,
+    HANDOFF_PRIORITY_STEP_SECONDS,
+    HANDOFF_DEFAULT_HANDLE_SECONDS,
+    HANDOFF_HANDLE_TIME_ALPHA,
+    HANDOFF_UPDATE_SECONDS,
+)
+from src.constants.supervisor import WORKER_INDEX
+from src.gateway import Send
+from src.metrics import HANDOFF_REQUESTS_TOTAL, HANDOFF_WAIT_SECONDS, HANDOFF_HANDLE_SECONDS
+from src.logger import logger
+
+# Dead entries a lane keeps at its front before it is compacted
+COMPACT_AFTER = 1024
+
+
+class _Fenwick:
+    """Prefix sums over a growing array."""
+
+    def __init__(self, values: Optional[List[int]] = None):
+        self._tree = [0, *(values or ())]
+        n = len(self._tree) - 1
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                self._tree[j] += self._tree[i]
+
+    def append(self, value: int):
+        i = len(self._tree)
+        # Node i covers (i - lowbit(i), i]; everything before i is already in the tree
+        self._tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Sum of the first ``count`` values."""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+
+class HandoffEntry:
+    __slots__ = ("session_id", "reason", "priority", "key", "index", "enqueued_at")
+
+    def __init__(self, session_id: str, reason: Optional[str], priority: int, key: float, enqueued_at: float):
+        self.session_id = session_id
+        self.reason = reason
+        self.priority = priority
+        self.key = key
+        # Position in its lane's arrays
+        self.index = 0
+        self.enqueued_at = enqueued_at
+
+
+class _Lane:
+    def __init__(self):
+        self.keys: List[float] = []
+        self.entries: List[Optional[HandoffEntry]] = []
+        self.waiting = _Fenwick()
+        # Entries before head have all left the lane
+        self.head = 0
+
+    def append(self, entry: HandoffEntry):
+        entry.index = len(self.keys)
+        self.keys.append(entry.key)
+        self.entries.append(entry)
+        self.waiting.append(1)
+
+    def discard(self, entry: HandoffEntry):
+        self.entries[entry.index] = None
+        self.waiting.add(entry.index, -1)
+        while self.head < len(self.entries) and self.entries[self.head] is None:
+            self.head += 1
+        if self.head >= COMPACT_AFTER and self.head * 2 >= len(self.entries):
+            self._compact()
+
+    def first(self) -> Optional[HandoffEntry]:
+        return self.entries[self.head] if self.head < len(self.entries) else None
+
+    def count_before(self, key: float) -> int:
+        return self.waiting.prefix(bisect_left(self.keys, key, self.head))
+
+    def _compact(self):
+        self.keys = self.keys[self.head:]
+        self.entries = self.entries[self.head:]
+        self.waiting = _Fenwick([0 if entry is None else 1 for entry in self.entries])
+        for index, entry in enumerate(self.entries):
+            if entry is not None:
+                entry.index = index
+        self.head = 0
+
+
+class HandoffQueue:
+    """Callers waiting for an agent, by priority with aging (no I/O)."""
+
+    def __init__(self, levels: int = HANDOFF_PRIORITY_LEVELS, step_seconds: float = HANDOFF_PRIORITY_STEP_SECONDS):
+        self.levels = max(levels, 1)
+        self.step_seconds = step_seconds
+        self._lanes = [_Lane() for _ in range(self.levels)]
+        self._entries: Dict[str, HandoffEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def get(self, session_id: str) -> Optional[HandoffEntry]:
+        return self._entries.get(session_id)
+
+    def push(self, session_id: str, reason: Optional[str], priority: int) -> HandoffEntry:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            return entry
+        priority = min(max(priority, 0), self.levels - 1)
+        now = time.monotonic()
+        entry = HandoffEntry(session_id, reason, priority, now + priority * self.step_seconds, now)
+        self._lanes[priority].append(entry)
+        self._entries[session_id] = entry
+        return entry
+
+    def remove(self, session_id: str) -> Optional[HandoffEntry]:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._lanes[entry.priority].discard(entry)
+        return entry
+
+    def pop(self) -> Optional[HandoffEntry]:
+        best = None
+        for lane in self._lanes:
+            entry = lane.first()
+            if entry is not None and (best is None or entry.key < best.key):
+                best = entry
+        if best is not None:
+            self.remove(best.session_id)
+        return best
+
+    def ahead(self, session_id: str) -> int:
+        """Callers that will be served before ``session_id``."""
+        entry = self._entries[session_id]
+        return sum(lane.count_before(entry.key) for lane in self._lanes)
+
+    def counts(self) -> List[int]:
+        return [lane.waiting.prefix(len(lane.keys)) for lane in self._lanes]
+
+
+class HandleTimeStats:
+    """Rolling (exponentially weighted) mean of how long agents spend per call."""
+
+    def __init__(self, initial: float = HANDOFF_DEFAULT_HANDLE_SECONDS, alpha: float = HANDOFF_HANDLE_TIME_ALPHA):
+        self.mean = initial
+        self.alpha = alpha
+        self.samples = 0
+
+    def record(self, seconds: float):
+        self.samples += 1
+        self.mean += self.alpha * (seconds - self.mean)
+
+    def estimate_wait(self, ahead: int, agents: int) -> Optional[float]:
+        """
+        Expected wait with ``ahead`` callers in front and ``agents`` busy
+        agents, each part-way through a call of mean length. The k-th of n
+        uniformly spread finish times is expected at k/(n+1) of a call.
+        """
+        if agents <= 0:
+            return None
+        rounds, rest = divmod(ahead, agents)
+        return self.mean * (rounds + (rest + 1) / (agents + 1))
+
+
+class _Assignment:
+    __slots__ = ("session_id", "reason", "assigned_at", "waited_seconds")
+
+    def __init__(self, session_id: str, reason: Optional[str], waited_seconds: float):
+        self.session_id = session_id
+        self.reason = reason
+        self.assigned_at = time.monotonic()
+        self.waited_seconds = waited_seconds
+
+    def to_dict(self, agent_id: str) -> Dict[str, Any]:
+        return {
+            "status": "assigned",
+            "agent_id": agent_id,
+            "session_id": self.session_id,
+            "reason": self.reason,
+            "waited_seconds": round(self.waited_seconds, 1),
+        }
+
+
+def priority_for(reason: Optional[str]) -> int:
+    return HANDOFF_REASON_PRIORITIES.get(reason or "", HANDOFF_DEFAULT_PRIORITY)
+
+
+class HandoffService:
+    """
+    The queue plus the agents serving it. Runs on the event loop: every
+    method is called from request handlers, so no locking is needed.
+    """
+
+    def __init__(self, queue: Optional[HandoffQueue] = None, stats: Optional[HandleTimeStats] = None,
+                 update_seconds: float = HANDOFF_UPDATE_SECONDS):
+        self.queue = queue or HandoffQueue()
+        self.stats = stats or HandleTimeStats()
+        self.update_seconds = update_seconds
+        self._senders: Dict[str, Send] = {}
+        self._last_pushed: Dict[str, tuple] = {}
+        # Agent id -> idle since; the longest idle agent is first
+        self._idle: "OrderedDict[str, float]" = OrderedDict()
+        self._busy: Dict[str, _Assignment] = {}
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def agents_online(self) -> int:
+        return len(self._idle) + len(self._busy)
+
+    @property
+    def agents_idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def waiting(self) -> int:
+        return len(self.queue)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._push_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Callers
+    async def request(self, session_id: str, reason: Optional[str], send: Send):
+        """Queue the caller (or connect them at once if an agent is idle)."""
+        for agent_id, assignment in self._busy.items():
+            if assignment.session_id == session_id:
+                await send({"type": "handoff_assigned", **assignment.to_dict(agent_id)})
+                return
+        self._senders[session_id] = send
+        if session_id not in self.queue:
+            self.queue.push(session_id, reason, priority_for(reason))
+            HANDOFF_REQUESTS_TOTAL.labels("queued").inc()
+            logger.info(f"Session {session_id} queued for an agent ({reason or 'no reason'})")
+        if self._idle:
+            # Usually this caller; a higher-priority one if any was waiting
+            agent_id, _ = self._idle.popitem(last=False)
+            await self._assign(agent_id, self.queue.pop())
+        if session_id in self.queue:
+            self._last_pushed.pop(session_id, None)
+            await self._push_position(session_id)
+        self._changed.set()
+
+    def leave(self, session_id: str) -> bool:
+        """Take the caller out of the queue (they hung up or changed their mind)."""
+        self._senders.pop(session_id, None)
+        self._last_pushed.pop(session_id, None)
+        entry = self.queue.remove(session_id)
+        if entry is None:
+            return False
+        HANDOFF_REQUESTS_TOTAL.labels("abandoned").inc()
+        self._changed.set()
+        return True
+
+    def status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if session_id not in self.queue:
+            return None
+        ahead = self.queue.ahead(session_id)
+        wait = self.stats.estimate_wait(ahead, self.agents_online)
+        return {
+            "type": "handoff_queue",
+            "session_id": session_id,
+            "position": ahead + 1,
+            "waiting": len(self.queue),
+            "agents_online": self.agents_online,
+            "estimated_wait_seconds": None if wait is None else round(wait),
+        }
+
+    # Agents
+    async def agent_ready(self, agent_id: str) -> Dict[str, Any]:
+        """The agent can take a call: hand them the next caller, or park them as idle."""
+        if agent_id in self._busy:
+            return self._busy[agent_id].to_dict(agent_id)
+        entry = self.queue.pop()
+        if entry is None:
+            if agent_id not in self._idle:
+                self._idle[agent_id] = time.monotonic()
+                self._changed.set()
+            return {"status": "idle", "agent_id": agent_id}
+        self._idle.pop(agent_id, None)
+        return await self._assign(agent_id, entry)
+
+    async def agent_complete(self, agent_id: str, ready: bool = True) -> Dict[str, Any]:
+        assignment = self._busy.pop(agent_id, None)
+        if assignment is not None:
+            handled = time.monotonic() - assignment.assigned_at
+            self.stats.record(handled)
+            HANDOFF_HANDLE_SECONDS.observe(handled)
+        if ready:
+            return await self.agent_ready(agent_id)
+        self._changed.set()
+        return {"status": "offline", "agent_id": agent_id}
+
+    def agent_leave(self, agent_id: str) -> bool:
+        found = self._idle.pop(agent_id, None) is not None or self._busy.pop(agent_id, None) is not None
+        self._changed.set()
+        return found
+
+    def agent_status(self, agent_id: str) -> Dict[str, Any]:
+        if agent_id in self._busy:
+            return self._busy[agent_id].to_dict(agent_id)
+        return {"status": "idle" if agent_id in self._idle else "offline", "agent_id": agent_id}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "waiting": len(self.queue),
+            "waiting_by_priority": self.queue.counts(),
+            "agents_idle": len(self._idle),
+            "agents_busy": len(self._busy),
+            "mean_handle_seconds": round(self.stats.mean, 1),
+            "handle_time_samples": self.stats.samples,
+        }
+
+    async def _assign(self, agent_id: str, entry: HandoffEntry) -> Dict[str, Any]:
+        waited = time.monotonic() - entry.enqueued_at
+        assignment = _Assignment(entry.session_id, entry.reason, waited)
+        self._busy[agent_id] = assignment
+        HANDOFF_REQUESTS_TOTAL.labels("assigned").inc()
+        HANDOFF_WAIT_SECONDS.observe(waited)
+        logger.info(f"Session {entry.session_id} assigned to agent {agent_id} after {waited:.1f}s")
+        self._last_pushed.pop(entry.session_id, None)
+        send = self._senders.pop(entry.session_id, None)
+        if send is not None:
+            try:
+                await send({"type": "handoff_assigned", **assignment.to_dict(agent_id)})
+            except Exception as e:
+                logger.warning(f"Could not tell session {entry.session_id} about its agent: {e}")
+        self._changed.set()
+        return assignment.to_dict(agent_id)
+
+    # Position updates
+    async def _push_position(self, session_id: str):
+        status = self.status(session_id)
+        send = self._senders.get(session_id)
+        if status is None or send is None:
+            return
+        pushed = (status["position"], status["agents_online"], status["estimated_wait_seconds"])
+        if self._last_pushed.get(session_id) == pushed:
+            return
+        self._last_pushed[session_id] = pushed
+        try:
+            await send(status)
+        except Exception as e:
+            logger.debug(f"Handoff update for session {session_id} not sent: {e}")
+
+    async def _push_loop(self):
+        """After any change, push new positions; at most once every ``update_seconds``."""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            await asyncio.gather(*(self._push_position(session_id) for session_id in list(self._senders)))
+            await asyncio.sleep(self.update_seconds)
+
+
+# Supervisor mode
+def _relay_post(path: str, payload: Dict[str, Any]):
+    import requests
+
+    response = requests.post(HANDOFF_RELAY_URL + path, json=payload,
+                             headers={"X-Relay-Token": HANDOFF_RELAY_TOKEN},
+                             timeout=HANDOFF_RELAY_TIMEOUT_SECONDS)
+    response.raise_for_status()
+
+
+async def _post(path: str, payload: Dict[str, Any]):
+    await asyncio.get_running_loop().run_in_executor(None, _relay_post, path, payload)
+
+
+def relay_send(worker: int, session_id: str) -> Send:
+    """Send for a caller connected to another worker: delivered there through the supervisor."""
+    async def send(message: Dict[str, Any]):
+        await _post(f"/internal/handoff/deliver?worker={worker}", {"session_id": session_id, "message": message})
+    return send
+
+
+class HandoffRelay:
+    """
+    Stands in for the queue in a worker that does not hold it. Talk-now
+    requests and leaves go to the owner worker; the updates it sends
+    back arrive through ``deliver`` and go out on the caller's socket.
+    """
+
+    def __init__(self, worker: int = WORKER_INDEX):
+        self.worker = worker
+        self._senders: Dict[str, Send] = {}
+        self._pending: set = set()
+
+    # Counted by the owner worker
+    agents_idle = 0
+    waiting = 0
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        for task in list(self._pending):
+            task.cancel()
+
+    async def request(self, session_id: str, reason: Optional[str], send: Send):
+        self._senders[session_id] = send
+        try:
+            await _post("/handoff/relay/join", {"session_id": session_id, "reason": reason, "worker": self.worker})
+        except Exception as e:
+            self._senders.pop(session_id, None)
+            logger.error(f"Could not queue session {session_id} with the handoff worker: {e}")
+            await send({"error": "Could not join the queue for an agent", "role": "system"})
+
+    def leave(self, session_id: str) -> bool:
+        if self._senders.pop(session_id, None) is None:
+            return False
+        # Callers leave from synchronous cleanup code; the owner is told in the background
+        task = asyncio.ensure_future(_post("/handoff/relay/leave", {"session_id": session_id}))
+        self._pending.add(task)
+        task.add_done_callback(self._left)
+        return True
+
+    def _left(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Handoff leave not relayed: {task.exception()}")
+
+    async def deliver(self, session_id: str, message: Dict[str, Any]) -> bool:
+        """An update from the owner worker for one of this worker's callers."""
+        send = self._senders.get(session_id)
+        if send is None:
+            return False
+        if message.get("type") == "handoff_assigned":
+            self._senders.pop(session_id, None)
+        await send(message)
+        return True
+
+
+def create_handoff_service():
+    """The queue itself, or a relay to the worker that holds it under the supervisor."""
+    if HANDOFF_RELAY_URL and WORKER_INDEX != HANDOFF_OWNER_WORKER:
+        return HandoffRelay()
+    return HandoffService()
@@ -0,0 +1,384 @@
+"""
+Process-wide latency and error metrics in Prometheus text format.
+
+Recording is a dict lookup, a bisect and an increment under a per-series
+lock, so it is cheap enough for the per-turn hot path. ``render()``
+produces the exposition text served by ``GET /metrics``.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+
+from src import tracing
+
+# Seconds; spans fast SQLite reads up to slow LLM generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh series for one combination of label values."""
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {self._value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_func")
+
+    def __init__(self):
+        self._value = 0.0
+        self._func: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, func: Callable[[], float]):
+        """Evaluate ``func`` at scrape time instead of storing a value"""
+        self._func = func
+
+    def render(self, name, labelnames, values):
+        value = self._value
+        if self._func is not None:
+            try:
+                value = self._func()
+            except Exception:
+                return []
+        return [f"{name}{_format_labels(labelnames, values)} {float(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def set_function(self, func: Callable[[], float]):
+        self._default.set_function(func)
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # One slot per bucket plus +Inf; cumulated only when rendered
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self._buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            bucket_labels = _format_labels(labelnames, values, 'le="%s"' % le)
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        label_text = _format_labels(labelnames, values)
+        lines.append(f"{name}_sum{label_text} {total}")
+        lines.append(f"{name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering returns the existing metric (module reloads)
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Per-stage metrics
+AGENT_TURN_SECONDS = histogram("agent_turn_seconds", "Agent turn latency, end to end", ["outcome"])
+LLM_REQUEST_SECONDS = histogram("llm_request_seconds", "LLM call latency", ["call_site"])
+LLM_REQUESTS_TOTAL = counter("llm_requests_total", "LLM calls", ["call_site", "status"])
+LLM_TOKENS_TOTAL = counter("llm_tokens_total", "Tokens reported by the LLM", ["call_site", "kind"])
+TOOL_CALL_SECONDS = histogram("tool_call_seconds", "Tool call latency", ["tool"])
+TOOL_CALLS_TOTAL = counter("tool_calls_total", "Tool calls", ["tool", "status"])
+ORCHESTRATE_POST_SECONDS = histogram("orchestrate_post_seconds", "POST /runs latency")
+ORCHESTRATE_POLL_SECONDS = histogram("orchestrate_poll_seconds", "Single GET /runs/{id}/events latency")
+ORCHESTRATE_POLL_ITERATIONS = histogram("orchestrate_poll_iterations", "Event polls per Orchestrate run",
+                                        buckets=COUNT_BUCKETS)
+ORCHESTRATE_RUN_SECONDS = histogram("orchestrate_run_seconds", "Orchestrate ask() latency, POST to reply",
+                                    ["status"])
+ORCHESTRATE_TOKEN_REFRESH_SECONDS = histogram("orchestrate_token_refresh_seconds",
+                                              "Orchestrate token refresh latency")
+HISTORY_READ_SECONDS = histogram("history_read_seconds", "Chat history read latency", ["backend"])
+HISTORY_WRITE_SECONDS = histogram("history_write_seconds", "Chat history write latency", ["backend"])
+EXECUTOR_QUEUE_WAIT_SECONDS = histogram("executor_queue_wait_seconds",
+                                        "Time a turn waits for a free executor thread")
+WS_SEND_SECONDS = histogram("ws_send_seconds", "WebSocket send latency")
+WS_MESSAGES_TOTAL = counter("ws_messages_total", "WebSocket messages", ["direction"])
+SPEECH_FIRST_CHUNK_SECONDS = histogram("speech_first_chunk_seconds",
+                                       "Time from turn start to the first speech chunk")
+SPEECH_CHUNKS_TOTAL = counter("speech_chunks_total", "Speech chunks sent, streamed or after the reply",
+                              ["source"])
+AUDIO_BYTES_TOTAL = counter("audio_bytes_total", "PCM bytes received over /ws/chat")
+AUDIO_UTTERANCES_TOTAL = counter("audio_utterances_total", "Utterances closed by the VAD", ["outcome"])
+AUDIO_ENDPOINT_SECONDS = histogram("audio_endpoint_seconds",
+                                   "Silence waited after the caller stopped before closing the utterance")
+STT_SECONDS = histogram("stt_finalize_seconds", "Speech-to-text time left after the utterance closed",
+                        ["backend"])
+VOICE_RESPONSE_SECONDS = histogram("voice_response_seconds",
+                                   "End of caller speech until the first speech chunk or the reply", ["until"])
+GATEWAY_FRAMES_TOTAL = counter("gateway_frames_total", "/ws/gateway frames", ["direction"])
+GATEWAY_REJECTED_TOTAL = counter("gateway_rejected_total", "/ws/gateway frames refused", ["reason"])
+GATEWAY_OUTBOX_WAIT_SECONDS = histogram("gateway_outbox_wait_seconds",
+                                        "Time a session waited for room in its full outbox")
+GATEWAY_TURN_SLOT_WAIT_SECONDS = histogram("gateway_turn_slot_wait_seconds",
+                                           "Time a gateway turn waited for a concurrent-turn slot")
+TURNS_CANCELLED_TOTAL = counter("turns_cancelled_total", "Turns cancelled by a newer one (barge-in)", ["stage"])
+LLM_SECONDS_WASTED_TOTAL = counter("llm_seconds_wasted_total", "LLM seconds spent on turns that were cancelled")
+LLM_SECONDS_SAVED_TOTAL = counter("llm_seconds_saved_total",
+                                  "Estimated LLM seconds cancelled turns did not spend, from the typical turn")
+ASSET_RESPONSES_TOTAL = counter("asset_responses_total", "Built static asset responses", ["encoding", "status"])
+ASSET_BYTES_TOTAL = counter("asset_bytes_total", "Static asset body bytes sent", ["encoding"])
+CALLBACKS_SCHEDULED_TOTAL = counter("callbacks_scheduled_total", "Callbacks booked through POST /callbacks")
+CALLBACKS_DISPATCHED_TOTAL = counter("callbacks_dispatched_total", "Callbacks handed to the notifier", ["outcome"])
+CALLBACK_DISPATCH_LAG_SECONDS = histogram("callback_dispatch_lag_seconds",
+                                          "Time from a callback's due time to its dispatch")
+CALLBACK_BATCH_SIZE_HISTOGRAM = histogram("callback_batch_size", "Callbacks per notifier batch",
+                                          buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000))
+HANDOFF_REQUESTS_TOTAL = counter("handoff_requests_total", "Talk-now handoff requests", ["outcome"])
+HANDOFF_WAIT_SECONDS = histogram("handoff_wait_seconds", "Time callers waited for a human agent",
+                                 buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+HANDOFF_HANDLE_SECONDS = histogram("handoff_handle_seconds", "Time human agents spent per handed-off call",
+                                   buckets=(30, 60, 120, 300, 600, 900, 1200, 1800, 3600))
+UPSTREAM_LIMIT = gauge("upstream_concurrency_limit", "Adaptive concurrency limit on calls to an upstream",
+                       ["upstream"])
+UPSTREAM_INFLIGHT = gauge("upstream_inflight", "Calls to an upstream in flight", ["upstream"])
+UPSTREAM_QUEUED = gauge("upstream_queued", "Calls waiting for an upstream slot", ["upstream", "priority"])
+UPSTREAM_QUEUE_WAIT_SECONDS = histogram("upstream_queue_wait_seconds", "Time a call waited for an upstream slot",
+                                        ["upstream", "priority"])
+UPSTREAM_CALLS_TOTAL = counter("upstream_calls_total", "Calls to an upstream through its limiter",
+                               ["upstream", "outcome"])
+UPSTREAM_LIMIT_DECREASES_TOTAL = counter("upstream_limit_decreases_total",
+                                         "Times an upstream limit was cut", ["upstream", "cause"])
+LLM_TIER_SECONDS = histogram("llm_tier_seconds", "LLM call latency per call site and model tier",
+                             ["call_site", "tier"])
+LLM_TIER_CALLS_TOTAL = counter("llm_tier_calls_total", "LLM calls per call site and model tier",
+                               ["call_site", "tier", "outcome"])
+LLM_TIER_TOKENS_TOTAL = counter("llm_tier_tokens_total", "LLM tokens per call site and model tier",
+                                ["call_site", "tier", "kind"])
+LLM_COST_USD_TOTAL = counter("llm_cost_usd_total", "Estimated LLM spend from token usage and tier prices",
+                             ["call_site", "tier"])
+LLM_ESCALATIONS_TOTAL = counter("llm_escalations_total", "Cascade answers passed on to a larger tier",
+                                ["call_site", "reason"])
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times LLM and tool runs of a LangChain invocation by run id."""
+
+    def __init__(self, call_site: str = "agent"):
+        self.call_site = call_site
+        self._started: Dict[UUID, Tuple[float, Optional[str]]] = {}
+
+    def _start(self, run_id: UUID, tool: Optional[str] = None):
+        self._started[run_id] = (time.perf_counter(), tool)
+
+    def _finish(self, run_id: UUID) -> Tuple[Optional[float], Optional[str]]:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return None, None
+        return time.perf_counter() - started[0], started[1]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        elapsed, _ = self._finish(run_id)
+        if elapsed is not None:
+            LLM_REQUEST_SECONDS.labels(self.call_site).observe(elapsed)
+        LLM_REQUESTS_TOTAL.labels(self.call_site, "ok").inc()
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS_TOTAL.labels(self.call_site, kind.split("_")[0]).inc(usage[kind])
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        elapsed, _ = self._finish(run_id)
+        if elapsed is not None:
+            LLM_REQUEST_SECONDS.labels(self.call_site).observe(elapsed)
+        LLM_REQUESTS_TOTAL.labels(self.call_site, "error").inc()
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        elapsed, tool = self._finish(run_id)
+        if elapsed is not None:
+            TOOL_CALL_SECONDS.labels(tool).observe(elapsed)
+            TOOL_CALLS_TOTAL.labels(tool, "ok").inc()
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        elapsed, tool = self._finish(run_id)
+        if elapsed is not None:
+            TOOL_CALL_SECONDS.labels(tool).observe(elapsed)
+            TOOL_CALLS_TOTAL.labels(tool, "error").inc()
+
+
+class InstrumentedChatMessageHistory(BaseChatMessageHistory):
+    """Times reads and writes of a wrapped chat history (metrics and trace spans)."""
+
+    def __init__(self, history: BaseChatMessageHistory, backend: str):
+        self.history = history
+        self._read = HISTORY_READ_SECONDS.labels(backend)
+        self._write = HISTORY_WRITE_SECONDS.labels(backend)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with tracing.span("history.read"), self._read.time():
+            return self.history.messages
+
+    def add_messages(self, messages: List[BaseMessage]) -> None:
+        with tracing.span("history.write", messages=len(messages)), self._write.time():
+            self.history.add_messages(messages)
+
+    def clear(self) -> None:
+        with tracing.span("history.clear"), self._write.time():
+            self.history.clear()
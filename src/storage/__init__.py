@@ -0,0 +1,48 @@
+"""
+Shared state backends for chat history, the session registry and
+escalation state. Select one with the STATE_BACKEND environment variable.
+"""
+
+import threading
+from typing import Optional
+
+from src.constants.db import STATE_BACKEND
+from src.storage.base import StateBackend
+
+_backend: Optional[StateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_state_backend(kind: str = None, **kwargs) -> StateBackend:
+    """Build a new backend of the given kind ("sqlite", "memory" or "redis")."""
+    kind = (kind or STATE_BACKEND).lower()
+    if kind == "sqlite":
+        from src.storage.sqlite_backend import SQLiteStateBackend
+        return SQLiteStateBackend(**kwargs)
+    if kind == "memory":
+        from src.storage.memory_backend import InMemoryStateBackend
+        return InMemoryStateBackend(**kwargs)
+    if kind == "redis":
+        from src.storage.redis_backend import RedisStateBackend
+        return RedisStateBackend(**kwargs)
+    raise ValueError(f"Unknown state backend: {kind}")
+
+
+def get_state_backend() -> StateBackend:
+    """Return the process-wide backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_state_backend()
+    return _backend
+
+
+def set_state_backend(backend: StateBackend):
+    """Replace the process-wide backend (used by tests and tooling)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+__all__ = ["StateBackend", "create_state_backend", "get_state_backend", "set_state_backend"]
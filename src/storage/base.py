@@ -0,0 +1,81 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from langchain_core.chat_history import BaseChatMessageHistory
+
+
+class StateBackend(ABC):
+    """
+    Shared state used by every worker: chat history, the session registry
+    and per-session escalation state.
+
+    Implementations must be safe to call from the executor threads.
+    """
+
+    name: str = "base"
+
+    # Chat history
+    @abstractmethod
+    def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
+        """Return a chat message history bound to the session."""
+
+    def clear_chat_history(self, session_id: str):
+        """Delete every stored message of the session."""
+        self.get_chat_history(session_id).clear()
+
+    # Session registry
+    @abstractmethod
+    def register_session(self, session_id: str):
+        """Record a new session and mark it active."""
+
+    @abstractmethod
+    def end_session(self, session_id: str):
+        """Mark the session inactive. The session stays in the history log."""
+
+    @abstractmethod
+    def list_sessions(self) -> List[str]:
+        """Return the currently active session IDs."""
+
+    @abstractmethod
+    def get_last_session_id(self) -> Optional[str]:
+        """Return the most recently registered session ID, if any."""
+
+    # Escalation state
+    @abstractmethod
+    def set_escalation(self, session_id: str, reason: Optional[str] = None):
+        """Flag the session as escalated to a human agent."""
+
+    @abstractmethod
+    def get_escalation(self, session_id: str) -> Optional[dict]:
+        """Return ``{"reason": ..., "escalated_at": ...}`` or None."""
+
+    @abstractmethod
+    def clear_escalation(self, session_id: str):
+        """Remove the escalation flag of the session."""
+
+    def is_escalated(self, session_id: str) -> bool:
+        return self.get_escalation(session_id) is not None
+
+    # Session metadata (fields extracted during the conversation)
+    @abstractmethod
+    def get_session_metadata(self, session_id: str) -> dict:
+        """Return the metadata dict of the session (empty if none)."""
+
+    @abstractmethod
+    def update_session_metadata(self, session_id: str, fields: dict):
+        """Merge ``fields`` into the metadata of the session."""
+
+    # Conversation summaries
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Optional[dict]:
+        """Return the stored summary record of the session, or None."""
+
+    @abstractmethod
+    def save_summary(self, session_id: str, summary: dict):
+        """
+        Store a summary record: ``name``, ``policy_number``, ``summary``
+        and ``message_count`` (number of messages it covers).
+        """
+
+    def close(self):
+        """Release connections held by the backend."""
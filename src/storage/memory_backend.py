@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+
+from src.storage.base import StateBackend
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend. Only valid for a single worker (dev and tests)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histories: Dict[str, InMemoryChatMessageHistory] = {}
+        # dicts keep insertion order, so the last key is the newest session
+        self._sessions: Dict[str, datetime] = {}
+        self._active: Dict[str, datetime] = {}
+        self._escalations: Dict[str, dict] = {}
+        self._summaries: Dict[str, dict] = {}
+        self._metadata: Dict[str, dict] = {}
+
+    def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
+        with self._lock:
+            if session_id not in self._histories:
+                self._histories[session_id] = InMemoryChatMessageHistory()
+            return self._histories[session_id]
+
+    def clear_chat_history(self, session_id: str):
+        with self._lock:
+            history = self._histories.pop(session_id, None)
+        if history is not None:
+            history.clear()
+
+    def register_session(self, session_id: str):
+        now = datetime.utcnow()
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = now
+            self._active[session_id] = now
+
+    def end_session(self, session_id: str):
+        with self._lock:
+            self._active.pop(session_id, None)
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._active.keys())
+
+    def get_last_session_id(self) -> Optional[str]:
+        with self._lock:
+            if not self._sessions:
+                return None
+            return next(reversed(self._sessions))
+
+    def set_escalation(self, session_id: str, reason: Optional[str] = None):
+        with self._lock:
+            self._escalations[session_id] = {
+                "reason": reason,
+                "escalated_at": datetime.utcnow().isoformat(),
+            }
+
+    def get_escalation(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            state = self._escalations.get(session_id)
+            return dict(state) if state else None
+
+    def clear_escalation(self, session_id: str):
+        with self._lock:
+            self._escalations.pop(session_id, None)
+
+    def get_session_metadata(self, session_id: str) -> dict:
+        with self._lock:
+            return dict(self._metadata.get(session_id, {}))
+
+    def update_session_metadata(self, session_id: str, fields: dict):
+        with self._lock:
+            self._metadata.setdefault(session_id, {}).update(fields)
+
+    def get_summary(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            summary = self._summaries.get(session_id)
+            return dict(summary) if summary else None
+
+    def save_summary(self, session_id: str, summary: dict):
+        with self._lock:
+            self._summaries[session_id] = dict(summary)
@@ -0,0 +1,145 @@
+import json
+import time
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from src.constants.db import REDIS_URL, REDIS_KEY_PREFIX, REDIS_SESSION_TTL
+from src.storage.base import StateBackend
+from src.logger import logger
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class RedisChatMessageHistory(BaseChatMessageHistory):
+    """Chat history stored as a redis list of JSON-encoded messages."""
+
+    def __init__(self, client: Any, key: str, ttl: int = 0):
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        items = self.client.lrange(self.key, 0, -1)
+        return messages_from_dict([json.loads(_decode(item)) for item in items])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        pipe = self.client.pipeline()
+        pipe.rpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Backend for any server speaking the redis protocol (Redis, Valkey,
+    KeyDB, ...). Lets several workers and nodes share sessions.
+
+    ``client`` may be any object exposing the redis-py API, e.g. a
+    ``fakeredis.FakeRedis`` instance as an in-process stand-in.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = None, client: Any = None,
+                 prefix: str = REDIS_KEY_PREFIX, ttl: int = REDIS_SESSION_TTL):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "STATE_BACKEND=redis requires the 'redis' package: pip install redis"
+                ) from e
+            client = redis.Redis.from_url(url or REDIS_URL)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        logger.info(f"Redis state backend initialized (prefix={prefix!r}).")
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
+        return RedisChatMessageHistory(self.client, self._key("history", session_id), self.ttl)
+
+    def clear_chat_history(self, session_id: str):
+        self.client.delete(self._key("history", session_id))
+
+    def register_session(self, session_id: str):
+        pipe = self.client.pipeline()
+        pipe.zadd(self._key("sessions", "active"), {session_id: time.time()})
+        pipe.set(self._key("sessions", "last"), session_id)
+        pipe.execute()
+
+    def end_session(self, session_id: str):
+        self.client.zrem(self._key("sessions", "active"), session_id)
+
+    def list_sessions(self) -> List[str]:
+        key = self._key("sessions", "active")
+        if self.ttl:
+            # Drop sessions that were never ended, e.g. after a worker crash
+            self.client.zremrangebyscore(key, "-inf", time.time() - self.ttl)
+        return [_decode(s) for s in self.client.zrange(key, 0, -1)]
+
+    def get_last_session_id(self) -> Optional[str]:
+        return _decode(self.client.get(self._key("sessions", "last")))
+
+    def set_escalation(self, session_id: str, reason: Optional[str] = None):
+        key = self._key("escalation", session_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            "reason": reason or "",
+            "escalated_at": datetime.utcnow().isoformat(),
+        })
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_escalation(self, session_id: str) -> Optional[dict]:
+        state = self.client.hgetall(self._key("escalation", session_id))
+        if not state:
+            return None
+        state = {_decode(k): _decode(v) for k, v in state.items()}
+        return {"reason": state.get("reason") or None, "escalated_at": state.get("escalated_at")}
+
+    def clear_escalation(self, session_id: str):
+        self.client.delete(self._key("escalation", session_id))
+
+    def get_session_metadata(self, session_id: str) -> dict:
+        data = self.client.hgetall(self._key("meta", session_id))
+        return {_decode(k): json.loads(_decode(v)) for k, v in data.items()}
+
+    def update_session_metadata(self, session_id: str, fields: dict):
+        if not fields:
+            return
+        key = self._key("meta", session_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={k: json.dumps(v) for k, v in fields.items()})
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_summary(self, session_id: str) -> Optional[dict]:
+        raw = self.client.get(self._key("summary", session_id))
+        return json.loads(_decode(raw)) if raw else None
+
+    def save_summary(self, session_id: str, summary: dict):
+        record = dict(summary, updated_at=datetime.utcnow().isoformat())
+        self.client.set(self._key("summary", session_id), json.dumps(record),
+                        ex=self.ttl or None)
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close:
+            close()
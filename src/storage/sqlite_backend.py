@@ -0,0 +1,217 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
+
+from src.constants.db import CHAT_MEMORY_ENGINE
+from src.dbio.engine import get_engine, create_registry_engine
+from src.storage.base import StateBackend
+from src.logger import logger
+
+# Number of SQLChatMessageHistory handles kept around (each one owns a scoped session)
+HISTORY_HANDLE_CACHE_SIZE = 1024
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    SQLite backend on the shared engine (WAL mode, see src.dbio.engine).
+    Several workers on the same host can share the file; WAL lets readers
+    proceed while one writer commits.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_url: str = None, engine: Engine = None):
+        # Borrow the shared engine unless a dedicated database was asked for
+        self._owns_engine = engine is None and db_url is not None
+        if engine is None:
+            engine = create_registry_engine(db_url) if db_url else get_engine(CHAT_MEMORY_ENGINE)
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._handles: "OrderedDict[str, SQLChatMessageHistory]" = OrderedDict()
+        self.initialize_db()
+
+    def initialize_db(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS session_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_session_history_timestamp "
+                "ON session_history (timestamp)"
+            ))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS active_session (
+                    session_id TEXT PRIMARY KEY,
+                    started_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS session_escalation (
+                    session_id TEXT PRIMARY KEY,
+                    reason TEXT,
+                    escalated_at DATETIME NOT NULL
+                )
+            """))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS session_metadata (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at DATETIME NOT NULL
+                )
+            """))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS conversation_summary (
+                    session_id TEXT PRIMARY KEY,
+                    message_count INTEGER NOT NULL,
+                    name TEXT,
+                    policy_number TEXT,
+                    summary TEXT,
+                    updated_at DATETIME NOT NULL
+                )
+            """))
+        logger.info("SQLite state backend initialized.")
+
+    def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
+        with self._lock:
+            handle = self._handles.get(session_id)
+            if handle is not None:
+                self._handles.move_to_end(session_id)
+                return handle
+        handle = SQLChatMessageHistory(session_id=session_id, connection=self.engine)
+        with self._lock:
+            self._handles[session_id] = handle
+            while len(self._handles) > HISTORY_HANDLE_CACHE_SIZE:
+                self._handles.popitem(last=False)
+        return handle
+
+    def clear_chat_history(self, session_id: str):
+        self.get_chat_history(session_id).clear()
+        with self._lock:
+            self._handles.pop(session_id, None)
+
+    def register_session(self, session_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO session_history (session_id) VALUES (:sid)"),
+                {"sid": session_id},
+            )
+            conn.execute(
+                text("INSERT OR REPLACE INTO active_session (session_id) VALUES (:sid)"),
+                {"sid": session_id},
+            )
+
+    def end_session(self, session_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM active_session WHERE session_id = :sid"),
+                {"sid": session_id},
+            )
+
+    def list_sessions(self) -> List[str]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT session_id FROM active_session ORDER BY started_at")
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_last_session_id(self) -> Optional[str]:
+        # id is monotonic and indexed; timestamp only has second resolution
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT session_id FROM session_history ORDER BY id DESC LIMIT 1")
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_escalation(self, session_id: str, reason: Optional[str] = None):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT OR REPLACE INTO session_escalation (session_id, reason, escalated_at)
+                    VALUES (:sid, :reason, :ts)
+                """),
+                {"sid": session_id, "reason": reason, "ts": datetime.utcnow().isoformat()},
+            )
+
+    def get_escalation(self, session_id: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT reason, escalated_at FROM session_escalation WHERE session_id = :sid"),
+                {"sid": session_id},
+            ).fetchone()
+        if not row:
+            return None
+        return {"reason": row[0], "escalated_at": row[1]}
+
+    def clear_escalation(self, session_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM session_escalation WHERE session_id = :sid"),
+                {"sid": session_id},
+            )
+
+    def get_session_metadata(self, session_id: str) -> dict:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT data FROM session_metadata WHERE session_id = :sid"),
+                {"sid": session_id},
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_session_metadata(self, session_id: str, fields: dict):
+        # Read-modify-write inside one write transaction
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                text("SELECT data FROM session_metadata WHERE session_id = :sid"),
+                {"sid": session_id},
+            ).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(fields)
+            conn.execute(
+                text("""
+                    INSERT OR REPLACE INTO session_metadata (session_id, data, updated_at)
+                    VALUES (:sid, :data, :ts)
+                """),
+                {"sid": session_id, "data": json.dumps(data), "ts": datetime.utcnow().isoformat()},
+            )
+
+    def get_summary(self, session_id: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT message_count, name, policy_number, summary, updated_at
+                    FROM conversation_summary WHERE session_id = :sid
+                """),
+                {"sid": session_id},
+            ).fetchone()
+        if not row:
+            return None
+        return {"message_count": row[0], "name": row[1], "policy_number": row[2],
+                "summary": row[3], "updated_at": row[4]}
+
+    def save_summary(self, session_id: str, summary: dict):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT OR REPLACE INTO conversation_summary
+                        (session_id, message_count, name, policy_number, summary, updated_at)
+                    VALUES (:sid, :count, :name, :policy_number, :summary, :ts)
+                """),
+                {"sid": session_id, "count": summary["message_count"],
+                 "name": summary.get("name"), "policy_number": summary.get("policy_number"),
+                 "summary": summary.get("summary"), "ts": datetime.utcnow().isoformat()},
+            )
+
+    def close(self):
+        if self._owns_engine:
+            self.engine.dispose()
@@ -1,9 +1,17 @@
+from functools import lru_cache
 from typing import List
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from pydantic.v1 import BaseModel, Field
 from langchain_core.messages import BaseMessage, HumanMessage
-from src.constants.llm import watsonx_llm  # Your WatsonX LLM
+from src.constants import (
+    SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_MAP_CONCURRENCY,
+    CHARS_PER_TOKEN,
+)
+from src.constants.llm import get_chat_model
+from src.logger import logger
 
 # Define the output schema using Pydantic
 class SummaryOutput(BaseModel):
@@ -42,9 +50,6 @@ Conversation History:
 # Create the output parser
 output_parser = JsonOutputParser(pydantic_object=SummaryOutput)
 
-# Create the runnable chain using LCEL (LangChain Expression Language)
-summary_chain = summary_prompt | watsonx_llm | output_parser
-
 # Alternative: If you want to add the format instructions to the prompt
 summary_prompt_with_format = ChatPromptTemplate.from_template("""
 Given the following conversation history between a user and an assistant, extract the user's **name** and **policy number** (if provided), and then summarize the entire conversation in 2-3 lines.
@@ -57,34 +62,261 @@ Conversation History:
 {chat_history}
 """).partial(format_instructions=output_parser.get_format_instructions())
 
-# Chain with format instructions
-summary_chain_with_format = summary_prompt_with_format | watsonx_llm | output_parser
+# Prompt that extends an existing summary with only the turns added since
+summary_update_prompt = ChatPromptTemplate.from_template("""
+Below is a summary of the earlier part of a conversation between a user and an assistant, followed by the new messages exchanged since that summary was written.
+
+Update the summary so it covers the entire conversation in 2-3 lines. Keep the user's **name** and **policy number** from the previous summary unless the new messages provide them or correct them.
+
+If name or policy number is not known, return null for those fields.
+
+Return the result in JSON format like:
+{{
+  "name": "...",
+  "policy_number": "...",
+  "summary": "..."
+}}
+
+Previous summary:
+Name: {name}
+Policy number: {policy_number}
+Summary: {summary}
+
+New messages:
+{chat_history}
+""")
+
+# Free-text only prompts, used when name and policy number were already
+# extracted during the conversation (see src.utils.extraction)
+summary_text_prompt = ChatPromptTemplate.from_template("""
+Summarize the following conversation between a user and an assistant in 2-3 lines. Return only the summary text.
+
+Conversation History:
+{chat_history}
+""")
+
+summary_text_update_prompt = ChatPromptTemplate.from_template("""
+Update this summary of a conversation between a user and an assistant so it also covers the new messages. Keep it to 2-3 lines and return only the summary text.
+
+Previous summary:
+{summary}
+
+New messages:
+{chat_history}
+""")
+
+# Map-reduce mode for long transcripts: each token-bounded chunk is
+# summarized on its own (map), then the partial summaries are merged (reduce)
+chunk_summary_prompt = ChatPromptTemplate.from_template("""
+The following is part {part} of {parts} of a conversation between a user and an assistant.
+
+Summarize this part in a few sentences. Always keep the user's name, policy number, claim details, requests and any escalation if they are mentioned. Return only the summary text.
+
+Conversation part:
+{chat_history}
+""")
+
+summary_reduce_prompt = ChatPromptTemplate.from_template("""
+Below are summaries of consecutive parts of one conversation between a user and an assistant, in order.
+
+Extract the user's **name** and **policy number** (if provided), and then summarize the entire conversation in 2-3 lines.
+
+If name or policy number is not provided, return null for those fields.
+
+Return the result in JSON format like:
+{{
+  "name": "...",
+  "policy_number": "...",
+  "summary": "..."
+}}
+
+Partial summaries:
+{partial_summaries}
+""")
+
+summary_text_reduce_prompt = ChatPromptTemplate.from_template("""
+Below are summaries of consecutive parts of one conversation between a user and an assistant, in order.
+
+Summarize the entire conversation in 2-3 lines. Return only the summary text.
+
+Partial summaries:
+{partial_summaries}
+""")
+
+# The runnable chains (LCEL) are assembled on first use, so importing this
+# module does not construct the watsonx client
+_CHAIN_SPECS = {
+    "summary_chain": (summary_prompt, output_parser),
+    "summary_chain_with_format": (summary_prompt_with_format, output_parser),
+    "summary_update_chain": (summary_update_prompt, output_parser),
+    "summary_text_chain": (summary_text_prompt, StrOutputParser()),
+    "summary_text_update_chain": (summary_text_update_prompt, StrOutputParser()),
+    "chunk_summary_chain": (chunk_summary_prompt, StrOutputParser()),
+    "summary_reduce_chain": (summary_reduce_prompt, output_parser),
+    "summary_text_reduce_chain": (summary_text_reduce_prompt, StrOutputParser()),
+}
+
+@lru_cache(maxsize=None)
+def get_chain(name: str):
+    prompt, parser = _CHAIN_SPECS[name]
+    # JSON summaries are a call site of their own: the cascade checks that they parse
+    call_site = "summary_text" if isinstance(parser, StrOutputParser) else "summary"
+    return prompt | get_chat_model(call_site) | parser
+
+def build_chains():
+    """Assemble every chain now (used by the startup warm-up)"""
+    for name in _CHAIN_SPECS:
+        get_chain(name)
+
+def __getattr__(name: str):
+    # Keeps `from src.summary_chain import summary_chain` working
+    if name in _CHAIN_SPECS:
+        return get_chain(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used to pick single-pass or map-reduce"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def is_long_transcript(chat_history: str) -> bool:
+    return estimate_tokens(chat_history) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS
+
+def chunk_message_history(messages: List[BaseMessage], max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """Split the formatted history into chunks of at most ``max_tokens``, on message boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for line in format_message_history(messages).split("\n"):
+        # A single oversized message is cut into pieces of its own
+        pieces = [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def _map_inputs(messages: List[BaseMessage]) -> List[dict]:
+    chunks = chunk_message_history(messages)
+    logger.info(f"Map-reduce summary over {len(chunks)} chunks")
+    return [{"part": i + 1, "parts": len(chunks), "chat_history": chunk} for i, chunk in enumerate(chunks)]
+
+def _join_partials(partials: List[str]) -> str:
+    return "\n\n".join(f"Part {i + 1}: {text.strip()}" for i, text in enumerate(partials))
+
+def map_partial_summaries(messages: List[BaseMessage]) -> str:
+    """Summarize token-bounded chunks in parallel; returns the ordered partial summaries"""
+    inputs = _map_inputs(messages)
+    partials = get_chain("chunk_summary_chain").batch(inputs, config={"max_concurrency": SUMMARY_MAP_CONCURRENCY})
+    partial_summaries = _join_partials(partials)
+    # Very long calls can produce more partial text than one prompt should hold
+    if is_long_transcript(partial_summaries) and len(inputs) > 1:
+        return map_partial_summaries([HumanMessage(content=p) for p in partials])
+    return partial_summaries
+
+async def amap_partial_summaries(messages: List[BaseMessage]) -> str:
+    """``map_partial_summaries`` without blocking the event loop"""
+    inputs = _map_inputs(messages)
+    partials = await get_chain("chunk_summary_chain").abatch(inputs, config={"max_concurrency": SUMMARY_MAP_CONCURRENCY})
+    partial_summaries = _join_partials(partials)
+    if is_long_transcript(partial_summaries) and len(inputs) > 1:
+        return await amap_partial_summaries([HumanMessage(content=p) for p in partials])
+    return partial_summaries
+
+def condense_history(messages: List[BaseMessage]) -> str:
+    """The transcript itself, or its partial summaries when it is too long for one pass"""
+    chat_history = format_message_history(messages)
+    if not is_long_transcript(chat_history):
+        return chat_history
+    return "(Summaries of consecutive parts of the messages)\n" + map_partial_summaries(messages)
 
 # Usage examples updated for message objects:
 async def run_summary_async(messages: List[BaseMessage]):
     """Run the chain asynchronously with message objects"""
     chat_history = format_message_history(messages)
-    result = await summary_chain.ainvoke({"chat_history": chat_history})
+    if is_long_transcript(chat_history):
+        partial_summaries = await amap_partial_summaries(messages)
+        return await get_chain("summary_reduce_chain").ainvoke({"partial_summaries": partial_summaries})
+    result = await get_chain("summary_chain").ainvoke({"chat_history": chat_history})
     return result
 
 def run_summary_sync(messages: List[BaseMessage]):
     """Run the chain synchronously with message objects"""
     chat_history = format_message_history(messages)
-    result = summary_chain.invoke({"chat_history": chat_history})
+    if is_long_transcript(chat_history):
+        result = get_chain("summary_reduce_chain").invoke({"partial_summaries": map_partial_summaries(messages)})
+    else:
+        result = get_chain("summary_chain").invoke({"chat_history": chat_history})
     print(f"Summary result: {result}")
     return result
 
+def run_summary_update_sync(previous: dict, new_messages: List[BaseMessage]):
+    """Extend a previous summary record with the messages that followed it"""
+    result = get_chain("summary_update_chain").invoke({
+        "name": previous.get("name") or "null",
+        "policy_number": previous.get("policy_number") or "null",
+        "summary": previous.get("summary") or "",
+        "chat_history": condense_history(new_messages),
+    })
+    return result
+
 # For streaming (if your LLM supports it):
 def run_summary_stream(messages: List[BaseMessage]):
     """Stream the response with message objects"""
     chat_history = format_message_history(messages)
-    for chunk in summary_chain.stream({"chat_history": chat_history}):
+    if is_long_transcript(chat_history):
+        # Only the reduce step streams; the map step has to finish first
+        chunks = get_chain("summary_reduce_chain").stream({"partial_summaries": map_partial_summaries(messages)})
+    else:
+        chunks = get_chain("summary_chain").stream({"chat_history": chat_history})
+    for chunk in chunks:
+        yield chunk
+
+def run_summary_update_stream(previous: dict, new_messages: List[BaseMessage]):
+    """Stream the extension of a previous summary record"""
+    for chunk in get_chain("summary_update_chain").stream({
+        "name": previous.get("name") or "null",
+        "policy_number": previous.get("policy_number") or "null",
+        "summary": previous.get("summary") or "",
+        "chat_history": condense_history(new_messages),
+    }):
+        yield chunk
+
+def run_summary_text_sync(messages: List[BaseMessage], previous_summary: str = None) -> str:
+    """Free-text summary; extends ``previous_summary`` when given"""
+    if previous_summary:
+        return get_chain("summary_text_update_chain").invoke({
+            "summary": previous_summary,
+            "chat_history": condense_history(messages),
+        })
+    chat_history = format_message_history(messages)
+    if is_long_transcript(chat_history):
+        return get_chain("summary_text_reduce_chain").invoke({"partial_summaries": map_partial_summaries(messages)})
+    return get_chain("summary_text_chain").invoke({"chat_history": chat_history})
+
+def run_summary_text_stream(messages: List[BaseMessage], previous_summary: str = None):
+    """Stream the free-text summary as text deltas"""
+    if previous_summary:
+        chunks = get_chain("summary_text_update_chain").stream({
+            "summary": previous_summary,
+            "chat_history": condense_history(messages),
+        })
+    else:
+        chat_history = format_message_history(messages)
+        if is_long_transcript(chat_history):
+            chunks = get_chain("summary_text_reduce_chain").stream({"partial_summaries": map_partial_summaries(messages)})
+        else:
+            chunks = get_chain("summary_text_chain").stream({"chat_history": chat_history})
+    for chunk in chunks:
         yield chunk
 
 # For batch processing multiple conversations:
 def run_summary_batch(message_lists: List[List[BaseMessage]]):
     """Process multiple conversations in batch"""
     inputs = [{"chat_history": format_message_history(messages)} for messages in message_lists]
-    results = summary_chain.batch(inputs)
+    results = get_chain("summary_chain").batch(inputs)
     return results
 
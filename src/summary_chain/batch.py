@@ -0,0 +1,315 @@
+"""
+Nightly bulk summarization.
+
+Streams sessions out of chat_memory.db (or out of the retention job's
+gzip archives), summarizes them on a bounded thread pool with retries
+and appends one JSON line per session to the output file as soon as it
+is done. A checkpoint file makes an interrupted run resume where it
+stopped.
+
+    python -m src.summary_chain.batch --db chat_memory.db --out summaries.jsonl
+    python -m src.summary_chain.batch --archive archive/ --out summaries.jsonl --stub
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import create_engine, text
+from langchain_core.messages import BaseMessage, messages_from_dict
+
+from src.logger import logger
+
+# (key, session_id, messages); keys increase in stream order
+SessionRecord = Tuple[str, str, List[BaseMessage]]
+Summarizer = Callable[[List[BaseMessage]], dict]
+
+
+# Sources
+def stream_db_sessions(db_path: str, after: Optional[str] = None,
+                       page_size: int = 5000) -> Iterator[SessionRecord]:
+    """Yield sessions from message_store in session_id order, one session in memory at a time."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    query = text("""
+        SELECT session_id, message FROM message_store
+        WHERE session_id > :after
+        ORDER BY session_id, id
+    """)
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=page_size).execute(
+                query, {"after": after or ""}
+            )
+            current, messages = None, []
+            for session_id, message in result:
+                if session_id != current:
+                    if current is not None:
+                        yield current, current, messages_from_dict(messages)
+                    current, messages = session_id, []
+                messages.append(json.loads(message))
+            if current is not None:
+                yield current, current, messages_from_dict(messages)
+    finally:
+        engine.dispose()
+
+
+def stream_archive_sessions(archive_dir: str, after: Optional[str] = None) -> Iterator[SessionRecord]:
+    """Yield sessions from the per-day archives written by src.dbio.retention."""
+    for path in sorted(glob.glob(os.path.join(archive_dir, "chat-*.jsonl.gz"))):
+        name = os.path.basename(path)
+        if after and name < after.split(":")[0]:
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line_no, line in enumerate(f):
+                key = f"{name}:{line_no:09d}"
+                if after and key <= after:
+                    continue
+                record = json.loads(line)
+                yield key, record["session_id"], messages_from_dict(record["messages"])
+
+
+# Summarizers
+def llm_summarizer(messages: List[BaseMessage]) -> dict:
+    # Imported here so --stub runs never construct the watsonx client
+    from src.summary_chain import run_summary_sync
+    return run_summary_sync(messages)
+
+
+def make_stub_summarizer(latency: float = 0.0, failure_rate: float = 0.0) -> Summarizer:
+    """Deterministic offline summarizer for tests and dry runs."""
+    def summarize(messages: List[BaseMessage]) -> dict:
+        if latency:
+            time.sleep(latency)
+        if failure_rate and random.random() < failure_rate:
+            raise RuntimeError("stub summarizer failure")
+        first_user = next((m.content for m in messages if m.type == "human"), "")
+        digest = hashlib.sha1("".join(str(m.content) for m in messages).encode()).hexdigest()[:8]
+        return {
+            "name": None,
+            "policy_number": None,
+            "summary": f"{len(messages)} messages starting with: {first_user[:80]} [{digest}]",
+        }
+    return summarize
+
+
+# Checkpoint
+class Checkpoint:
+    """
+    Tracks settled keys. ``watermark`` is the highest key below which
+    every session is settled; completed keys above it are kept explicitly.
+    Keys that failed after all retries are settled too, so the watermark
+    moves past them, and are kept in ``failed`` with their error.
+
+    The file is a journal: one JSON line per completion, failure or
+    watermark move, appended as they happen. Loading replays it and
+    rewrites it compacted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark: Optional[str] = None
+        self.done: Set[str] = set()
+        self.failed: Dict[str, str] = {}
+        self._journal = None
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self._replay(json.loads(line))
+            self.done = {key for key in self.done if self.watermark is None or key > self.watermark}
+            self.save()
+
+    def _replay(self, entry: dict):
+        if "watermark" in entry:
+            self.watermark = entry["watermark"]
+        done = entry.get("done")
+        if isinstance(done, list):
+            # Single-object checkpoints of earlier versions
+            self.done.update(done)
+        elif done is not None:
+            self.done.add(done)
+        if "failed" in entry:
+            self.failed[entry["failed"]] = entry.get("error", "")
+
+    def settled(self, key: str) -> bool:
+        return key in self.done or key in self.failed
+
+    def mark_done(self, key: str):
+        self.done.add(key)
+        self.failed.pop(key, None)
+        self._append({"done": key})
+
+    def mark_failed(self, key: str, error: str):
+        self.failed[key] = error
+        self._append({"failed": key, "error": error})
+
+    def advance(self, issued: Deque[str]):
+        """Move the watermark over the contiguous prefix of settled keys in ``issued``."""
+        moved = False
+        while issued and self.settled(issued[0]):
+            self.watermark = issued.popleft()
+            self.done.discard(self.watermark)
+            moved = True
+        if moved:
+            self._append({"watermark": self.watermark})
+
+    def _append(self, entry: dict):
+        if self._journal is None:
+            self._journal = open(self.path, "a")
+        self._journal.write(json.dumps(entry) + "\n")
+
+    def flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+
+    def save(self):
+        """Rewrite the journal as the current state."""
+        self.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            if self.watermark is not None:
+                f.write(json.dumps({"watermark": self.watermark}) + "\n")
+            for key in sorted(self.done):
+                f.write(json.dumps({"done": key}) + "\n")
+            for key, error in sorted(self.failed.items()):
+                f.write(json.dumps({"failed": key, "error": error}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# Pipeline
+def _summarize_with_retry(summarize: Summarizer, messages: List[BaseMessage],
+                          retries: int, backoff: float) -> dict:
+    attempt = 0
+    while True:
+        try:
+            return summarize(messages)
+        except Exception:
+            attempt += 1
+            if attempt > retries:
+                raise
+            time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+
+def run_batch(sessions: Iterator[SessionRecord],
+              out_path: str,
+              summarize: Summarizer,
+              checkpoint: Checkpoint,
+              concurrency: int = 4,
+              retries: int = 3,
+              backoff: float = 1.0,
+              report_every: float = 10.0) -> dict:
+    stats = {"sessions": 0, "messages": 0, "failed": 0, "skipped": 0}
+    issued: Deque[str] = deque()
+    in_flight = {}
+    started = last_report = time.perf_counter()
+
+    def report(final: bool = False):
+        elapsed = time.perf_counter() - started
+        rate = stats["sessions"] / elapsed if elapsed else 0.0
+        logger.info(
+            f"{'Finished' if final else 'Progress'}: {stats['sessions']} sessions "
+            f"({rate:.2f}/s, {stats['messages'] / elapsed if elapsed else 0:.1f} msg/s), "
+            f"{stats['failed']} failed, {stats['skipped']} skipped, {len(in_flight)} in flight"
+        )
+
+    def collect(done_futures, out):
+        for future in done_futures:
+            key, session_id, message_count, t0 = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                checkpoint.mark_failed(key, str(e))
+                logger.error(f"Summary failed for session {session_id}: {e}")
+                continue
+            out.write(json.dumps({
+                "key": key,
+                "session_id": session_id,
+                "message_count": message_count,
+                "name": result.get("name"),
+                "policy_number": result.get("policy_number"),
+                "summary": result.get("summary"),
+                "latency_s": round(time.perf_counter() - t0, 3),
+            }) + "\n")
+            out.flush()
+            checkpoint.mark_done(key)
+            stats["sessions"] += 1
+            stats["messages"] += message_count
+        checkpoint.advance(issued)
+        checkpoint.flush()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, open(out_path, "a") as out:
+        for key, session_id, messages in sessions:
+            if checkpoint.settled(key) or not messages:
+                stats["skipped"] += 1
+                continue
+            # Keep at most two sessions per worker in memory
+            while len(in_flight) >= concurrency * 2:
+                done_futures, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(done_futures, out)
+            future = pool.submit(_summarize_with_retry, summarize, messages, retries, backoff)
+            in_flight[future] = (key, session_id, len(messages), time.perf_counter())
+            issued.append(key)
+
+            if time.perf_counter() - last_report >= report_every:
+                report()
+                last_report = time.perf_counter()
+
+        while in_flight:
+            done_futures, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            collect(done_futures, out)
+
+    checkpoint.save()
+    report(final=True)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize recorded or archived sessions to JSONL")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="Path to chat_memory.db")
+    source.add_argument("--archive", help="Directory of retention archives")
+    parser.add_argument("--out", required=True, help="Output JSONL file (appended to)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <out>.checkpoint.json)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="Base retry delay in seconds")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--stub", action="store_true", help="Use the offline stub summarizer")
+    parser.add_argument("--stub-latency", type=float, default=0.0)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.out}.checkpoint.json")
+    if checkpoint.watermark:
+        logger.info(f"Resuming after {checkpoint.watermark}")
+    if args.db:
+        sessions = stream_db_sessions(args.db, after=checkpoint.watermark)
+    else:
+        sessions = stream_archive_sessions(args.archive, after=checkpoint.watermark)
+    summarize = (make_stub_summarizer(args.stub_latency, args.stub_failure_rate)
+                 if args.stub else llm_summarizer)
+
+    stats = run_batch(sessions, args.out, summarize, checkpoint,
+                      concurrency=args.concurrency, retries=args.retries,
+                      backoff=args.backoff, report_every=args.report_every)
+    if checkpoint.failed:
+        logger.warning(f"{len(checkpoint.failed)} sessions failed; their keys and errors are in {checkpoint.path}")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-session summaries cached in the state backend.
+
+A stored summary records how many messages it covers. If the session has
+not grown since, it is served as-is; if new messages arrived, only those
+are sent to the LLM together with the previous summary. When name and
+policy number were already extracted during the call, the LLM is only
+asked for the free-text summary.
+"""
+
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from src.storage import StateBackend, get_state_backend
+from src.summary_chain import run_summary_sync, run_summary_update_sync, run_summary_text_sync
+from src.logger import logger
+
+
+def clean_field(value) -> str:
+    """LLM JSON may carry null as a literal string"""
+    if value is None or str(value).strip().lower() in ("", "null", "none"):
+        return ""
+    return str(value)
+
+
+def apply_extracted_fields(fields: dict, metadata: dict) -> dict:
+    """Deterministically extracted fields win over the LLM's reading, field by field"""
+    return dict(fields, **{key: metadata[key] for key in ("name", "policy_number") if metadata.get(key)})
+
+
+def get_cached_summary(session_id: str, message_count: int,
+                       backend: Optional[StateBackend] = None) -> Optional[dict]:
+    """Return the stored summary if it covers exactly ``message_count`` messages."""
+    backend = backend or get_state_backend()
+    cached = backend.get_summary(session_id)
+    if cached and cached.get("message_count") == message_count:
+        return cached
+    return None
+
+
+def summarize_session_messages(session_id: str, messages: List[BaseMessage],
+                               backend: Optional[StateBackend] = None) -> dict:
+    """Return an up-to-date summary record for the session, updating the store."""
+    backend = backend or get_state_backend()
+    count = len(messages)
+    cached = backend.get_summary(session_id)
+
+    if cached and cached.get("message_count") == count:
+        logger.info(f"Summary cache hit for session {session_id} ({count} messages)")
+        return cached
+
+    metadata = backend.get_session_metadata(session_id)
+    partial = bool(cached) and 0 < cached.get("message_count", 0) < count
+    covered = cached["message_count"] if partial else 0
+    if partial:
+        logger.info(f"Extending summary for session {session_id}: {count - covered} new messages")
+
+    if metadata.get("name") and metadata.get("policy_number"):
+        summary = run_summary_text_sync(messages[covered:], cached["summary"] if partial else None)
+        result = {"name": metadata["name"], "policy_number": metadata["policy_number"], "summary": summary}
+    elif partial:
+        result = run_summary_update_sync(cached, messages[covered:])
+        # The update prompt may drop fields it was told to keep
+        result["name"] = clean_field(result.get("name")) or cached.get("name")
+        result["policy_number"] = clean_field(result.get("policy_number")) or cached.get("policy_number")
+    else:
+        # No summary yet, or the history was reset since it was written
+        result = run_summary_sync(messages)
+
+    result = apply_extracted_fields(result, metadata)
+
+    record = {
+        "name": clean_field(result.get("name")),
+        "policy_number": clean_field(result.get("policy_number")),
+        "summary": clean_field(result.get("summary")),
+        "message_count": count,
+    }
+    backend.save_summary(session_id, record)
+    return record
@@ -0,0 +1,175 @@
+"""
+Background summary jobs.
+
+Summaries are rendered on a small dedicated thread pool so a multi-second
+watsonx call never blocks the event loop or takes a request executor
+thread. Jobs are de-duplicated per session: concurrent requests for the
+same transcript await the same job. Streamed summaries (SSE) are jobs
+too, so they share the pool's concurrency limit and the de-duplication.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from src import upstream
+from src.constants import SUMMARY_MAX_CONCURRENCY
+from src.storage import StateBackend, get_state_backend
+from src.summary_chain.incremental import get_cached_summary, summarize_session_messages
+from src.summary_chain.streaming import SummaryEvent, stream_summary_events, summary_record_events
+from src.logger import logger
+
+
+def _summarize_in_background(session_id: str, messages: List[BaseMessage], backend: StateBackend) -> dict:
+    # Summaries wait behind callers' turns for watsonx
+    with upstream.priority(upstream.BACKGROUND):
+        return summarize_session_messages(session_id, messages, backend)
+
+
+class SummaryJobQueue:
+    def __init__(self, max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+                 backend: Optional[StateBackend] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="summary")
+        self._backend = backend
+        # (session_id, message_count) -> running job
+        self._jobs: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    @property
+    def backend(self) -> StateBackend:
+        return self._backend or get_state_backend()
+
+    async def _in_thread(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _io(self, func, *args):
+        """Short store reads go to the default pool, not behind LLM calls"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def load_messages(self, session_id: str) -> List[BaseMessage]:
+        backend = self.backend
+        return await self._io(lambda: backend.get_chat_history(session_id).messages)
+
+    def submit(self, session_id: str, messages: List[BaseMessage]) -> Optional[asyncio.Task]:
+        """Schedule a summary of ``messages``; returns the (possibly shared) job."""
+        if not messages:
+            return None
+        key = (session_id, len(messages))
+        job = self._jobs.get(key)
+        if job is None:
+            job = asyncio.create_task(self._run(key, _summarize_in_background,
+                                                session_id, messages, self.backend))
+            self._jobs[key] = job
+        return job
+
+    async def _run(self, key: Tuple[str, int], func, *args) -> dict:
+        session_id = key[0]
+        try:
+            return await self._in_thread(func, *args)
+        except Exception as e:
+            logger.error(f"Summary job failed for session {session_id}: {e}")
+            raise
+        finally:
+            self._jobs.pop(key, None)
+
+    async def submit_for_session(self, session_id: str) -> Optional[asyncio.Task]:
+        """Snapshot the session transcript now and summarize it in the background."""
+        messages = await self.load_messages(session_id)
+        job = self.submit(session_id, messages)
+        if job is not None:
+            # Background jobs are fire-and-forget; failures are logged in _run
+            job.add_done_callback(lambda t: t.cancelled() or t.exception())
+            logger.info(f"Summary precompute queued for session {session_id}")
+        return job
+
+    def _pending(self, session_id: str) -> Optional[asyncio.Task]:
+        """The running job covering the most messages of the session, if any."""
+        keys = [key for key in self._jobs if key[0] == session_id]
+        return self._jobs[max(keys, key=lambda key: key[1])] if keys else None
+
+    async def get_summary(self, session_id: str) -> Optional[dict]:
+        """
+        Return the summary of the session: straight from the store when it
+        is current, otherwise from a (shared) job awaited without blocking
+        the loop. Once the transcript is cleared, a precompute still in
+        flight is awaited before the store is read. Returns None when the
+        session has no transcript and no summary.
+        """
+        messages = await self.load_messages(session_id)
+        if not messages:
+            # History is cleared when a call ends; the precompute may still be running
+            job = self._pending(session_id)
+            if job is not None:
+                try:
+                    return await asyncio.shield(job)
+                except Exception:
+                    pass
+            return await self._io(self.backend.get_summary, session_id)
+
+        cached = await self._io(get_cached_summary, session_id, len(messages), self.backend)
+        if cached:
+            return cached
+        # Shielded so a caller that goes away does not cancel a shared job
+        return await asyncio.shield(self.submit(session_id, messages))
+
+    async def stream(self, session_id: str, messages: List[BaseMessage]) -> AsyncIterator[SummaryEvent]:
+        """
+        Summary events for the handoff page (see ``stream_summary_events``).
+
+        When a job for this transcript is already running, it is joined and
+        its result sent once finished. Otherwise the stream runs as the job:
+        it waits for a slot on the summary pool, and requests arriving
+        meanwhile (streamed or not) join it. A client that disconnects does
+        not cancel the job; the finished summary is still stored.
+        """
+        if not messages:
+            record = await self.get_summary(session_id)
+            if record:
+                for event in summary_record_events(record):
+                    yield event
+            return
+
+        key = (session_id, len(messages))
+        job = self._jobs.get(key)
+        if job is not None:
+            record = await asyncio.shield(job)
+            for event in summary_record_events(record):
+                yield event
+            return
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        backend = self.backend
+
+        def produce() -> dict:
+            record = None
+            try:
+                for event, data in stream_summary_events(session_id, messages, backend):
+                    if event == "done":
+                        record = data
+                    loop.call_soon_threadsafe(events.put_nowait, (event, data))
+                return record
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, finished)
+
+        job = asyncio.create_task(self._run(key, produce))
+        # Nobody may be left to await it if the client goes away; failures are logged in _run
+        job.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._jobs[key] = job
+        while True:
+            item = await events.get()
+            if item is finished:
+                break
+            yield item
+        # Raises when the summary failed part way
+        await asyncio.shield(job)
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._executor.shutdown(wait=False)
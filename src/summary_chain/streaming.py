@@ -0,0 +1,126 @@
+"""
+Progressive summary events for the handoff page.
+
+The JSON parser yields growing partial objects. A field is final once
+the model has moved on to the next key (the prompt asks for name, then
+policy_number, then summary), so name and policy number are emitted as
+soon as they are complete and the summary text is emitted as deltas.
+Fields already extracted during the call are sent before the LLM starts.
+"""
+
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from src.storage import StateBackend, get_state_backend
+from src.summary_chain import run_summary_stream, run_summary_update_stream, run_summary_text_stream
+from src.summary_chain.incremental import apply_extracted_fields, clean_field
+from src.logger import logger
+
+FIELD_ORDER = ["name", "policy_number", "summary"]
+
+# (event, data)
+SummaryEvent = Tuple[str, dict]
+
+
+def summary_record_events(record: dict) -> Iterator[SummaryEvent]:
+    """The events for a summary that is already finished."""
+    yield "field", {"name": record.get("name") or "", "policy_number": record.get("policy_number") or ""}
+    yield "summary", {"delta": record.get("summary") or ""}
+    yield "done", record
+
+
+def stream_summary_events(session_id: str, messages: List[BaseMessage],
+                          backend: Optional[StateBackend] = None) -> Iterator[SummaryEvent]:
+    """
+    Yield ``("field", {...})`` for name and policy number, ``("summary",
+    {"delta": ...})`` while the summary is generated, and finally
+    ``("done", record)``. The finished record is stored like any other
+    summary, so later requests are served from the cache.
+    """
+    backend = backend or get_state_backend()
+    count = len(messages)
+    cached = backend.get_summary(session_id)
+
+    # Serve the stored summary when it is current, or when the history is already gone
+    if cached and (not messages or cached.get("message_count") == count):
+        yield from summary_record_events(cached)
+        return
+
+    partial_cache = bool(cached) and 0 < cached.get("message_count", 0) < count
+    metadata = backend.get_session_metadata(session_id)
+    if metadata.get("name") and metadata.get("policy_number"):
+        yield from _stream_text_summary(session_id, messages, cached if partial_cache else None,
+                                        metadata, backend)
+        return
+
+    if partial_cache:
+        chunks = run_summary_update_stream(cached, messages[cached["message_count"]:])
+    else:
+        cached = None
+        chunks = run_summary_stream(messages)
+
+    # A field extracted during the call is sent now and wins over the LLM's
+    extracted = apply_extracted_fields({}, metadata)
+    if extracted:
+        yield "field", extracted
+    emitted = set(extracted)
+    summary_sent = ""
+    partial: dict = {}
+    for partial in chunks:
+        if not isinstance(partial, dict):
+            continue
+        # Everything before the last key present is complete
+        present = [key for key in FIELD_ORDER if key in partial]
+        complete = present[:-1]
+        fields = {}
+        for key in complete:
+            if key != "summary" and key not in emitted:
+                fields[key] = clean_field(partial.get(key)) or (cached or {}).get(key) or ""
+                emitted.add(key)
+        if fields:
+            yield "field", fields
+
+        summary = partial.get("summary")
+        if isinstance(summary, str) and summary.startswith(summary_sent) and len(summary) > len(summary_sent):
+            yield "summary", {"delta": summary[len(summary_sent):]}
+            summary_sent = summary
+
+    record = apply_extracted_fields({
+        "name": clean_field(partial.get("name")) or (cached or {}).get("name") or "",
+        "policy_number": clean_field(partial.get("policy_number")) or (cached or {}).get("policy_number") or "",
+        "summary": clean_field(partial.get("summary")),
+        "message_count": count,
+    }, metadata)
+    remaining = {key: record[key] for key in ("name", "policy_number") if key not in emitted}
+    if remaining:
+        yield "field", remaining
+    try:
+        backend.save_summary(session_id, record)
+    except Exception as e:
+        logger.error(f"Failed to store streamed summary for session {session_id}: {e}")
+    yield "done", record
+
+
+def _stream_text_summary(session_id: str, messages: List[BaseMessage], cached: Optional[dict],
+                         metadata: dict, backend: StateBackend) -> Iterator[SummaryEvent]:
+    """Fields come from the session metadata; only the free text is generated."""
+    yield "field", {"name": metadata["name"], "policy_number": metadata["policy_number"]}
+    covered = cached["message_count"] if cached else 0
+    text = ""
+    for delta in run_summary_text_stream(messages[covered:], cached["summary"] if cached else None):
+        if delta:
+            text += delta
+            yield "summary", {"delta": delta}
+
+    record = {
+        "name": metadata["name"],
+        "policy_number": metadata["policy_number"],
+        "summary": text.strip(),
+        "message_count": len(messages),
+    }
+    try:
+        backend.save_summary(session_id, record)
+    except Exception as e:
+        logger.error(f"Failed to store streamed summary for session {session_id}: {e}")
+    yield "done", record
@@ -0,0 +1,439 @@
+"""
+Supervisor mode: N uvicorn workers behind one port, with requests routed
+to a worker by session.
+
+    python -m src.supervisor --workers 4 --port 8080 [-- uvicorn options]
+    WORKERS=4 python app.py
+
+Each worker is its own process (and GIL) serving app:app on a unix
+socket. The supervisor accepts connections on the public port, reads the
+request head and picks a worker:
+
+- /handoff/ requests go to the worker holding the talk-now queue
+  (SUPERVISOR_HANDOFF_WORKER);
+- ``?worker=N`` pins the request to worker N (per-worker /metrics,
+  /debug pages);
+- otherwise a session id is taken from ``?session_id=``, the
+  ``X-Session-Id`` header, ``/sessions/{id}/...`` paths or the
+  ``session_id`` field of a small JSON body, and hashed to a worker;
+- a /ws/chat upgrade without one is given a new session id, so later
+  requests for that session reach the same worker;
+- anything else goes to the worker with the fewest open connections.
+
+Hashing is rendezvous (highest random weight) over worker slots. While a
+worker is down only its own sessions move.
+
+Each connection carries one request: the worker is asked to close after
+the response (``Connection: close``). WebSocket upgrades stay open for
+the whole call. Where client keep-alive matters, put a proxy that keeps
+connections alive (nginx) in front.
+
+A worker takes traffic once /health reports it warmed up, or after
+WORKER_READY_TIMEOUT_SECONDS. Crashed workers are started again. SIGHUP
+replaces the workers one at a time: each replacement warms up before it
+takes over its slot, and the old worker gets WORKER_GRACEFUL_SECONDS to
+finish its requests and calls.
+
+State kept in a worker's memory (traces, call turns) stays in that
+worker. The talk-now queue is held by one worker: the others relay their
+callers' requests to it through the supervisor, and it sends the updates
+back pinned to the caller's worker (see src/handoff.py). A /ws/gateway
+connection carries many sessions and goes to a single worker.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import uuid
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from src.constants.supervisor import (
+    WORKERS,
+    HOST,
+    PORT,
+    SUPERVISOR_SOCKET_DIR,
+    WORKER_READY_TIMEOUT_SECONDS,
+    WORKER_GRACEFUL_SECONDS,
+    SUPERVISOR_ROUTE_BODY_LIMIT,
+    SUPERVISOR_HEADER_TIMEOUT_SECONDS,
+    SUPERVISOR_HANDOFF_WORKER,
+)
+from src.logger import logger
+
+_SESSION_PATH = re.compile(r"^(?:/debug)?/sessions/([^/]+)/")
+# Set again by the supervisor for each forwarded request
+_DROPPED_HEADERS = frozenset({"connection", "keep-alive", "proxy-connection"})
+_PIPE_CHUNK = 65536
+
+
+class Worker:
+    def __init__(self, slot: int, socket_path: str, process: asyncio.subprocess.Process):
+        self.slot = slot
+        self.socket_path = socket_path
+        self.process = process
+        self.ready = False
+        self.connections = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+
+def _weight(key: str, slot: int) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{slot}:{key}".encode(), digest_size=8).digest(), "big")
+
+
+def parse_head(head: bytes) -> Tuple[str, str, str, List[Tuple[str, str]]]:
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ", 2)
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers.append((name.strip(), value.strip()))
+    return method, target, version, headers
+
+
+def session_key(target: str, headers: Sequence[Tuple[str, str]]) -> Optional[str]:
+    """The session a request belongs to, from its URL or headers."""
+    url = urlsplit(target)
+    session_ids = parse_qs(url.query).get("session_id")
+    if session_ids and session_ids[0]:
+        return session_ids[0]
+    for name, value in headers:
+        if name.lower() == "x-session-id" and value:
+            return value
+    match = _SESSION_PATH.match(url.path)
+    return unquote(match.group(1)) if match else None
+
+
+def _body_session_id(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    value = data.get("session_id") if isinstance(data, dict) else None
+    return value if isinstance(value, str) and value else None
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(_PIPE_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+def _close(writer: asyncio.StreamWriter):
+    try:
+        writer.close()
+    except Exception:
+        pass
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, reason: str, detail: str):
+    body = json.dumps({"error": detail, "status_code": status}).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    try:
+        await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    _close(writer)
+
+
+class Supervisor:
+    def __init__(self, app: str = "app:app", workers: int = WORKERS, host: str = HOST, port: int = PORT,
+                 socket_dir: str = SUPERVISOR_SOCKET_DIR, worker_args: Sequence[str] = ()):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.socket_dir = socket_dir
+        self.worker_args = list(worker_args)
+        self.workers: List[Optional[Worker]] = [None] * max(workers, 1)
+        self.handoff_worker = min(max(SUPERVISOR_HANDOFF_WORKER, 0), len(self.workers) - 1)
+        # Workers relaying talk-now requests to the handoff worker authenticate with this
+        self._relay_token = secrets.token_urlsafe(32)
+        self._generation = 0
+        self._replacing = set()
+        self._stopping: Optional[asyncio.Event] = None
+        self._restart_lock: Optional[asyncio.Lock] = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._restart_lock = asyncio.Lock()
+        own_dir = not self.socket_dir
+        if own_dir:
+            self.socket_dir = tempfile.mkdtemp(prefix="voicebot-workers-")
+
+        # Serve as soon as every worker listens; warm-up finishes in the background
+        started = await asyncio.gather(*(self._spawn(slot) for slot in range(len(self.workers))))
+        for worker in started:
+            self.workers[worker.slot] = worker
+        warming = [asyncio.create_task(self._wait_ready(worker)) for worker in started]
+
+        server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+        logger.info(f"Supervisor listening on {self.host}:{self.port} with {len(self.workers)} workers")
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.rolling_restart()))
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+        monitor = asyncio.create_task(self._monitor())
+
+        await self._stopping.wait()
+        logger.info("Supervisor shutting down...")
+        server.close()
+        monitor.cancel()
+        for task in warming:
+            task.cancel()
+        await asyncio.gather(*(self._stop_worker(w) for w in self.workers if w is not None))
+        if own_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    # Workers
+    async def _spawn(self, slot: int) -> Worker:
+        """Start a worker for ``slot`` and wait until its socket accepts connections."""
+        self._generation += 1
+        socket_path = os.path.join(self.socket_dir, f"worker-{slot}-{self._generation}.sock")
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", self.app,
+            "--uds", socket_path,
+            "--timeout-graceful-shutdown", str(WORKER_GRACEFUL_SECONDS),
+            "--proxy-headers", "--forwarded-allow-ips", "*",
+            *self.worker_args,
+            env={**os.environ, **self._worker_env(slot)},
+        )
+        worker = Worker(slot, socket_path, process)
+        deadline = time.monotonic() + WORKER_READY_TIMEOUT_SECONDS
+        while await self._health(worker) is None:
+            if not worker.alive or time.monotonic() > deadline:
+                await self._stop_worker(worker)
+                raise RuntimeError(f"Worker {slot} did not start (exit code {process.returncode})")
+            await asyncio.sleep(0.2)
+        logger.info(f"Worker {slot} (pid {process.pid}) listening on {socket_path}")
+        return worker
+
+    def _worker_env(self, slot: int) -> dict:
+        # Workers reach each other through the public port
+        host = "127.0.0.1" if self.host in ("", "0.0.0.0", "::") else self.host
+        return {
+            "WORKER_INDEX": str(slot),
+            "HANDOFF_OWNER_WORKER": str(self.handoff_worker),
+            "HANDOFF_RELAY_URL": f"http://{f'[{host}]' if ':' in host else host}:{self.port}",
+            "HANDOFF_RELAY_TOKEN": self._relay_token,
+        }
+
+    async def _health(self, worker: Worker) -> Optional[int]:
+        """Status code of the worker's /health, or None if it does not answer."""
+        try:
+            reader, writer = await asyncio.open_unix_connection(worker.socket_path)
+        except OSError:
+            return None
+        try:
+            writer.write(b"GET /health HTTP/1.1\r\nHost: supervisor\r\nConnection: close\r\n\r\n")
+            status_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            return int(status_line.split()[1])
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            return None
+        finally:
+            _close(writer)
+
+    async def _wait_ready(self, worker: Worker):
+        deadline = worker.started_at + WORKER_READY_TIMEOUT_SECONDS
+        while worker.alive and time.monotonic() < deadline:
+            if await self._health(worker) == 200:
+                logger.info(f"Worker {worker.slot} warmed up in {time.monotonic() - worker.started_at:.1f}s")
+                break
+            await asyncio.sleep(0.5)
+        else:
+            if worker.alive:
+                logger.warning(f"Worker {worker.slot} not healthy after {WORKER_READY_TIMEOUT_SECONDS}s; "
+                               f"giving it traffic anyway")
+        worker.ready = True
+
+    async def _replace(self, slot: int):
+        """Start a new worker for ``slot``, warm it up, then retire the old one."""
+        self._replacing.add(slot)
+        try:
+            worker = await self._spawn(slot)
+            await self._wait_ready(worker)
+            previous, self.workers[slot] = self.workers[slot], worker
+        finally:
+            self._replacing.discard(slot)
+        if previous is not None:
+            asyncio.ensure_future(self._stop_worker(previous))
+
+    async def _stop_worker(self, worker: Worker):
+        if worker.alive:
+            worker.process.terminate()
+            try:
+                await asyncio.wait_for(worker.process.wait(), timeout=WORKER_GRACEFUL_SECONDS + 5)
+            except asyncio.TimeoutError:
+                logger.warning(f"Worker {worker.slot} (pid {worker.process.pid}) did not stop; killing it")
+                worker.process.kill()
+                await worker.process.wait()
+        try:
+            os.unlink(worker.socket_path)
+        except OSError:
+            pass
+
+    async def rolling_restart(self):
+        """Replace every worker, one at a time."""
+        async with self._restart_lock:
+            logger.info("Rolling restart of workers...")
+            for slot in range(len(self.workers)):
+                try:
+                    await self._replace(slot)
+                except Exception as e:
+                    logger.error(f"Rolling restart stopped at worker {slot}: {e}")
+                    return
+            logger.info("Rolling restart finished")
+
+    async def _monitor(self):
+        """Start crashed workers again; wait longer each time one dies soon after starting."""
+        failures = [0] * len(self.workers)
+        while True:
+            await asyncio.sleep(1)
+            for slot, worker in enumerate(self.workers):
+                if worker is None or worker.alive or slot in self._replacing:
+                    continue
+                lived = time.monotonic() - worker.started_at
+                failures[slot] = failures[slot] + 1 if lived < 30 else 1
+                logger.error(f"Worker {slot} (pid {worker.process.pid}) exited with code "
+                             f"{worker.process.returncode} after {lived:.0f}s; restarting")
+                self._replacing.add(slot)
+                asyncio.ensure_future(self._restart_crashed(slot, min(2 ** (failures[slot] - 1), 60)))
+
+    async def _restart_crashed(self, slot: int, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            await self._replace(slot)
+        except Exception as e:
+            logger.error(f"Worker {slot} failed to restart: {e}")
+        finally:
+            self._replacing.discard(slot)
+
+    # Routing
+    def pick(self, key: Optional[str], pinned: Optional[int] = None) -> Optional[Worker]:
+        if pinned is not None:
+            worker = self.workers[pinned] if 0 <= pinned < len(self.workers) else None
+            return worker if worker is not None and worker.alive else None
+        alive = [w for w in self.workers if w is not None and w.alive]
+        candidates = [w for w in alive if w.ready] or alive
+        if not candidates:
+            return None
+        if key is None:
+            return min(candidates, key=lambda w: w.connections)
+        return max(candidates, key=lambda w: _weight(key, w.slot))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), SUPERVISOR_HEADER_TIMEOUT_SECONDS)
+            method, target, version, headers = parse_head(head)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError,
+                ConnectionError):
+            _close(writer)
+            return
+
+        fields = {name.lower(): value for name, value in headers}
+        upgrade = fields.get("upgrade", "").lower() == "websocket"
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path.startswith("/handoff/"):
+            # The talk-now queue and its agents live in one worker
+            pinned = self.handoff_worker
+        else:
+            pinned = int(query["worker"][0]) if query.get("worker", [""])[0].isdigit() else None
+
+        key = session_key(target, headers)
+        body = b""
+        if key is None and not upgrade and "json" in fields.get("content-type", "") \
+                and "transfer-encoding" not in fields:
+            try:
+                length = int(fields.get("content-length", "0") or 0)
+            except ValueError:
+                await _respond(writer, 400, "Bad Request", "Invalid Content-Length")
+                return
+            if 0 < length <= SUPERVISOR_ROUTE_BODY_LIMIT:
+                try:
+                    body = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    _close(writer)
+                    return
+                key = _body_session_id(body)
+        if key is None and upgrade and url.path == "/ws/chat":
+            key = str(uuid.uuid4())
+            target += ("&" if url.query else "?") + "session_id=" + quote(key)
+
+        worker = self.pick(key, pinned)
+        if worker is None:
+            await _respond(writer, 503, "Service Unavailable", "No worker available")
+            return
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_unix_connection(worker.socket_path)
+        except OSError as e:
+            logger.error(f"Worker {worker.slot} refused a connection: {e}")
+            await _respond(writer, 502, "Bad Gateway", "Worker unavailable")
+            return
+
+        peer = writer.get_extra_info("peername")
+        forwarded = [(name, value) for name, value in headers
+                     if name.lower() not in _DROPPED_HEADERS and name.lower() != "x-forwarded-for"]
+        client_chain = ", ".join(filter(None, [fields.get("x-forwarded-for"), peer[0] if peer else None]))
+        if client_chain:
+            forwarded.append(("X-Forwarded-For", client_chain))
+        # One request per connection; an upgrade keeps the connection for the call
+        forwarded.append(("Connection", fields.get("connection", "Upgrade") if upgrade else "close"))
+        head = f"{method} {target} {version}\r\n" + "".join(f"{n}: {v}\r\n" for n, v in forwarded) + "\r\n"
+
+        worker.connections += 1
+        to_worker = None
+        try:
+            upstream_writer.write(head.encode("latin-1") + body)
+            to_worker = asyncio.create_task(_pipe(reader, upstream_writer))
+            await _pipe(upstream_reader, writer)
+        finally:
+            worker.connections -= 1
+            if to_worker is not None:
+                to_worker.cancel()
+            _close(upstream_writer)
+            _close(writer)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Run N app workers behind one port, routed by session",
+        epilog="Arguments after -- are passed to every uvicorn worker.",
+    )
+    parser.add_argument("--app", default="app:app")
+    parser.add_argument("--workers", type=int, default=WORKERS if WORKERS > 1 else os.cpu_count() or 1)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket-dir", default=SUPERVISOR_SOCKET_DIR)
+    args, worker_args = parser.parse_known_args(argv)
+    if worker_args[:1] == ["--"]:
+        worker_args = worker_args[1:]
+    asyncio.run(Supervisor(args.app, args.workers, args.host, args.port, args.socket_dir, worker_args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 from langchain_core.tools import tool
 
-from src.constants.llm import watsonx_llm
+from src.constants.llm import get_chat_model
 from src.tools.escalation_tool import escalate_to_voice_tool
 from src.tools.watsonx_tool import search_faq_tool
+from src.tools.verification_tool import verify_policyholder_tool
 
 
 
@@ -13,7 +14,7 @@ def default_chat_tool(query: str) -> dict:
     using the LLM to generate a natural response.
     """
     # Use the LLM to generate a conversational response
-    response = watsonx_llm.invoke(query)
+    response = get_chat_model("small_talk").invoke(query)
     # If the response is an AIMessage, extract content
     message = getattr(response, "content", str(response))
     return {
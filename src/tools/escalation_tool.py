@@ -1,12 +1,6 @@
 import os, sys
 from typing import Any, Dict, Optional
 from langchain_core.tools import tool
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-from fpdf import FPDF
 from src.constants import *
 import re
 import logging
@@ -0,0 +1,46 @@
+from typing import Any, Dict
+from langchain_core.tools import tool
+
+from src.dbio.policyholders import verify_policyholder
+from src.logger import logger
+
+
+@tool
+def verify_policyholder_tool(name: str, policy_number: str) -> Dict[str, Any]:
+    """
+    Verify the customer's identity against our policyholder records.
+
+    Use this tool as soon as the customer has given both their full name
+    and their policy number. Case and spacing differences are tolerated.
+
+    Args:
+        name: The customer's full name as they provided it
+        policy_number: The customer's policy number as they provided it
+
+    Returns:
+        Dict containing "verified" (bool) and a message to relay
+    """
+    try:
+        result = verify_policyholder(name, policy_number)
+    except Exception as e:
+        logger.error(f"Error in verify_policyholder_tool: {e}")
+        return {
+            "verified": False,
+            "message": "I'm unable to verify your details right now. Let me connect you with a human agent.",
+            "show_escalation_buttons": True,
+            "escalation_reason": "verification_unavailable",
+        }
+
+    logger.info(f"Policyholder verification for {result.get('policy_number')}: {result['verified']}")
+    if result["verified"]:
+        return {
+            "verified": True,
+            "message": f"Thank you, {result['name']}. You have been verified successfully.",
+        }
+    return {
+        "verified": False,
+        "message": (
+            "I couldn't match that name and policy number in our records. "
+            "Could you please check and provide them again?"
+        ),
+    }
@@ -1,20 +1,14 @@
 import os, sys
 from typing import Any, Dict, Optional
 from langchain_core.tools import tool
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-from fpdf import FPDF
 from src.constants import *
 import re
 from pydantic import BaseModel, Field
 from langchain_core.tools.structured import StructuredTool
 
-from src.agents.wxorc_agent import OrchestrateClient
-
+from src import upstream
 from src.logger import logger
+from src.utils.cancellation import TurnCancelled
 
 
 @tool
@@ -59,6 +53,7 @@ def search_faq_tool(query: str) -> Dict[str, Any]:
         - No results found: Escalates to human agent with explanation
         - API/system errors: Gracefully escalates to human support
         - Timeout errors: Falls back to human agent escalation
+        - Orchestrate overloaded (throttled, or no free slot): Asks the user to try again
     """
     try:
         logger.info(f"Searching FAQ database via Watson X Orchestrate for: {query}")
@@ -96,6 +91,10 @@ def search_faq_tool(query: str) -> Dict[str, Any]:
 
         return response
 
+    except TurnCancelled:
+        # Not a failure: the caller asked something else, so no escalation
+        raise
+
     except TimeoutError as e:
         logger.error(f"Watson X Orchestrate timeout: {e}")
         return {
@@ -113,6 +112,13 @@ def search_faq_tool(query: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
+        if upstream.is_overloaded(e):
+            # Orchestrate is busy, not broken: ask again rather than escalate
+            logger.warning(f"Watson X Orchestrate overloaded: {e}")
+            return {
+                "message": "Our knowledge base is busy right now. Please try asking again in a moment.",
+                "show_escalation_buttons": False
+            }
         logger.error(f"Error in search_faq_tool with Watson X Orchestrate: {e}")
         return {
             "message": "I'm having trouble accessing that information right now. Let me connect you with our claim specialist who can help.",
@@ -137,6 +143,9 @@ def invoke_watsonx_rag_agent(query: str) -> str:
         Exception: For other API-related errors
     """
     
+    # Imported on first use; the token itself is cached across clients
+    from src.agents.wxorc_agent import OrchestrateClient
+
     client = OrchestrateClient()
     wx_response = client.ask(query)
     
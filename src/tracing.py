@@ -0,0 +1,327 @@
+"""
+Per-turn traces.
+
+Every chat turn gets a trace ID. Spans opened anywhere below it (agent,
+LLM and tool runs, Orchestrate calls, history reads and writes) attach
+to the current trace through a context variable, so work handed to the
+request executor must run inside ``contextvars.copy_context().run``.
+Finished turns go into a bounded per-session ring buffer served by
+``/debug/sessions/{id}/turns`` and, optionally, to an OTLP/HTTP collector.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.constants import (
+    TRACE_MAX_SESSIONS,
+    TRACE_TURNS_PER_SESSION,
+    OTLP_TRACES_ENDPOINT,
+    OTLP_SERVICE_NAME,
+)
+from src.logger import logger
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, Any] = attributes
+        self.status = "ok"
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.end = time.time()
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+
+
+class Trace:
+    """All spans of one turn; appended to from any thread in the turn's context."""
+
+    def __init__(self, session_id: str, name: str = "turn"):
+        self.trace_id = _new_id(16)
+        self.session_id = session_id
+        self.root = Span(self.trace_id, name, session_id=session_id)
+        self.spans: List[Span] = [self.root]
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        """Waterfall view: spans in start order with offsets from the turn start"""
+        origin = self.root.start
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        depth = {self.root.span_id: 0}
+        rows = []
+        for span in spans:
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+            end = span.end if span.end is not None else time.time()
+            rows.append({
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "depth": depth[span.span_id],
+                "offset_ms": round((span.start - origin) * 1000, 2),
+                "duration_ms": round((end - span.start) * 1000, 2),
+                "status": span.status,
+                "attributes": span.attributes,
+            })
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "started_at": origin,
+            "duration_ms": rows[0]["duration_ms"],
+            "status": self.root.status,
+            "spans": rows,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+class TraceBuffer:
+    """Last N turns per session for the most recently traced sessions."""
+
+    def __init__(self, max_sessions: int = TRACE_MAX_SESSIONS,
+                 turns_per_session: int = TRACE_TURNS_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.turns_per_session = turns_per_session
+        self._sessions: "OrderedDict[str, Deque[Trace]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            turns = self._sessions.pop(trace.session_id, None)
+            if turns is None:
+                turns = deque(maxlen=self.turns_per_session)
+            turns.append(trace)
+            self._sessions[trace.session_id] = turns
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def get_turns(self, session_id: str, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            turns = list(self._sessions.get(session_id, ()))
+        if limit:
+            turns = turns[-limit:]
+        return [turn.to_dict() for turn in turns]
+
+
+trace_buffer = TraceBuffer()
+
+
+class OTLPExporter:
+    """Ships finished turns to an OTLP/HTTP JSON endpoint from a background thread."""
+
+    def __init__(self, endpoint: str, service_name: str = OTLP_SERVICE_NAME,
+                 batch_size: int = 50, max_queue: int = 5000):
+        import requests
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._session = requests.Session()
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            # Never slow a turn down for tracing
+            pass
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._session.post(self.endpoint, json=self._payload(batch), timeout=5)
+            except Exception as e:
+                logger.warning(f"OTLP export of {len(batch)} traces failed: {e}")
+
+    def _payload(self, traces: List[Trace]) -> dict:
+        def attr(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = []
+        for trace in traces:
+            for span in list(trace.spans):
+                end = span.end if span.end is not None else span.start
+                spans.append({
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(int(span.start * 1e9)),
+                    "endTimeUnixNano": str(int(end * 1e9)),
+                    "attributes": [attr(k, v) for k, v in span.attributes.items()],
+                    "status": {"code": 2 if span.status == "error" else 1},
+                })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attr("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": spans}],
+        }]}
+
+
+exporter: Optional[OTLPExporter] = OTLPExporter(OTLP_TRACES_ENDPOINT) if OTLP_TRACES_ENDPOINT else None
+
+
+@contextmanager
+def start_turn(session_id: str, name: str = "turn", **attributes):
+    """Open a new trace for one turn; it is recorded when the block exits."""
+    trace = Trace(session_id, name)
+    trace.root.attributes.update(attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        trace.root.finish(error)
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace_buffer.add(trace)
+        if exporter is not None:
+            exporter.export(trace)
+
+
+def record_span(name: str, started_at: float, **attributes):
+    """Add an already finished span (``started_at`` is epoch seconds) under the current span."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    finished = Span(trace.trace_id, name, parent.span_id if parent else None, **attributes)
+    finished.start = started_at
+    finished.finish()
+    trace.add(finished)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; a no-op outside a turn."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(trace.trace_id, name, parent.span_id if parent else None, **attributes)
+    trace.add(current)
+    token = _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        current.finish(error)
+        _current_span.reset(token)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records LLM and tool runs of a LangChain invocation as spans of the current turn."""
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        # Span that was current before a tool run started, restored when it ends
+        self._restore: Dict[UUID, Optional[Span]] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes) -> Optional[Span]:
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        parent = self._spans.get(parent_run_id) if parent_run_id else None
+        if parent is None:
+            parent = _current_span.get()
+        span = Span(trace.trace_id, name, parent.span_id if parent else None, **attributes)
+        trace.add(span)
+        self._spans[run_id] = span
+        return span
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.finish(error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "llm", messages=sum(len(m) for m in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        span = self._spans.get(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if span is not None:
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if usage.get(kind):
+                    span.attributes[kind] = usage[kind]
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        previous = _current_span.get()
+        span = self._start(run_id, parent_run_id, f"tool.{name}")
+        if span is not None:
+            # The tool body runs in a copy of this context, so its own spans nest here
+            self._restore[run_id] = previous
+            _current_span.set(span)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        self._finish_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish_tool(run_id, error)
+
+    def _finish_tool(self, run_id: UUID, error: Optional[BaseException] = None):
+        self._finish(run_id, error)
+        if run_id in self._restore:
+            _current_span.set(self._restore.pop(run_id))
@@ -0,0 +1,376 @@
+"""
+Adaptive concurrency limits on outbound calls to watsonx and Orchestrate.
+
+Every executor thread can call an upstream at once, and a throttled
+upstream only gets busier if each call keeps retrying on its own. Calls
+therefore go through one ``AdaptiveLimiter`` per upstream, which lets
+at most ``limit`` of them run and queues the rest:
+
+- the limit grows by one for every window of successful calls that used
+  it fully (additive increase);
+- a throttling response (429, 502, 503, 504), a timeout, or a call much
+  slower than the no-load latency cuts it by ``UPSTREAM_BACKOFF_RATIO``
+  (multiplicative decrease), at most once per window: only a call that
+  started after the previous cut can cut it again.
+
+Queued calls are served by priority, then in arrival order: turns of
+sessions that already had one, then new sessions, then background work
+such as summaries. The priority travels with the turn in a context
+variable, like the cancel token, so deep call sites need no argument.
+
+A throttled call is retried here, queueing for a slot again, instead
+of inside the watsonx SDK; see ``WX_MAX_RETRIES``.
+"""
+
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+import requests
+
+from src.constants.upstream import (
+    UPSTREAM_LIMITER_ENABLED,
+    WATSONX_CONCURRENCY_INITIAL,
+    WATSONX_CONCURRENCY_MIN,
+    WATSONX_CONCURRENCY_MAX,
+    ORCHESTRATE_CONCURRENCY_INITIAL,
+    ORCHESTRATE_CONCURRENCY_MIN,
+    ORCHESTRATE_CONCURRENCY_MAX,
+    UPSTREAM_BACKOFF_RATIO,
+    UPSTREAM_LATENCY_TOLERANCE,
+    UPSTREAM_THROTTLE_STATUSES,
+    UPSTREAM_MAX_ATTEMPTS,
+    UPSTREAM_RETRY_DELAY_SECONDS,
+    UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+    UPSTREAM_SESSION_MEMORY,
+)
+from src.metrics import (
+    UPSTREAM_LIMIT,
+    UPSTREAM_INFLIGHT,
+    UPSTREAM_QUEUED,
+    UPSTREAM_QUEUE_WAIT_SECONDS,
+    UPSTREAM_CALLS_TOTAL,
+    UPSTREAM_LIMIT_DECREASES_TOTAL,
+)
+from src.utils import cancellation
+from src.logger import logger
+
+
+WATSONX = "watsonx"
+ORCHESTRATE = "orchestrate"
+
+# Queue priorities, served lowest first
+IN_PROGRESS = 0
+NEW = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ("in_progress", "new", "background")
+
+# Weight of each call in the drift of the no-load latency estimate
+_BASELINE_DRIFT = 0.01
+# Latency differences below this are noise rather than queueing at the upstream
+_MIN_BASELINE_SECONDS = 0.05
+# The watsonx SDK reports a refused stream only in the message:
+# "Request failed with: {body} (429)" or "Request failed with: ({body} 429)"
+_SDK_FAILURE = re.compile(r"^Request failed with: .*?(\d{3})\)\s*$", re.S)
+
+
+class UpstreamBusy(Exception):
+    """Raised when a call waited ``UPSTREAM_QUEUE_TIMEOUT_SECONDS`` without getting a slot."""
+
+
+def status_of(value) -> Optional[int]:
+    """HTTP status of a response, or the one a failed call reported."""
+    status = getattr(value, "status_code", None)
+    if status is None:
+        status = getattr(getattr(value, "response", None), "status_code", None)
+    if status is None and isinstance(value, Exception):
+        match = _SDK_FAILURE.match(str(getattr(value, "error_msg", "")))
+        if match:
+            status = int(match.group(1))
+    return status
+
+
+def is_timeout(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, requests.Timeout)):
+        return True
+    # The watsonx SDK calls through httpx; if it was never imported, no httpx call timed out
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(exc, httpx.TimeoutException)
+
+
+def is_throttled(exc: BaseException) -> bool:
+    return status_of(exc) in UPSTREAM_THROTTLE_STATUSES
+
+
+def is_overloaded(exc: BaseException) -> bool:
+    """Shed here or throttled there: the call may well succeed if asked again shortly."""
+    return isinstance(exc, UpstreamBusy) or is_throttled(exc)
+
+
+def should_retry(exc: BaseException, attempt: int) -> bool:
+    """Throttled calls are retried; timeouts are not, the caller already waited long enough."""
+    return attempt < UPSTREAM_MAX_ATTEMPTS and is_throttled(exc)
+
+
+def attempts():
+    """Attempt numbers from 1, sleeping an exponential, jittered delay before each retry."""
+    for attempt in range(1, UPSTREAM_MAX_ATTEMPTS + 1):
+        if attempt > 1:
+            delay = UPSTREAM_RETRY_DELAY_SECONDS * 2 ** (attempt - 2)
+            cancellation.sleep(delay * (1 + 0.25 * random.random()))
+        yield attempt
+
+
+class Permit:
+    """One call's slot: when it started and how it went."""
+
+    __slots__ = ("priority", "started", "latency", "throttled", "failed")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.started = time.perf_counter()
+        # Seconds until the upstream answered; only these feed the latency signal
+        self.latency: Optional[float] = None
+        self.throttled = False
+        self.failed = False
+
+    def mark(self):
+        """Record the latency now, e.g. at the first streamed chunk."""
+        if self.latency is None:
+            self.latency = time.perf_counter() - self.started
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit on one upstream, with a priority queue of waiting calls."""
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int,
+                 backoff: float = UPSTREAM_BACKOFF_RATIO, tolerance: float = UPSTREAM_LATENCY_TOLERANCE,
+                 queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self._lanes = [deque() for _ in PRIORITY_NAMES]
+        self._cond = threading.Condition()
+        # Estimate of the latency without load: the lowest seen, drifting up slowly
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+        UPSTREAM_LIMIT.labels(name).set_function(lambda: self.limit)
+        UPSTREAM_INFLIGHT.labels(name).set_function(lambda: self.inflight)
+        for level, lane in enumerate(self._lanes):
+            UPSTREAM_QUEUED.labels(name, PRIORITY_NAMES[level]).set_function(lambda lane=lane: len(lane))
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def _head(self):
+        for lane in self._lanes:
+            if lane:
+                return lane[0]
+        return None
+
+    def acquire(self, priority: Optional[int] = None, timeout: Optional[float] = None) -> Permit:
+        """
+        Wait for a slot; raises ``UpstreamBusy`` after ``timeout`` seconds, or
+        ``TurnCancelled`` if the current turn is cancelled meanwhile.
+        """
+        if priority is None:
+            priority = current_priority()
+        token = cancellation.current_token()
+        started = time.perf_counter()
+        deadline = started + (self.queue_timeout if timeout is None else timeout)
+        with self._cond:
+            if self.inflight >= self._capacity() or self._head() is not None:
+                ticket = object()
+                lane = self._lanes[priority]
+                lane.append(ticket)
+                try:
+                    while self._head() is not ticket or self.inflight >= self._capacity():
+                        if token is not None:
+                            token.raise_if_cancelled()
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            UPSTREAM_CALLS_TOTAL.labels(self.name, "shed").inc()
+                            raise UpstreamBusy(f"No {self.name} slot free after {time.perf_counter() - started:.1f}s")
+                        # Short waits while a turn is running, so a cancelled one leaves the queue
+                        self._cond.wait(min(remaining, 0.25) if token is not None else remaining)
+                finally:
+                    lane.remove(ticket)
+                    # The next caller in line may fit too
+                    self._cond.notify_all()
+            self.inflight += 1
+        UPSTREAM_QUEUE_WAIT_SECONDS.labels(self.name, PRIORITY_NAMES[priority]).observe(
+            time.perf_counter() - started)
+        return Permit(priority)
+
+    def release(self, permit: Permit):
+        """Free the slot and adjust the limit from how the call went."""
+        with self._cond:
+            saturated = self.inflight >= self._capacity() or self._head() is not None
+            self.inflight -= 1
+            if permit.throttled:
+                UPSTREAM_CALLS_TOTAL.labels(self.name, "throttled").inc()
+                self._decrease(permit, "throttled")
+            elif permit.failed:
+                UPSTREAM_CALLS_TOTAL.labels(self.name, "error").inc()
+            else:
+                UPSTREAM_CALLS_TOTAL.labels(self.name, "ok").inc()
+                if permit.latency is not None and self._is_spike(permit.latency):
+                    self._decrease(permit, "latency")
+                elif saturated:
+                    # +1 per window: each of ``limit`` calls adds 1/limit
+                    self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _is_spike(self, latency: float) -> bool:
+        baseline = self._baseline
+        if baseline is None or latency < baseline:
+            self._baseline = latency
+            return False
+        # Drifts up so a lasting change in the upstream stops reading as overload
+        self._baseline = baseline + (latency - baseline) * _BASELINE_DRIFT
+        return latency > max(baseline, _MIN_BASELINE_SECONDS) * self.tolerance
+
+    def _decrease(self, permit: Permit, cause: str):
+        if permit.started < self._last_decrease:
+            # Sent before the last cut, at the old limit; that overload is already answered
+            return
+        previous = self.limit
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self._last_decrease = time.perf_counter()
+        if self.limit == previous:
+            return
+        UPSTREAM_LIMIT_DECREASES_TOTAL.labels(self.name, cause).inc()
+        logger.warning(f"{self.name} concurrency limit {previous:.1f} -> {self.limit:.1f} ({cause}, "
+                       f"{self.inflight} in flight, {self.queued} queued)")
+
+    @contextmanager
+    def slot(self, measure: bool = True, priority: Optional[int] = None):
+        """
+        Hold a slot for the block. Without ``measure`` only a ``Permit.mark``
+        in the block records a latency, for calls whose duration depends on
+        the answer (a whole completion rather than its first token).
+        """
+        permit = self.acquire(priority)
+        try:
+            yield permit
+        except BaseException as e:
+            if is_throttled(e) or is_timeout(e):
+                permit.throttled = True
+            elif not isinstance(e, GeneratorExit):
+                # A closed stream (GeneratorExit) ended early but did not fail
+                permit.failed = True
+            raise
+        finally:
+            if measure:
+                permit.mark()
+            self.release(permit)
+
+
+_LIMITS = {
+    WATSONX: (WATSONX_CONCURRENCY_INITIAL, WATSONX_CONCURRENCY_MIN, WATSONX_CONCURRENCY_MAX),
+    ORCHESTRATE: (ORCHESTRATE_CONCURRENCY_INITIAL, ORCHESTRATE_CONCURRENCY_MIN, ORCHESTRATE_CONCURRENCY_MAX),
+}
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = AdaptiveLimiter(name, *_LIMITS[name])
+    return limiter
+
+
+@contextmanager
+def slot(name: str, measure: bool = True, attempt: int = 1):
+    """
+    ``AdaptiveLimiter.slot`` of the named upstream; a no-op when limiting
+    is off. Retries queue with the in-progress sessions, as they already
+    waited once.
+    """
+    if not UPSTREAM_LIMITER_ENABLED:
+        yield Permit(current_priority())
+        return
+    with get_limiter(name).slot(measure, IN_PROGRESS if attempt > 1 else None) as permit:
+        yield permit
+
+
+def call(name: str, func: Callable, *args, measure: bool = True, **kwargs):
+    """
+    ``func(*args, **kwargs)`` in a slot of the named upstream, retried in a
+    new slot while throttled. A throttling response (rather than exception)
+    is returned as is after the last attempt.
+    """
+    for attempt in attempts():
+        with slot(name, measure, attempt) as permit:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not should_retry(e, attempt):
+                    raise
+                permit.throttled = True
+                continue
+            if status_of(result) in UPSTREAM_THROTTLE_STATUSES:
+                permit.throttled = True
+                if attempt < UPSTREAM_MAX_ATTEMPTS:
+                    continue
+            return result
+
+
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=NEW)
+# Sessions that had a turn, most recent last
+_sessions: "OrderedDict[str, None]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int):
+    reset = _priority.set(level)
+    try:
+        yield level
+    finally:
+        _priority.reset(reset)
+
+
+@contextmanager
+def session_priority(session_id: str):
+    """Run a turn of ``session_id`` ahead of new sessions if it is not the session's first."""
+    with _sessions_lock:
+        known = session_id in _sessions
+    try:
+        with priority(IN_PROGRESS if known else NEW):
+            yield
+    finally:
+        with _sessions_lock:
+            _sessions[session_id] = None
+            _sessions.move_to_end(session_id)
+            while len(_sessions) > UPSTREAM_SESSION_MEMORY:
+                _sessions.popitem(last=False)
+
+
+def forget_session(session_id: str):
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
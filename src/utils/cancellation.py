@@ -0,0 +1,216 @@
+"""
+Cancelling an agent turn that has been superseded (barge-in).
+
+A turn runs in an executor thread, which asyncio cannot interrupt, so the
+turn carries a ``CancelToken`` and checks it at the points where it can
+stop cheaply:
+
+- before the agent starts (the turn was still queued);
+- on every LLM token and before every LLM or tool run, through
+  ``CancellationCallbackHandler``, which closes the LLM stream;
+- between Orchestrate polls, through ``sleep``.
+
+A cancelled turn never reaches the chat history. The history write goes
+through ``CancelToken.commit``, which holds the same lock as ``cancel``.
+Either the whole exchange (question and answer) is stored and the turn
+counts as answered, or nothing is stored and ``cancel`` succeeded.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+
+from src.metrics import LLM_SECONDS_SAVED_TOTAL, LLM_SECONDS_WASTED_TOTAL, TURNS_CANCELLED_TOTAL
+from src.logger import logger
+
+
+class TurnCancelled(Exception):
+    """Raised inside a turn whose token was cancelled."""
+
+
+# Stages a turn goes through, as recorded on its token
+QUEUED = "queued"
+LLM = "llm"
+TOOL = "tool"
+FINISHING = "finishing"
+
+
+class CancelToken:
+    """Cancellation state of one turn, shared by the event loop and the worker thread."""
+
+    def __init__(self, reason: str = "superseded"):
+        self.reason = reason
+        self.stage = QUEUED
+        # Stage the turn was in when cancelled
+        self.cancelled_in: Optional[str] = None
+        self.committed = False
+        # LLM seconds of finished runs, and the start of the one in flight
+        self.llm_seconds = 0.0
+        self.llm_started: Optional[float] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: Optional[str] = None) -> bool:
+        """Cancel unless the turn already stored its answer; True if cancelled."""
+        with self._lock:
+            if self.committed:
+                return False
+            if reason:
+                self.reason = reason
+            if not self._event.is_set():
+                self.cancelled_in = self.stage
+            self._event.set()
+            return True
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TurnCancelled(self.reason)
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; True if cancelled meanwhile."""
+        return self._event.wait(seconds)
+
+    @contextmanager
+    def commit(self):
+        """Hold off ``cancel`` while the turn stores its answer; raises if already cancelled."""
+        with self._lock:
+            self.raise_if_cancelled()
+            yield
+            self.committed = True
+
+    def llm_seconds_so_far(self) -> float:
+        if self.llm_started is None:
+            return self.llm_seconds
+        return self.llm_seconds + time.perf_counter() - self.llm_started
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+@contextmanager
+def bind(token: Optional[CancelToken]):
+    """Make ``token`` the current turn's token for code that cannot take it as an argument."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def sleep(seconds: float):
+    """``time.sleep`` that ends the turn early if it is cancelled."""
+    token = _current.get()
+    if token is None:
+        time.sleep(seconds)
+    elif token.wait(seconds):
+        raise TurnCancelled(token.reason)
+
+
+class CancellationCallbackHandler(BaseCallbackHandler):
+    """Stops a cancelled turn at the next LLM token or run, and times its LLM runs on the token."""
+
+    # Exceptions from this handler must abort the run, not be logged and ignored
+    raise_error = True
+
+    def __init__(self, token: CancelToken):
+        self.token = token
+        self._runs = {}
+
+    def _llm_start(self, run_id: UUID):
+        self.token.raise_if_cancelled()
+        self.token.stage = LLM
+        self._runs[run_id] = time.perf_counter()
+        self.token.llm_started = self._runs[run_id]
+
+    def _llm_end(self, run_id: UUID):
+        started = self._runs.pop(run_id, None)
+        if started is not None:
+            self.token.llm_seconds += time.perf_counter() - started
+        self.token.llm_started = None
+        self.token.stage = FINISHING
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._llm_start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._llm_start(run_id)
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.token.raise_if_cancelled()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._llm_end(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._llm_end(run_id)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.token.raise_if_cancelled()
+        self.token.stage = TOOL
+
+    def on_tool_end(self, output, **kwargs):
+        self.token.stage = FINISHING
+
+
+class CancellableChatMessageHistory(BaseChatMessageHistory):
+    """Drops the turn's history write if its token was cancelled first."""
+
+    def __init__(self, history: BaseChatMessageHistory, token: CancelToken):
+        self.history = history
+        self.token = token
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.history.messages
+
+    def add_messages(self, messages: List[BaseMessage]) -> None:
+        try:
+            with self.token.commit():
+                self.history.add_messages(messages)
+        except TurnCancelled:
+            logger.info(f"Discarded {len(messages)} messages of a cancelled turn")
+
+    def clear(self) -> None:
+        self.history.clear()
+
+
+# Moving average of the LLM seconds a completed turn takes; the estimate
+# of what a cancelled turn would still have spent
+_typical_llm_seconds: Optional[float] = None
+_typical_lock = threading.Lock()
+
+
+def record_completed(token: CancelToken):
+    global _typical_llm_seconds
+    with _typical_lock:
+        if _typical_llm_seconds is None:
+            _typical_llm_seconds = token.llm_seconds
+        else:
+            _typical_llm_seconds += (token.llm_seconds - _typical_llm_seconds) * 0.1
+
+
+def record_cancelled(token: CancelToken):
+    """Count a cancelled turn: LLM seconds it spent, and those it no longer will."""
+    stage = token.cancelled_in or token.stage
+    spent = token.llm_seconds_so_far()
+    saved = max(0.0, (_typical_llm_seconds or 0.0) - spent)
+    TURNS_CANCELLED_TOTAL.labels(stage).inc()
+    LLM_SECONDS_WASTED_TOTAL.inc(spent)
+    LLM_SECONDS_SAVED_TOTAL.inc(saved)
+    logger.info(f"Turn cancelled ({token.reason}) while {stage}: {spent:.2f}s of LLM time spent, "
+                f"~{saved:.2f}s saved")
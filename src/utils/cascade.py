@@ -0,0 +1,283 @@
+"""
+Model tiers per call site, with a small-first cascade.
+
+A ``CascadeChatModel`` stands in for the chat model at one call site
+(agent, small talk, summaries; see ``get_chat_model``). With one tier it
+just runs that model. With several it asks the smallest first and only
+moves on to the next when the answer fails a check:
+
+- parse failure: a tool call with unparseable arguments or a tool that
+  was not offered, or text that is not JSON where the site expects JSON;
+- complex tool plan: more tool calls in one step than the small tier is
+  trusted with;
+- low confidence: a mean token probability below the threshold, when
+  the tier returns log probabilities;
+- no answer at all, or an error from the tier.
+
+A tier that is throttled or could not get a watsonx slot is not
+escalated from: the next tier shares the same quota, so the error is
+raised instead.
+
+Earlier tiers are always called without streaming, since their answer
+is checked before anything reaches the caller; an accepted answer is
+then handed on as a single chunk. The last tier streams as usual.
+
+Every tier call is timed and costed from its token usage, per call
+site and tier, in the Prometheus metrics and in ``tier_report``.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.utils.json import parse_json_markdown
+
+from src import tracing, upstream
+from src.constants.llm import MODEL_TIERS
+from src.metrics import (
+    LLM_TIER_SECONDS,
+    LLM_TIER_CALLS_TOTAL,
+    LLM_TIER_TOKENS_TOTAL,
+    LLM_COST_USD_TOTAL,
+    LLM_ESCALATIONS_TOTAL,
+)
+from src.utils import cancellation
+from src.utils.cancellation import TurnCancelled
+from src.logger import logger
+
+
+# Call site and tier -> running totals, for tier_report
+_FIELDS = ("calls", "answered", "escalated", "errors", "seconds", "prompt_tokens", "completion_tokens", "usd")
+_totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: dict.fromkeys(_FIELDS, 0.0))
+_totals_lock = threading.Lock()
+
+
+def _confidence(generation_info: Optional[dict]) -> Optional[float]:
+    """Geometric mean of the token probabilities, if the tier returned them."""
+    logprobs = (generation_info or {}).get("logprobs") or {}
+    values = [token["logprob"] for token in logprobs.get("content") or []
+              if isinstance(token, dict) and token.get("logprob") is not None]
+    if not values:
+        return None
+    return math.exp(sum(values) / len(values))
+
+
+def _add_usage(total: Optional[dict], usage: Optional[dict]) -> Optional[dict]:
+    if not usage:
+        return total
+    total = total or {"input_tokens": 0, "output_tokens": 0}
+    return {"input_tokens": total["input_tokens"] + (usage.get("input_tokens") or 0),
+            "output_tokens": total["output_tokens"] + (usage.get("output_tokens") or 0)}
+
+
+def _as_chunk(result: ChatResult) -> ChatGenerationChunk:
+    """A whole checked answer as one streamed chunk."""
+    generation = result.generations[0]
+    message = generation.message
+    tool_call_chunks = [
+        {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": index}
+        for index, call in enumerate(getattr(message, "tool_calls", None) or [])
+    ]
+    chunk = AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        usage_metadata=getattr(message, "usage_metadata", None),
+        tool_call_chunks=tool_call_chunks,
+        id=message.id,
+    )
+    return ChatGenerationChunk(message=chunk, generation_info=generation.generation_info)
+
+
+class CascadeChatModel(BaseChatModel):
+    """The chat model of one call site: its tiers, smallest first, and the checks between them."""
+
+    call_site: str
+    # ModelTier per tier, and the chat model serving it
+    tiers: List[Any]
+    models: List[Any]
+    min_confidence: float = 0.0
+    max_tool_calls: int = 1
+    expects_json: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "watsonx-cascade"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"call_site": self.call_site, "tiers": [tier.model_id for tier in self.tiers]}
+
+    def bind_tools(self, tools, **kwargs):
+        # The last tier formats the tools; every tier gets the same request
+        bound = self.models[-1].bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def check(self, result: ChatResult, offered_tools: Optional[list]) -> Optional[str]:
+        """Why an answer should go to the next tier, or None to use it."""
+        generation = result.generations[0]
+        message = generation.message
+        if getattr(message, "invalid_tool_calls", None):
+            return "parse_failure"
+        tool_calls = getattr(message, "tool_calls", None) or []
+        if tool_calls:
+            names = {tool.get("function", {}).get("name") for tool in offered_tools or []}
+            if any(call["name"] not in names for call in tool_calls):
+                return "parse_failure"
+            if len(tool_calls) > self.max_tool_calls:
+                return "complex_plan"
+        else:
+            text = message.content if isinstance(message.content, str) else str(message.content)
+            if not text.strip():
+                return "empty"
+            if self.expects_json:
+                try:
+                    # Strictly: the parsers downstream would patch up a truncated answer
+                    parse_json_markdown(text, parser=json.loads)
+                except Exception:
+                    return "parse_failure"
+        confidence = _confidence(generation.generation_info)
+        if self.min_confidence and confidence is not None and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    def _record(self, tier, started: float, usage: Optional[dict], outcome: str):
+        seconds = time.time() - started
+        prompt = (usage or {}).get("input_tokens") or 0
+        completion = (usage or {}).get("output_tokens") or 0
+        usd = (prompt + completion) * tier.usd_per_million_tokens / 1e6
+        LLM_TIER_SECONDS.labels(self.call_site, tier.name).observe(seconds)
+        LLM_TIER_CALLS_TOTAL.labels(self.call_site, tier.name, outcome).inc()
+        LLM_TIER_TOKENS_TOTAL.labels(self.call_site, tier.name, "prompt").inc(prompt)
+        LLM_TIER_TOKENS_TOTAL.labels(self.call_site, tier.name, "completion").inc(completion)
+        LLM_COST_USD_TOTAL.labels(self.call_site, tier.name).inc(usd)
+        tracing.record_span("llm.tier", started, call_site=self.call_site, tier=tier.name,
+                            model=tier.model_id, outcome=outcome)
+        with _totals_lock:
+            totals = _totals[(self.call_site, tier.name)]
+            totals["calls"] += 1
+            totals[outcome if outcome in ("answered", "escalated") else "errors"] += 1
+            totals["seconds"] += seconds
+            totals["prompt_tokens"] += prompt
+            totals["completion_tokens"] += completion
+            totals["usd"] += usd
+
+    def _try_tier(self, index: int, messages: List[BaseMessage], stop: Optional[List[str]],
+                  **kwargs: Any) -> Optional[ChatResult]:
+        """Run a tier that can still escalate; its result if the answer passes the checks."""
+        tier, model = self.tiers[index], self.models[index]
+        started = time.time()
+        try:
+            result = model._generate(messages, stop=stop, **kwargs)
+        except TurnCancelled:
+            raise
+        except Exception as e:
+            self._record(tier, started, None, "error")
+            if upstream.is_overloaded(e):
+                # The larger tier would only add load to the same overloaded quota
+                raise
+            reason = "error"
+            logger.warning(f"{tier.name} tier failed for {self.call_site}, escalating: {e}")
+        else:
+            reason = self.check(result, kwargs.get("tools"))
+            usage = getattr(result.generations[0].message, "usage_metadata", None)
+            self._record(tier, started, usage, "escalated" if reason else "answered")
+            if reason is None:
+                return result
+        LLM_ESCALATIONS_TOTAL.labels(self.call_site, reason).inc()
+        token = cancellation.current_token()
+        if token is not None:
+            # Superseded while the small tier ran; the large one is not worth starting
+            token.raise_if_cancelled()
+        return None
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        for index in range(len(self.models) - 1):
+            result = self._try_tier(index, messages, stop, **kwargs)
+            if result is not None:
+                return result
+        tier, model = self.tiers[-1], self.models[-1]
+        started = time.time()
+        try:
+            result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except TurnCancelled:
+            raise
+        except Exception:
+            self._record(tier, started, None, "error")
+            raise
+        self._record(tier, started, getattr(result.generations[0].message, "usage_metadata", None), "answered")
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for index in range(len(self.models) - 1):
+            result = self._try_tier(index, messages, stop, **kwargs)
+            if result is not None:
+                chunk = _as_chunk(result)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                return
+        tier, model = self.tiers[-1], self.models[-1]
+        started = time.time()
+        usage, outcome = None, "error"
+        try:
+            for chunk in model._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = _add_usage(usage, getattr(chunk.message, "usage_metadata", None))
+                yield chunk
+            outcome = "answered"
+        except (TurnCancelled, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            self._record(tier, started, usage, outcome)
+
+
+def tier_report() -> Dict[str, dict]:
+    """
+    Per call site, since this worker started: each tier's calls, outcomes,
+    mean latency, tokens and cost, and the share of calls the first tier
+    passed on.
+    """
+    with _totals_lock:
+        totals = {key: dict(values) for key, values in _totals.items()}
+    report: Dict[str, dict] = {}
+    for (site, tier), values in sorted(totals.items()):
+        calls = values["calls"]
+        entry = report.setdefault(site, {"tiers": {}, "usd": 0.0})
+        entry["tiers"][tier] = {
+            "calls": int(calls),
+            "answered": int(values["answered"]),
+            "escalated": int(values["escalated"]),
+            "errors": int(values["errors"]),
+            "mean_seconds": round(values["seconds"] / calls, 4) if calls else None,
+            "prompt_tokens": int(values["prompt_tokens"]),
+            "completion_tokens": int(values["completion_tokens"]),
+            "usd": round(values["usd"], 6),
+        }
+        entry["usd"] = round(entry["usd"] + values["usd"], 6)
+    for entry in report.values():
+        first = next((entry["tiers"][tier] for tier in MODEL_TIERS if tier in entry["tiers"]), None)
+        if first is not None and len(entry["tiers"]) > 1 and first["calls"]:
+            entry["escalation_rate"] = round(1 - first["answered"] / first["calls"], 4)
+        elif first is not None:
+            entry["escalation_rate"] = 0.0
+    return report
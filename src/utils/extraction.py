@@ -0,0 +1,124 @@
+"""
+Deterministic extraction of the caller's name and policy number.
+
+Runs on every human turn with precompiled patterns (a few microseconds
+per turn) and stores what it finds in the session metadata, so the
+summary prompt no longer has to recover these fields from the whole
+transcript.
+"""
+
+import re
+from typing import Callable, Dict, Optional
+
+from src.dbio.policyholders import normalize_name, normalize_policy_number
+from src.storage import StateBackend, get_state_backend
+from src.logger import logger
+
+# Words that end a name ("my name is Raj Verma and my policy ...") or show
+# the phrase was no introduction at all ("call me back on ...", "I am not sure")
+_NAME_STOP = (
+    r"(?!(?i:and|or|but|my|policy|with|here|there|from|calling|i|im|the|a|an|number"
+    r"|back|on|at|in|to|for|about|later|tomorrow|today|tonight|now|again|not|sure|just|so"
+    r"|very|really|still|also|sorry|afraid|fine|ok|okay|good|well|glad|happy|unable|going"
+    r"|trying|looking|having|asking|waiting|worried|confused|interested|done|ready"
+    r"|please|asap|if|when|whenever|after|before|once|soon|as|anytime|around|between)\b)"
+)
+_NAME_WORD = _NAME_STOP + r"[A-Za-z][A-Za-z'\-]*"
+_CAP_WORD = _NAME_STOP + r"[A-Z][A-Za-z'\-]*"
+
+# "name is ..." is explicit, so any casing is accepted
+EXPLICIT_NAME_PATTERN = re.compile(
+    r"\b(?:my\s+(?:full\s+)?name\s+is|my\s+name's|name\s*(?:is|:|-))\s+"
+    rf"({_NAME_WORD}(?:\s+{_NAME_WORD}){{0,3}})",
+    re.IGNORECASE,
+)
+# "I am ...", "this is ..." and "call me ..." ("call me asap") are ambiguous,
+# so only capitalised words count
+INTRO_NAME_PATTERN = re.compile(
+    r"\b(?:[Ii]\s+am|[Ii]'m|[Tt]his\s+is|[Cc]all\s+me)\s+"
+    rf"({_CAP_WORD}(?:\s+{_CAP_WORD}){{0,3}})"
+)
+# "policy number is P987654321", "policy no: ABC 123 456", "policy # HF62415739";
+# a letter prefix is never a word of the sentence ("my policy with 12345 rupees")
+_POLICY_PREFIX_STOP = r"(?!(?:with|for|of|from|at|in|on|to|by|and|or|was|has|had|is|the|a|an|my|no|not)\b)"
+EXPLICIT_POLICY_PATTERN = re.compile(
+    r"\bpolicy(?:\s*(?:number|no\.?|num|#|id))?\s*(?:is|:|=|-)?\s*" + _POLICY_PREFIX_STOP +
+    r"([A-Za-z]{0,4}[\s-]?\d[\d\s-]{3,14}\d|[A-Za-z]{0,4}\d{4,16})\b",
+    re.IGNORECASE,
+)
+
+
+def _name(words: str) -> str:
+    return " ".join(w.capitalize() if w.islower() else w for w in words.split())
+
+
+class ConversationFieldExtractor:
+    """
+    Extract ``name`` and ``policy_number`` from a single utterance.
+
+    ``lookup`` optionally maps a normalized policy number to the registered
+    name (see ``src.dbio.policyholders.lookup_policyholder``); when given,
+    matches are marked ``verified`` and use the registered spelling.
+
+    Only explicit phrasings ("my name is", "policy number") or verified
+    values are stored as fields. A name from "I am ..." or "call me ..." is
+    kept as ``name_candidate`` until a policy lookup confirms it. Bare numbers
+    are never taken as policy numbers; phone numbers look the same.
+    """
+
+    def __init__(self, lookup: Optional[Callable[[str], Optional[str]]] = None):
+        self.lookup = lookup
+
+    def extract(self, text: str) -> Dict[str, str]:
+        fields = {}
+        if not text:
+            return fields
+
+        match = EXPLICIT_NAME_PATTERN.search(text)
+        if match:
+            fields["name"] = _name(match.group(1))
+        else:
+            match = INTRO_NAME_PATTERN.search(text)
+            if match:
+                fields["name_candidate"] = _name(match.group(1))
+
+        match = EXPLICIT_POLICY_PATTERN.search(text)
+        if match:
+            fields["policy_number"] = normalize_policy_number(match.group(1).replace("-", ""))
+        return fields
+
+    def validate(self, fields: Dict[str, str], known: Dict[str, str]) -> Dict[str, str]:
+        """Check the combined fields against policyholder records."""
+        if not self.lookup:
+            return fields
+        policy_number = fields.get("policy_number") or known.get("policy_number")
+        name = (fields.get("name") or fields.get("name_candidate")
+                or known.get("name") or known.get("name_candidate"))
+        if not policy_number:
+            return fields
+        try:
+            registered = self.lookup(policy_number)
+        except Exception as e:
+            logger.error(f"Policyholder lookup failed during extraction: {e}")
+            return fields
+        verified = bool(registered and name and normalize_name(registered) == normalize_name(name))
+        fields = dict(fields, verified=verified)
+        if verified:
+            fields["name"] = registered
+            fields.pop("name_candidate", None)
+        return fields
+
+    def process_turn(self, session_id: str, text: str,
+                     backend: Optional[StateBackend] = None) -> Dict[str, str]:
+        """Extract from a human turn and merge new values into the session metadata."""
+        fields = self.extract(text)
+        if not fields:
+            return {}
+        backend = backend or get_state_backend()
+        known = backend.get_session_metadata(session_id)
+        fields = self.validate(fields, known)
+        changed = {k: v for k, v in fields.items() if known.get(k) != v}
+        if changed:
+            backend.update_session_metadata(session_id, changed)
+            logger.info(f"Extracted {sorted(changed)} for session {session_id}")
+        return fields
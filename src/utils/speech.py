@@ -0,0 +1,187 @@
+"""
+Speakable sentence chunks for voice playback.
+
+The agent's final answer streams from the LLM token by token. A
+``SpeechStream`` attached as a callback cuts that stream into sentences
+as soon as each one is complete and hands them to the caller with a
+per-turn sequence number, so the browser can start speaking the first
+sentence while the rest is still being generated.
+
+Cutting is deterministic: the chunks produced while streaming are the
+same as ``split_speech`` over the finished text, which is what lets
+``SpeechStream.finish`` tell whether the formatted reply still matches
+what was already sent.
+"""
+
+import re
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.constants import SPEECH_MAX_CHUNK_CHARS
+from src.metrics import SPEECH_CHUNKS_TOTAL, SPEECH_FIRST_CHUNK_SECONDS
+
+_WHITESPACE = re.compile(r"\s+")
+_MARKDOWN = re.compile(r"\*\*|__|`+|^#+\s*")
+# List bullets, once newlines are collapsed: "Documents: - ID card"
+_BULLET = re.compile(r"(^|[:.!?] )[-*•] +")
+_SPEAKABLE = re.compile(r"[A-Za-z0-9]")
+
+_TERMINATORS = ".!?"
+_CLOSERS = "\"')]}’”*_"
+
+# A period after these words does not end a sentence
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "st", "jr", "sr", "no", "vs", "etc", "approx",
+    "e.g", "i.e", "inc", "ltd", "co", "dept", "a.m", "p.m",
+})
+
+
+def speakable(text: str) -> str:
+    """Strip markdown and collapse whitespace; empty if nothing is left to say."""
+    text = _MARKDOWN.sub("", _WHITESPACE.sub(" ", text).strip())
+    text = _BULLET.sub(r"\1", text)
+    return text.strip() if _SPEAKABLE.search(text) else ""
+
+
+class SentenceChunker:
+    """
+    Incremental sentence splitter.
+
+    A sentence ends at ``.``, ``!`` or ``?`` (plus closing quotes or
+    brackets) followed by a space and a character that is not lower case,
+    unless the period belongs to an abbreviation, an initial or a list
+    number. The cut is only made once that next character has arrived, and
+    a sentence longer than ``max_chars`` is cut at the last comma or space.
+    """
+
+    def __init__(self, max_chars: int = SPEECH_MAX_CHUNK_CHARS):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer = _WHITESPACE.sub(" ", self._buffer + text).lstrip()
+        chunks = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return chunks
+            chunk = speakable(self._buffer[:cut])
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self) -> List[str]:
+        chunk = speakable(self._buffer)
+        self._buffer = ""
+        return [chunk] if chunk else []
+
+    def _next_cut(self) -> Optional[int]:
+        buf = self._buffer
+        for i in range(min(len(buf), self.max_chars)):
+            if buf[i] not in _TERMINATORS:
+                continue
+            end = i + 1
+            while end < len(buf) and buf[end] in _TERMINATORS + _CLOSERS:
+                end += 1
+            if end + 1 >= len(buf):
+                return None  # wait for the character after the space
+            if buf[end] == " " and self._ends_sentence(buf, i, buf[end + 1]):
+                return end
+        if len(buf) <= self.max_chars:
+            return None
+        soft = max(buf.rfind(", ", 0, self.max_chars), buf.rfind("; ", 0, self.max_chars))
+        if soft > 0:
+            return soft + 1
+        space = buf.rfind(" ", 0, self.max_chars)
+        return space if space > 0 else self.max_chars
+
+    @staticmethod
+    def _ends_sentence(buf: str, index: int, next_char: str) -> bool:
+        if next_char.islower():
+            return False
+        if buf[index] != ".":
+            return True
+        word = buf[:index].rsplit(" ", 1)[-1].lstrip("\"'([{“‘").lower()
+        if word in ABBREVIATIONS:
+            return False
+        if len(word) == 1 and word.isalpha():
+            return False  # initial, "J. Smith"
+        if word.isdigit() and len(word) <= 2:
+            return False  # list number, "1. Bring your ID"
+        return True
+
+
+def split_speech(text: str, max_chars: int = SPEECH_MAX_CHUNK_CHARS) -> List[str]:
+    """Sentence chunks of a finished text, identical to streaming it through a chunker."""
+    chunker = SentenceChunker(max_chars)
+    return chunker.feed(text) + chunker.flush()
+
+
+class SpeechStream(BaseCallbackHandler):
+    """
+    Emits ``speech_chunk`` payloads for one turn as the agent's answer streams.
+
+    ``emit`` is called from the worker thread running the agent, so it must
+    be thread safe (e.g. ``loop.call_soon_threadsafe`` onto a queue). Text
+    from an LLM run that turns into a tool call has usually not been spoken
+    yet; any that was is left as is. Call ``finish`` with the final reply
+    to send whatever was not streamed.
+    """
+
+    def __init__(self, emit: Callable[[Dict], None], turn_id: Optional[str] = None):
+        self.emit = emit
+        self.turn_id = turn_id or uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._started = time.perf_counter()
+        self._run_id: Optional[UUID] = None
+        self._chunker: Optional[SentenceChunker] = None
+        # Chunks sent from the latest LLM run, i.e. the candidate final answer
+        self._answer: List[str] = []
+
+    def _send(self, text: str, source: str, replace: bool = False):
+        if self.seq == 0:
+            SPEECH_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - self._started)
+        SPEECH_CHUNKS_TOTAL.labels(source).inc()
+        self.emit({
+            "type": "speech_chunk",
+            "role": "bot",
+            "turn_id": self.turn_id,
+            "seq": self.seq,
+            "text": text,
+            "replace": replace,
+        })
+        self.seq += 1
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._run_id = run_id
+        self._chunker = SentenceChunker()
+        self._answer = []
+
+    def on_llm_new_token(self, token: str, *, chunk=None, run_id: UUID, **kwargs):
+        if run_id != self._run_id or self._chunker is None:
+            return
+        message = getattr(chunk, "message", None)
+        if getattr(message, "tool_call_chunks", None):
+            # This run is a tool call, not the answer
+            self._chunker = None
+            return
+        for sentence in self._chunker.feed(token):
+            self._answer.append(sentence)
+            self._send(sentence, "stream")
+
+    def finish(self, message: str) -> int:
+        """Send the rest of ``message``; returns the number of chunks in the turn."""
+        final = split_speech(message)
+        sent = len(self._answer)
+        if final[:sent] == self._answer:
+            for text in final[sent:]:
+                self._send(text, "final")
+        else:
+            # The reply was rewritten after streaming (error, fallback): start over
+            for index, text in enumerate(final):
+                self._send(text, "final", replace=index == 0)
+        return self.seq
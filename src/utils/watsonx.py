@@ -0,0 +1,60 @@
+"""
+ChatWatsonx that makes its calls through the watsonx concurrency limiter.
+
+Heavy to import (the watsonx SDK); only ``get_model`` in src/constants/llm.py imports it.
+"""
+
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_ibm.chat_models import ChatWatsonx
+
+from src import upstream
+
+
+class LimitedChatWatsonx(ChatWatsonx):
+    """
+    Each completion holds a watsonx slot; a stream holds it until the last
+    chunk. Throttled calls are retried in a new slot, a stream only while
+    nothing has been yielded yet.
+    """
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            # Goes through _stream below
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        # A whole completion's duration depends on its length, so it is no latency signal
+        return upstream.call(upstream.WATSONX, super()._generate, messages, stop=stop,
+                             run_manager=run_manager, measure=False, **kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for attempt in upstream.attempts():
+            with upstream.slot(upstream.WATSONX, measure=False, attempt=attempt) as permit:
+                chunks = super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+                try:
+                    first = next(chunks, None)
+                except Exception as e:
+                    if not upstream.should_retry(e, attempt):
+                        raise
+                    permit.throttled = True
+                    continue
+                # Time to first token is the latency signal
+                permit.mark()
+                if first is not None:
+                    yield first
+                    yield from chunks
+                return
@@ -1,6 +1,67 @@
 // public/js/scheduleCallback.js
 
+function localDateTimeValue(date) {
+  const pad = n => String(n).padStart(2, '0');
+  return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}` +
+    `T${pad(date.getHours())}:${pad(date.getMinutes())}`;
+}
+
+// The app's HTTPException handler answers {error}; FastAPI's own errors carry
+// detail, a string or, for validation (422) errors, a list of {loc, msg}
+function errorMessage(body) {
+  if (!body) return '';
+  if (typeof body.error === 'string') return body.error;
+  const detail = body.detail;
+  if (Array.isArray(detail)) {
+    return detail.map(item => item.msg).filter(Boolean).join('; ');
+  }
+  return typeof detail === 'string' ? detail : '';
+}
+
 export function handleScheduleCallback(sessionId) {
   console.log("📅 Callback scheduling triggered for session:", sessionId);
-  alert("Opening scheduling flow... [Placeholder Logic]");
+  const container = document.getElementById('escalation-buttons');
+  if (!container || document.getElementById('callback-form')) return;
+
+  const soon = new Date(Date.now() + 15 * 60 * 1000);
+  const form = document.createElement('form');
+  form.id = 'callback-form';
+  form.className = 'callback-form';
+  form.innerHTML = `
+    <input type="tel" name="phone_number" placeholder="Phone number" required
+           pattern="\\+?[0-9 ()\\-]{6,20}" autocomplete="tel">
+    <input type="datetime-local" name="preferred_time" required
+           min="${localDateTimeValue(new Date())}" value="${localDateTimeValue(soon)}">
+    <button type="submit" class="escalation-btn schedule">Book callback</button>
+    <div class="callback-status" role="status"></div>`;
+  container.appendChild(form);
+
+  const status = form.querySelector('.callback-status');
+  form.onsubmit = async (event) => {
+    event.preventDefault();
+    const button = form.querySelector('button');
+    button.disabled = true;
+    status.textContent = 'Booking…';
+    try {
+      const response = await fetch('/callbacks', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          session_id: sessionId || 'web',
+          phone_number: form.phone_number.value,
+          // datetime-local has no offset; the server reads it in this timezone
+          preferred_time: form.preferred_time.value,
+          timezone: Intl.DateTimeFormat().resolvedOptions().timeZone
+        })
+      });
+      const body = await response.json().catch(() => ({}));
+      if (!response.ok) throw new Error(errorMessage(body) || 'Could not book the callback');
+      const when = new Date(body.due_at).toLocaleString();
+      status.textContent = `Callback booked for ${when}.`;
+      form.querySelectorAll('input').forEach(input => { input.disabled = true; });
+    } catch (error) {
+      status.textContent = error.message;
+      button.disabled = false;
+    }
+  };
 }
@@ -1,6 +1,62 @@
 // public/js/talkNow.js
 
-export function handleTalkNow(sessionId) {
+let sendEscalation = null;
+let queuedSessionId = null;
+
+function formatWait(seconds) {
+  if (seconds === null || seconds === undefined) return 'as soon as an agent is available';
+  if (seconds < 60) return 'under a minute';
+  const minutes = Math.round(seconds / 60);
+  return `about ${minutes} minute${minutes === 1 ? '' : 's'}`;
+}
+
+function statusPanel() {
+  let panel = document.getElementById('handoff-status');
+  if (!panel) {
+    const container = document.getElementById('escalation-buttons');
+    if (!container) return null;
+    panel = document.createElement('div');
+    panel.id = 'handoff-status';
+    panel.className = 'handoff-status';
+    panel.setAttribute('role', 'status');
+    panel.innerHTML = `<span class="handoff-text"></span>
+      <button type="button" class="handoff-leave">Leave queue</button>`;
+    panel.querySelector('.handoff-leave').onclick = () => {
+      if (sendEscalation && queuedSessionId) {
+        sendEscalation({ message_type: 'escalation', action: 'leave_queue', session_id: queuedSessionId });
+      }
+    };
+    container.appendChild(panel);
+  }
+  return panel;
+}
+
+export function handleTalkNow(sessionId, send) {
   console.log("📞 Escalation to agent NOW triggered for session:", sessionId);
-  alert("Connecting you to a human agent now... [Placeholder Logic]");
+  sendEscalation = send;
+  queuedSessionId = sessionId;
+  const panel = statusPanel();
+  if (panel) panel.querySelector('.handoff-text').textContent = 'Joining the queue…';
+  send({ message_type: 'escalation', action: 'talk_now', session_id: sessionId });
+}
+
+export function handleHandoffUpdate(data) {
+  const panel = statusPanel();
+  if (!panel) return;
+  const text = panel.querySelector('.handoff-text');
+  const leave = panel.querySelector('.handoff-leave');
+  if (data.type === 'handoff_queue') {
+    const ahead = data.position - 1;
+    text.textContent = ahead === 0
+      ? `You're next. Estimated wait: ${formatWait(data.estimated_wait_seconds)}.`
+      : `${ahead} caller${ahead === 1 ? '' : 's'} ahead of you. ` +
+        `Estimated wait: ${formatWait(data.estimated_wait_seconds)}.`;
+    leave.hidden = false;
+  } else if (data.type === 'handoff_assigned') {
+    text.textContent = 'An agent is joining your conversation now.';
+    leave.hidden = true;
+  } else if (data.type === 'handoff_left') {
+    text.textContent = 'You have left the queue.';
+    leave.hidden = true;
+  }
 }
@@ -0,0 +1,42 @@
+"""Checkpointing of the bulk summarization run (src/summary_chain/batch.py)."""
+
+from langchain_core.messages import HumanMessage
+
+from src.summary_chain.batch import Checkpoint, run_batch
+
+
+def _sessions(count: int):
+    return iter([(f"k{i:03d}", f"s{i}", [HumanMessage(content=str(i))]) for i in range(count)])
+
+
+def _summarize(messages):
+    if messages[0].content == "3":
+        raise RuntimeError("boom")
+    return {"name": None, "policy_number": None, "summary": messages[0].content}
+
+
+def test_failed_key_does_not_pin_the_watermark(tmp_path):
+    path = str(tmp_path / "run.checkpoint.json")
+    stats = run_batch(_sessions(20), str(tmp_path / "out.jsonl"), _summarize, Checkpoint(path),
+                      concurrency=2, retries=0, backoff=0)
+    assert stats["sessions"] == 19
+    assert stats["failed"] == 1
+
+    resumed = Checkpoint(path)
+    assert resumed.watermark == "k019"
+    assert resumed.done == set()
+    assert resumed.failed == {"k003": "boom"}
+
+
+def test_completions_are_journalled_as_they_happen(tmp_path):
+    path = tmp_path / "run.checkpoint.json"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.mark_done("k001")
+    checkpoint.mark_done("k000")
+    checkpoint.flush()
+    assert path.read_text().splitlines() == ['{"done": "k001"}', '{"done": "k000"}']
+    checkpoint.close()
+
+    resumed = Checkpoint(str(path))
+    assert resumed.done == {"k000", "k001"}
+    assert resumed.settled("k001")
@@ -0,0 +1,129 @@
+"""Dispatching booked callbacks (src/callbacks) and refusing bookings nobody would dispatch."""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from src.callbacks import CallbackNotifier, set_callback_scheduler
+from src.callbacks.scheduler import CallbackScheduler
+from src.callbacks.store import CallbackStore
+from src.dbio.engine import create_registry_engine
+
+
+class RecordingNotifier(CallbackNotifier):
+    name = "recording"
+
+    def __init__(self, fail_times: int = 0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.delivered = threading.Event()
+
+    def notify(self, callbacks):
+        self.batches.append([callback.id for callback in callbacks])
+        if self.fail_times:
+            self.fail_times -= 1
+            return [callback.id for callback in callbacks]
+        self.delivered.set()
+        return []
+
+
+@pytest.fixture
+def store(tmp_path):
+    engine = create_registry_engine(f"sqlite:///{tmp_path / 'callbacks.db'}")
+    yield CallbackStore(engine)
+    engine.dispose()
+
+
+def test_due_callbacks_are_dispatched_in_due_order(store):
+    notifier = RecordingNotifier()
+    scheduler = CallbackScheduler(store, notifier, batch_size=2)
+    now = time.time()
+    late = scheduler.schedule("s1", "+911", now - 10)
+    early = scheduler.schedule("s2", "+912", now - 30)
+    middle = scheduler.schedule("s3", "+913", now - 20)
+    future = scheduler.schedule("s4", "+914", now + 3600)
+    scheduler.load()
+
+    for _ in range(2):
+        scheduler.dispatch(scheduler._take_due(time.time()))
+
+    assert notifier.batches == [[early, middle], [late]]
+    assert store.get(early)["status"] == "dispatched"
+    assert store.get(future)["status"] == "pending"
+
+
+def test_cancelled_callbacks_are_not_dispatched(store):
+    notifier = RecordingNotifier()
+    scheduler = CallbackScheduler(store, notifier)
+    scheduler.load()
+    kept = scheduler.schedule("s1", "+911", time.time() - 1)
+    cancelled = scheduler.schedule("s2", "+912", time.time() - 1)
+    assert scheduler.cancel(cancelled)
+
+    scheduler.dispatch(scheduler._take_due(time.time()))
+    assert notifier.batches == [[kept]]
+    assert store.get(cancelled)["status"] == "cancelled"
+
+
+def test_a_callback_is_claimed_by_one_scheduler_only(store):
+    first, second = RecordingNotifier(), RecordingNotifier()
+    schedulers = [CallbackScheduler(store, first), CallbackScheduler(store, second)]
+    callback_id = store.insert("s1", "+911", time.time() - 1)
+    for scheduler in schedulers:
+        scheduler.load()
+    for scheduler in schedulers:
+        scheduler.dispatch(scheduler._take_due(time.time()))
+    assert first.batches + second.batches == [[callback_id]]
+
+
+def test_failed_delivery_is_retried_then_given_up(store):
+    notifier = RecordingNotifier(fail_times=2)
+    scheduler = CallbackScheduler(store, notifier, max_attempts=2, retry_seconds=0)
+    scheduler.load()
+    callback_id = scheduler.schedule("s1", "+911", time.time() - 1)
+
+    scheduler.dispatch(scheduler._take_due(time.time()))
+    assert store.get(callback_id)["status"] == "pending"
+    scheduler.dispatch(scheduler._take_due(time.time()))
+    callback = store.get(callback_id)
+    assert (callback["status"], callback["attempts"]) == ("failed", 2)
+
+
+def test_running_scheduler_dispatches_when_due(store):
+    notifier = RecordingNotifier()
+    scheduler = CallbackScheduler(store, notifier)
+    scheduler.start()
+    try:
+        callback_id = scheduler.schedule("s1", "+911", time.time() + 0.2)
+        assert notifier.delivered.wait(5)
+    finally:
+        scheduler.stop()
+    assert notifier.batches == [[callback_id]]
+    assert store.get(callback_id)["status"] == "dispatched"
+
+
+def test_booking_is_refused_when_no_scheduler_is_running(store, monkeypatch):
+    scheduler = CallbackScheduler(store, RecordingNotifier())
+    set_callback_scheduler(scheduler)
+    monkeypatch.setattr(app_module, "CALLBACK_SCHEDULER_ENABLED", True)
+    client = TestClient(app_module.app)
+    in_an_hour = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() + 3600))
+    booking = {"session_id": "s1", "phone_number": "+91 98765 43210",
+               "preferred_time": in_an_hour, "timezone": "UTC"}
+    try:
+        response = client.post("/callbacks", json=booking)
+        assert response.status_code == 503
+        assert store.count_pending() == 0
+
+        scheduler.start()
+        response = client.post("/callbacks", json=dict(booking, preferred_time="2000-01-01T10:00:00"))
+        assert response.status_code == 400
+        response = client.post("/callbacks", json=booking)
+        assert response.status_code == 201
+        assert store.get(response.json()["callback_id"])["status"] == "pending"
+    finally:
+        scheduler.stop()
+        set_callback_scheduler(None)
@@ -0,0 +1,57 @@
+"""When the small-first cascade (src/utils/cascade.py) moves on to the large tier."""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src import upstream
+from src.constants.llm import MODEL_TIERS
+from src.utils.cascade import CascadeChatModel
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class FakeTier:
+    def __init__(self, answer=None, error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+
+    def _generate(self, messages, stop=None, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+
+def _cascade(small, large, expects_json=False):
+    return CascadeChatModel(call_site="test", tiers=list(MODEL_TIERS.values()), models=[small, large],
+                            expects_json=expects_json)
+
+
+def test_small_answer_is_used():
+    small, large = FakeTier("Your claim is approved."), FakeTier("large")
+    assert _cascade(small, large).invoke([HumanMessage(content="status?")]).content == "Your claim is approved."
+    assert large.calls == 0
+
+
+def test_unparseable_json_escalates():
+    small, large = FakeTier('{"summary": "cut o'), FakeTier('{"summary": "done"}')
+    answer = _cascade(small, large, expects_json=True).invoke([HumanMessage(content="summarize")])
+    assert answer.content == '{"summary": "done"}'
+    assert large.calls == 1
+
+
+def test_other_errors_escalate():
+    small, large = FakeTier(error=RuntimeError("bad gateway")), FakeTier("large")
+    assert _cascade(small, large).invoke([HumanMessage(content="hi")]).content == "large"
+
+
+@pytest.mark.parametrize("error", [Throttled(), upstream.UpstreamBusy("no slot")])
+def test_overload_is_raised_not_escalated(error):
+    small, large = FakeTier(error=error), FakeTier("large")
+    with pytest.raises(type(error)):
+        _cascade(small, large).invoke([HumanMessage(content="hi")])
+    assert large.calls == 0
@@ -0,0 +1,56 @@
+"""Name and policy number extraction (src/utils/extraction.py)."""
+
+import pytest
+
+from src.storage import create_state_backend
+from src.utils.extraction import ConversationFieldExtractor
+
+REGISTERED = {"P987654321": "Raj Verma"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("My name is Ananya Roy and my policy number is ABC123456.",
+     {"name": "Ananya Roy", "policy_number": "ABC123456"}),
+    ("my name is raj verma, policy no: p 9876 54321",
+     {"name": "Raj Verma", "policy_number": "P987654321"}),
+    ("call me Raj", {"name_candidate": "Raj"}),
+    ("I am Raj Verma", {"name_candidate": "Raj Verma"}),
+    # Not introductions, and a phone number is no policy number
+    ("call me back on 9876543210", {}),
+    ("I am Not Sure", {}),
+    ("I'm sorry, this is taking too long", {}),
+    ("What is the status of my claim for member ID HF62415739?", {}),
+    ("please call me asap", {}),
+    ("can you call me after lunch", {}),
+    ("Can you call me After Lunch", {}),
+    ("call me if anything changes", {}),
+    ("Could someone call me please", {}),
+    ("Is my policy with 12345 rupees premium", {}),
+    ("My policy for 2023 is up for renewal", {}),
+])
+def test_extract(text, expected):
+    assert ConversationFieldExtractor().extract(text) == expected
+
+
+def test_intro_name_is_stored_only_once_verified():
+    backend = create_state_backend("memory")
+    extractor = ConversationFieldExtractor(lookup=REGISTERED.get)
+
+    extractor.process_turn("s1", "Hi, I am Raj Verma", backend)
+    assert "name" not in backend.get_session_metadata("s1")
+
+    extractor.process_turn("s1", "my policy number is P987654321", backend)
+    metadata = backend.get_session_metadata("s1")
+    assert metadata["name"] == "Raj Verma"
+    assert metadata["policy_number"] == "P987654321"
+    assert metadata["verified"] is True
+
+
+def test_unverified_intro_name_never_becomes_the_name():
+    backend = create_state_backend("memory")
+    extractor = ConversationFieldExtractor(lookup=REGISTERED.get)
+
+    extractor.process_turn("s1", "This is Priya, policy number P987654321", backend)
+    metadata = backend.get_session_metadata("s1")
+    assert "name" not in metadata
+    assert metadata["verified"] is False
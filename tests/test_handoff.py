@@ -0,0 +1,129 @@
+"""The talk-now queue (src/handoff.py): ordering, which worker holds it, and who may call its endpoints."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from src import handoff as handoff_module
+from src.handoff import HandoffQueue, HandoffRelay, HandoffService, create_handoff_service
+
+AGENT_TOKEN = "agent-secret"
+RELAY_TOKEN = "relay-secret"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_priority_is_served_first_but_lower_levels_age_in(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(handoff_module, "time", clock)
+    queue = HandoffQueue(levels=3, step_seconds=60)
+
+    queue.push("routine", None, 1)
+    clock.now += 30
+    queue.push("urgent", "agent_error", 0)
+    clock.now += 60
+    queue.push("late-urgent", "agent_error", 0)
+
+    assert [queue.ahead(s) for s in ("urgent", "routine", "late-urgent")] == [0, 1, 2]
+    assert [queue.pop().session_id for _ in range(3)] == ["urgent", "routine", "late-urgent"]
+    assert queue.pop() is None
+
+
+def test_idle_agents_take_callers_longest_idle_first():
+    async def scenario():
+        service = HandoffService(update_seconds=0)
+        received = []
+
+        async def send(message):
+            received.append(message)
+
+        assert (await service.agent_ready("a1"))["status"] == "idle"
+        assert (await service.agent_ready("a2"))["status"] == "idle"
+        await service.request("caller-1", None, send)
+        assert received[-1]["type"] == "handoff_assigned" and received[-1]["agent_id"] == "a1"
+        assert service.waiting == 0 and service.agents_idle == 1
+
+        await service.request("caller-2", None, send)
+        await service.request("caller-3", None, send)
+        assert service.status("caller-3")["position"] == 1
+        assert (await service.agent_complete("a1"))["session_id"] == "caller-3"
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("relay_url, worker, owner, expected", [
+    ("", 2, 0, HandoffService),
+    ("http://127.0.0.1:8000", 0, 0, HandoffService),
+    ("http://127.0.0.1:8000", 2, 0, HandoffRelay),
+])
+def test_only_the_owner_worker_holds_the_queue(monkeypatch, relay_url, worker, owner, expected):
+    monkeypatch.setattr(handoff_module, "HANDOFF_RELAY_URL", relay_url)
+    monkeypatch.setattr(handoff_module, "WORKER_INDEX", worker)
+    monkeypatch.setattr(handoff_module, "HANDOFF_OWNER_WORKER", owner)
+    assert type(create_handoff_service()) is expected
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "HANDOFF_AGENT_TOKENS", (AGENT_TOKEN,))
+    monkeypatch.setattr(app_module, "HANDOFF_RELAY_TOKEN", RELAY_TOKEN)
+    monkeypatch.setattr(app_module, "handoff", HandoffService(update_seconds=0))
+    return TestClient(app_module.app)
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer wrong"},
+    {"Authorization": AGENT_TOKEN},
+    {"Authorization": "Bearer " + AGENT_TOKEN + "x"},
+])
+def test_agent_endpoints_need_an_agent_token(client, headers):
+    assert client.get("/handoff/queue", headers=headers).status_code == 401
+    assert client.post("/handoff/agents/a1/ready", headers=headers).status_code == 401
+
+
+def test_agent_endpoints_refuse_everyone_without_configured_tokens(client, monkeypatch):
+    monkeypatch.setattr(app_module, "HANDOFF_AGENT_TOKENS", ())
+    assert client.get("/handoff/queue", headers={"Authorization": "Bearer "}).status_code == 401
+
+
+def test_agent_with_a_token_is_served(client):
+    headers = {"Authorization": "Bearer " + AGENT_TOKEN}
+    assert client.post("/handoff/agents/a1/ready", headers=headers).json()["status"] == "idle"
+    assert client.get("/handoff/queue", headers=headers).json()["agents_idle"] == 1
+
+
+def test_relay_endpoints_need_the_relay_token(client, monkeypatch):
+    posted = []
+
+    async def post(path, payload):
+        posted.append((path, payload))
+
+    monkeypatch.setattr(handoff_module, "_post", post)
+    join = {"session_id": "caller-1", "reason": None, "worker": 2}
+    assert client.post("/handoff/relay/join", json=join).status_code == 401
+    assert client.post("/handoff/relay/join", json=join, headers={"X-Relay-Token": "wrong"}).status_code == 401
+    assert app_module.handoff.waiting == 0
+
+    response = client.post("/handoff/relay/join", json=join, headers={"X-Relay-Token": RELAY_TOKEN})
+    assert response.json()["status"] == "queued"
+    assert app_module.handoff.waiting == 1
+    # The position update goes back to the caller's worker
+    assert posted[0][0] == "/internal/handoff/deliver?worker=2"
+
+
+def test_a_worker_without_the_queue_sends_handoff_requests_away(client, monkeypatch):
+    monkeypatch.setattr(app_module, "handoff", HandoffRelay(worker=2))
+    headers = {"Authorization": "Bearer " + AGENT_TOKEN}
+    assert client.get("/handoff/queue", headers=headers).status_code == 409
+    response = client.post("/handoff/relay/join", json={"session_id": "caller-1", "reason": None, "worker": 1},
+                           headers={"X-Relay-Token": RELAY_TOKEN})
+    assert response.status_code == 409
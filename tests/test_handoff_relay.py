@@ -0,0 +1,49 @@
+"""
+Talk-now requests from a worker that does not hold the queue
+(HandoffRelay in src/handoff.py), with the owner worker in-process.
+"""
+
+import asyncio
+
+from src import handoff as handoff_module
+from src.handoff import HandoffRelay, HandoffService
+
+
+def test_relayed_caller_is_queued_and_assigned_in_the_owner(monkeypatch):
+    owner = HandoffService(update_seconds=0)
+    relays = {1: HandoffRelay(worker=1)}
+
+    async def post(path, payload):
+        # What the supervisor does: /handoff/ goes to the owner, deliveries to ?worker=N
+        if path == "/handoff/relay/join":
+            await owner.request(payload["session_id"], payload["reason"],
+                                handoff_module.relay_send(payload["worker"], payload["session_id"]))
+        elif path == "/handoff/relay/leave":
+            owner.leave(payload["session_id"])
+        else:
+            worker = int(path.rsplit("=", 1)[1])
+            assert await relays[worker].deliver(payload["session_id"], payload["message"])
+
+    monkeypatch.setattr(handoff_module, "_post", post)
+
+    async def scenario():
+        received = []
+
+        async def send(message):
+            received.append(message)
+
+        await relays[1].request("caller-1", "agent_error", send)
+        await relays[1].request("caller-2", None, send)
+        assert owner.waiting == 2
+        assert received[0]["type"] == "handoff_queue" and received[0]["position"] == 1
+
+        assignment = await owner.agent_ready("a1")
+        assert assignment["session_id"] == "caller-1"
+        assert received[-1]["type"] == "handoff_assigned"
+
+        assert relays[1].leave("caller-2")
+        await asyncio.sleep(0)
+        assert owner.waiting == 0
+        assert not relays[1].leave("caller-2")
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+"""
+Importing the app stays within its startup budget (see
+benchmarks/import_budget.py). Measured in a fresh interpreter;
+IMPORT_BUDGET_MS overrides the budget on slow machines.
+"""
+
+import os
+
+from benchmarks.import_budget import DEFERRED_MODULES, measure
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1800"))
+
+
+def test_app_import_is_within_budget():
+    rows = measure("app")
+
+    eager = sorted({module for module, _, _, _ in rows
+                    if any(module == d or module.startswith(d + ".") for d in DEFERRED_MODULES)})
+    assert not eager, f"deferred modules imported eagerly: {', '.join(eager)}"
+
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    assert total_ms <= IMPORT_BUDGET_MS, f"import app took {total_ms:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)"
@@ -0,0 +1,68 @@
+"""An overloaded upstream gets a try-again reply, not an escalation to a human agent."""
+
+import pytest
+
+import src.agents as agents
+from src import upstream
+from src.agents import VoiceEscalationAgent
+from src.agents.memory import MemoryManager
+from src.storage import create_state_backend
+from src.tools import watsonx_tool
+from src.tools.watsonx_tool import search_faq_tool
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+OVERLOADS = [Throttled(), upstream.UpstreamBusy("no slot")]
+
+
+class FailingExecutor:
+    def __init__(self, error):
+        self.error = error
+
+    def invoke(self, inputs, config=None):
+        raise self.error
+
+
+def _agent(monkeypatch, error):
+    monkeypatch.setattr(agents, "verification_enabled", lambda: False)
+    monkeypatch.setattr(VoiceEscalationAgent, "initialize_agent", lambda self: FailingExecutor(error))
+    return VoiceEscalationAgent(llm=object(), memory_manager=MemoryManager(backend=create_state_backend("memory")))
+
+
+@pytest.mark.parametrize("error", OVERLOADS)
+def test_overloaded_turn_asks_to_try_again(monkeypatch, error):
+    agent = _agent(monkeypatch, error)
+    reply = agent.chat("What is my claim status?", "s1")
+    assert reply["show_escalation_buttons"] is False
+    assert "try again" in reply["message"]
+    assert not agent.is_escalated("s1")
+
+
+def test_failed_turn_still_escalates(monkeypatch):
+    agent = _agent(monkeypatch, RuntimeError("bad gateway"))
+    reply = agent.chat("What is my claim status?", "s1")
+    assert reply["show_escalation_buttons"] is True
+    assert agent.is_escalated("s1")
+
+
+@pytest.mark.parametrize("error", OVERLOADS)
+def test_overloaded_faq_search_asks_to_try_again(monkeypatch, error):
+    def ask(query):
+        raise error
+
+    monkeypatch.setattr(watsonx_tool, "invoke_watsonx_rag_agent", ask)
+    result = search_faq_tool.invoke({"query": "How long does a claim take?"})
+    assert result["show_escalation_buttons"] is False
+    assert "escalation_reason" not in result
+
+
+def test_failed_faq_search_still_escalates(monkeypatch):
+    def ask(query):
+        raise RuntimeError("bad gateway")
+
+    monkeypatch.setattr(watsonx_tool, "invoke_watsonx_rag_agent", ask)
+    result = search_faq_tool.invoke({"query": "How long does a claim take?"})
+    assert result["escalation_reason"] == "system_error"
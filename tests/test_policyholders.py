@@ -0,0 +1,59 @@
+"""Policyholder lookups (src/dbio/policyholders.py) and when callers are verified."""
+
+import pytest
+from sqlalchemy import insert
+
+from src.dbio import policyholders
+from src.dbio.engine import create_registry_engine
+from src.dbio.models import Base, UserVerification
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_registry_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(policyholders, "engine", engine)
+    monkeypatch.setattr(policyholders, "_cache", policyholders._NameCache(maxsize=10, ttl=60))
+    yield engine
+    engine.dispose()
+
+
+def _load_elsewhere(engine, name, policy_number):
+    # As another process's loader would: straight into the table, no cache clear here
+    with engine.begin() as conn:
+        conn.execute(insert(UserVerification.__table__), {"name": name, "policy_number": policy_number})
+
+
+def test_misses_are_not_cached(engine):
+    assert policyholders.verify_policyholder("Ananya Roy", "ABC123456")["reason"] == "unknown_policy_number"
+    _load_elsewhere(engine, "Ananya Roy", "ABC123456")
+    assert policyholders.verify_policyholder("ananya  roy", "abc 123456")["verified"]
+
+
+def test_hits_expire_after_the_ttl(engine, monkeypatch):
+    monkeypatch.setattr(policyholders, "_cache", policyholders._NameCache(maxsize=10, ttl=0))
+    _load_elsewhere(engine, "Raj Verma", "P987654321")
+    assert policyholders.lookup_policyholder("P987654321") == "Raj Verma"
+    with engine.begin() as conn:
+        conn.execute(UserVerification.__table__.update().values(name="Raj Varma"))
+    assert policyholders.lookup_policyholder("P987654321") == "Raj Varma"
+
+
+def test_bulk_load_clears_cached_names(engine):
+    policyholders.bulk_load_policyholders([{"name": "Raj Verma", "policy_number": "P987654321"}])
+    assert policyholders.lookup_policyholder("P987654321") == "Raj Verma"
+    policyholders.bulk_load_policyholders([{"name": "Raj Varma", "policy_number": "P987654321"}])
+    assert policyholders.lookup_policyholder("P987654321") == "Raj Varma"
+
+
+@pytest.mark.parametrize("setting, loaded, expected", [
+    ("auto", False, False),
+    ("auto", True, True),
+    ("true", False, True),
+    ("false", True, False),
+])
+def test_verification_enabled(engine, monkeypatch, setting, loaded, expected):
+    monkeypatch.setattr(policyholders, "POLICYHOLDER_VERIFICATION", setting)
+    if loaded:
+        _load_elsewhere(engine, "Raj Verma", "P987654321")
+    assert policyholders.verification_enabled() is expected
@@ -0,0 +1,33 @@
+"""Which sessions the retention job (src/dbio/retention.py) archives and purges."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from src.dbio.retention import RetentionJob
+from src.storage import create_state_backend
+
+
+def _seen(engine, session_id: str, days_ago: int):
+    ts = (datetime.utcnow() - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO session_history (session_id, timestamp) VALUES (:sid, :ts)"),
+                     {"sid": session_id, "ts": ts})
+
+
+def test_only_sessions_idle_since_the_cutoff_expire(tmp_path):
+    backend = create_state_backend("sqlite", db_url=f"sqlite:///{tmp_path / 'chat.db'}")
+    engine = backend.engine
+    _seen(engine, "stale", 120)
+    _seen(engine, "returning", 120)
+    _seen(engine, "returning", 1)
+    _seen(engine, "recent", 1)
+
+    job = RetentionJob(engine, days=90, archive_dir=str(tmp_path / "archive"), duty_cycle=1.0)
+    stats = job.run_once()
+
+    with engine.connect() as conn:
+        left = {row[0] for row in conn.execute(text("SELECT session_id FROM session_history"))}
+    assert stats["sessions"] == 1
+    assert left == {"returning", "recent"}
+    backend.close()
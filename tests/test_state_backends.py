@@ -0,0 +1,78 @@
+"""
+The shared state backends (src/storage) behave the same: chat history,
+the session registry and escalation state, against the in-memory,
+SQLite and redis backends (fakeredis as the in-process redis).
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.storage import create_state_backend
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = create_state_backend("sqlite", db_url=f"sqlite:///{tmp_path / 'state.db'}")
+    elif request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        backend = create_state_backend("redis", client=fakeredis.FakeRedis(), prefix="test:")
+    else:
+        backend = create_state_backend("memory")
+    yield backend
+    backend.close()
+
+
+def test_chat_history_round_trip(backend):
+    history = backend.get_chat_history("s1")
+    history.add_messages([HumanMessage(content="hello"), AIMessage(content="hi there")])
+
+    messages = backend.get_chat_history("s1").messages
+    assert [type(m) for m in messages] == [HumanMessage, AIMessage]
+    assert [m.content for m in messages] == ["hello", "hi there"]
+    assert backend.get_chat_history("s2").messages == []
+
+
+def test_clear_chat_history(backend):
+    backend.get_chat_history("s1").add_messages([HumanMessage(content="hello")])
+    backend.get_chat_history("s2").add_messages([HumanMessage(content="other")])
+
+    backend.clear_chat_history("s1")
+
+    assert backend.get_chat_history("s1").messages == []
+    assert [m.content for m in backend.get_chat_history("s2").messages] == ["other"]
+
+
+def test_session_registry(backend):
+    assert backend.list_sessions() == []
+    assert backend.get_last_session_id() is None
+
+    backend.register_session("s1")
+    backend.register_session("s2")
+    assert sorted(backend.list_sessions()) == ["s1", "s2"]
+    assert backend.get_last_session_id() == "s2"
+
+    backend.end_session("s1")
+    assert backend.list_sessions() == ["s2"]
+    # Ending a session leaves the registration log alone
+    assert backend.get_last_session_id() == "s2"
+
+
+def test_escalation_state(backend):
+    assert backend.get_escalation("s1") is None
+    assert not backend.is_escalated("s1")
+
+    backend.set_escalation("s1", reason="caller asked for a human")
+    state = backend.get_escalation("s1")
+    assert state["reason"] == "caller asked for a human"
+    assert state["escalated_at"]
+    assert backend.is_escalated("s1")
+    assert not backend.is_escalated("s2")
+
+    backend.clear_escalation("s1")
+    assert backend.get_escalation("s1") is None
+
+
+def test_escalation_without_reason(backend):
+    backend.set_escalation("s1")
+    assert backend.get_escalation("s1")["reason"] is None
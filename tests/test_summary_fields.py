@@ -0,0 +1,38 @@
+"""Fields extracted during the call override the summary LLM's, one by one."""
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.storage import create_state_backend
+from src.summary_chain import incremental, streaming
+
+LLM_RESULT = {"name": "Raj Varma", "policy_number": "P987654321", "summary": "Asked about a claim."}
+MESSAGES = [HumanMessage(content="My name is Raj Verma"), AIMessage(content="How can I help?")]
+
+
+def _backend():
+    backend = create_state_backend("memory")
+    # Only the name was extracted; the policy number has to come from the LLM
+    backend.update_session_metadata("s1", {"name": "Raj Verma"})
+    return backend
+
+
+def test_summary_job_merges_per_field(monkeypatch):
+    monkeypatch.setattr(incremental, "run_summary_sync", lambda messages: dict(LLM_RESULT))
+    record = incremental.summarize_session_messages("s1", MESSAGES, _backend())
+    assert (record["name"], record["policy_number"]) == ("Raj Verma", "P987654321")
+
+
+def test_streamed_summary_merges_per_field(monkeypatch):
+    def chunks(messages):
+        yield {"name": "Raj Varma"}
+        yield {"name": "Raj Varma", "policy_number": "P987654321"}
+        yield dict(LLM_RESULT)
+
+    monkeypatch.setattr(streaming, "run_summary_stream", chunks)
+    events = list(streaming.stream_summary_events("s1", MESSAGES, _backend()))
+
+    fields = [data for event, data in events if event == "field"]
+    assert fields == [{"name": "Raj Verma"}, {"policy_number": "P987654321"}]
+    event, record = events[-1]
+    assert event == "done"
+    assert (record["name"], record["policy_number"]) == ("Raj Verma", "P987654321")
@@ -0,0 +1,88 @@
+"""SummaryJobQueue (src/summary_chain/jobs.py) around the end of a call."""
+
+import asyncio
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.storage import create_state_backend
+from src.summary_chain import jobs
+from src.summary_chain.jobs import SummaryJobQueue
+
+
+def test_summary_waits_for_the_precompute_after_history_is_cleared(monkeypatch):
+    backend = create_state_backend("memory")
+    release = threading.Event()
+
+    def slow_summary(session_id, messages, backend):
+        release.wait(5)
+        record = {"name": "Asha", "policy_number": "PN-1", "summary": "Claim status.",
+                  "message_count": len(messages)}
+        backend.save_summary(session_id, record)
+        return record
+
+    monkeypatch.setattr(jobs, "summarize_session_messages", slow_summary)
+
+    async def scenario():
+        queue = SummaryJobQueue(backend=backend)
+        backend.get_chat_history("s1").add_messages(
+            [HumanMessage(content="Where is my claim?"), AIMessage(content="Let me check.")])
+        # What end_call_session does: precompute, then clear the transcript
+        await queue.submit_for_session("s1")
+        backend.clear_chat_history("s1")
+
+        pending = asyncio.ensure_future(queue.get_summary("s1"))
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        release.set()
+        summary = await asyncio.wait_for(pending, 5)
+        queue.shutdown()
+        return summary
+
+    summary = asyncio.run(scenario())
+    assert summary["summary"] == "Claim status."
+    assert summary["message_count"] == 2
+
+
+def _transcript():
+    return [HumanMessage(content="Where is my claim?"), AIMessage(content="Let me check.")]
+
+
+def test_concurrent_streams_share_one_job_and_the_pool_limit(monkeypatch):
+    backend = create_state_backend("memory")
+    release = threading.Event()
+    started = []
+
+    def slow_stream(session_id, messages, backend):
+        started.append(session_id)
+        yield "field", {"name": "Asha", "policy_number": "PN-1"}
+        release.wait(5)
+        yield "summary", {"delta": "Claim status."}
+        record = {"name": "Asha", "policy_number": "PN-1", "summary": "Claim status.",
+                  "message_count": len(messages)}
+        backend.save_summary(session_id, record)
+        yield "done", record
+
+    monkeypatch.setattr(jobs, "stream_summary_events", slow_stream)
+
+    async def collect(queue, session_id):
+        return [event async for event in queue.stream(session_id, _transcript())]
+
+    async def scenario():
+        queue = SummaryJobQueue(max_concurrency=1, backend=backend)
+        first = asyncio.ensure_future(collect(queue, "s1"))
+        joined = asyncio.ensure_future(collect(queue, "s1"))
+        other = asyncio.ensure_future(collect(queue, "s2"))
+        await asyncio.sleep(0.05)
+        # One generation for s1; s2 waits for the only slot
+        assert started == ["s1"]
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(first, joined, other), 5)
+        queue.shutdown()
+        return results
+
+    first, joined, other = asyncio.run(scenario())
+    assert started == ["s1", "s2"]
+    assert [event for event, _ in first] == ["field", "summary", "done"]
+    assert joined[-1] == first[-1]
+    assert [event for event, _ in other] == ["field", "summary", "done"]
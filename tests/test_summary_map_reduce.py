@@ -0,0 +1,44 @@
+"""Map-reduce summaries of long transcripts (src/summary_chain)."""
+
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+import src.summary_chain as summary_chain
+
+
+def _slow_chunk_summary(inputs: dict) -> str:
+    time.sleep(0.05)
+    return f"part {inputs['part']} of {inputs['parts']}"
+
+
+def test_async_map_phase_leaves_the_event_loop_free(monkeypatch):
+    chains = {
+        "chunk_summary_chain": RunnableLambda(_slow_chunk_summary),
+        "summary_reduce_chain": RunnableLambda(lambda inputs: {"summary": inputs["partial_summaries"]}),
+    }
+    monkeypatch.setattr(summary_chain, "get_chain", chains.__getitem__)
+    monkeypatch.setattr(summary_chain, "SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", 50)
+    monkeypatch.setattr(summary_chain, "SUMMARY_CHUNK_TOKENS", 40)
+    messages = [HumanMessage(content="my claim " * 20), AIMessage(content="checking " * 20)] * 4
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        result = await summary_chain.run_summary_async(messages)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result["summary"].startswith("Part 1: part 1 of ")
+    # The loop kept running while the chunks were summarized
+    assert ticks >= 3
@@ -0,0 +1,139 @@
+"""AdaptiveLimiter (src/upstream.py): AIMD limit, priority lanes and leaving the queue."""
+
+import threading
+import time
+
+import pytest
+
+from src import upstream
+from src.upstream import BACKGROUND, IN_PROGRESS, NEW, AdaptiveLimiter, UpstreamBusy
+from src.utils import cancellation
+from src.utils.cancellation import CancelToken, TurnCancelled
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_limit_grows_only_while_it_is_used_fully():
+    limiter = AdaptiveLimiter("test", initial=2, minimum=1, maximum=3)
+    limiter.release(limiter.acquire(NEW))
+    assert limiter.limit == 2
+
+    first, second = limiter.acquire(NEW), limiter.acquire(NEW)
+    limiter.release(first)
+    # One full window of 2 calls adds one
+    assert limiter.limit == 2.5
+    limiter.release(second)
+    assert limiter.limit == 2.5
+
+    for _ in range(10):
+        permits = [limiter.acquire(NEW) for _ in range(int(limiter.limit))]
+        for permit in permits:
+            limiter.release(permit)
+    assert limiter.limit == 3
+
+
+def test_throttling_cuts_the_limit_once_per_window():
+    limiter = AdaptiveLimiter("test", initial=8, minimum=1, maximum=8, backoff=0.5)
+    before_cut = [limiter.acquire(NEW) for _ in range(3)]
+    for permit in before_cut:
+        permit.throttled = True
+        limiter.release(permit)
+    # The other two were sent at the old limit; that overload was already answered
+    assert limiter.limit == 4
+
+    after_cut = limiter.acquire(NEW)
+    after_cut.throttled = True
+    limiter.release(after_cut)
+    assert limiter.limit == 2
+
+
+def test_a_latency_spike_cuts_the_limit():
+    limiter = AdaptiveLimiter("test", initial=4, minimum=1, maximum=8, backoff=0.5, tolerance=2)
+    for latency in (0.1, 0.12, 0.5):
+        permit = limiter.acquire(NEW)
+        permit.latency = latency
+        limiter.release(permit)
+    assert limiter.limit == 2
+
+
+def test_queued_calls_are_served_by_priority_then_arrival():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    held = limiter.acquire(NEW)
+    served = []
+
+    def call(name, priority):
+        permit = limiter.acquire(priority, timeout=5)
+        served.append(name)
+        limiter.release(permit)
+
+    threads = []
+    for name, priority in [("summary", BACKGROUND), ("new-1", NEW), ("ongoing", IN_PROGRESS), ("new-2", NEW)]:
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: limiter.queued == len(threads))
+
+    limiter.release(held)
+    for thread in threads:
+        thread.join(5)
+    assert served == ["ongoing", "new-1", "new-2", "summary"]
+
+
+def test_a_call_that_waits_too_long_is_shed():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    held = limiter.acquire(NEW)
+    with pytest.raises(UpstreamBusy):
+        limiter.acquire(NEW, timeout=0.05)
+    assert limiter.queued == 0
+    limiter.release(held)
+    limiter.release(limiter.acquire(NEW, timeout=0.05))
+
+
+def test_a_cancelled_turn_leaves_the_queue():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    held = limiter.acquire(NEW)
+    token = CancelToken()
+    outcome = []
+
+    def call():
+        with cancellation.bind(token):
+            try:
+                limiter.acquire(IN_PROGRESS, timeout=5)
+            except TurnCancelled:
+                outcome.append("cancelled")
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    _wait_until(lambda: limiter.queued == 1)
+    token.cancel()
+    thread.join(2)
+    assert outcome == ["cancelled"]
+    assert limiter.queued == 0 and limiter.inflight == 1
+    limiter.release(held)
+
+
+def test_throttled_calls_are_retried_in_a_new_slot(monkeypatch):
+    monkeypatch.setattr(upstream, "UPSTREAM_LIMITER_ENABLED", True)
+    monkeypatch.setattr(upstream, "UPSTREAM_RETRY_DELAY_SECONDS", 0)
+    monkeypatch.setitem(upstream._LIMITS, "test", (4, 1, 4))
+    monkeypatch.setattr(upstream, "_limiters", {})
+    answers = [Throttled(), "ok"]
+
+    def flaky():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert upstream.call("test", flaky) == "ok"
+    limiter = upstream.get_limiter("test")
+    assert limiter.limit < 4 and limiter.inflight == 0